@@ -1,107 +1,403 @@
-import psutil
 import datetime
-import os
-import threading
 import time
 
-def monitor_loop(
-    app_path_val, 
-    end_hour_val, 
-    end_minute_val, 
+from .clock import EVENT_SLEEPER, SYSTEM_CLOCK
+from .enforcement import Enforcer
+from .history import BLOCK_ACTIVATED, BLOCK_ENDED, KILL_FAILED, KILLED, TERMINATED
+from .metrics import MonitorMetrics
+from .process_table import create_process_table
+from .process_watcher import create_process_watcher
+from .respawn import RespawnGuard
+from .rules import BlockRule, RuleSet
+from .scan_cache import ScanCache
+from .scheduler import ClockJumpDetector, next_transition, seconds_until
+from .terminator import DEFAULT_TERMINATE_GRACE_PERIOD, terminate_processes
+
+# How often the process table is polled while a block is active and no event-driven watcher is available.
+POLL_INTERVAL = 1.0
+# How often a monitor with a ConfigStore checks the config file for edits (one stat() each time).
+CONFIG_CHECK_INTERVAL = 1.0
+# How soon a process is looked at again while its executable is being hashed for an exe_sha256 rule.
+DIGEST_RECHECK_INTERVAL = 0.1
+
+def _terminate_matches(matches, terminate_grace_period, log_status_func, metrics, events, terminate_func, clock,
+                       respawn_guard, process_table):
+    """
+    Terminates every matched (proc, rule) pair in one batch with `terminate_func`, logs the
+    outcome per process and adds a history event for each one to `events`. Launchers that keep
+    respawning the matches are suppressed first by `respawn_guard`, and the log messages of a
+    rule whose targets keep coming back are thinned out with its LogBackoff.
+    """
+    detected_at = clock.monotonic()
+    rule_by_proc = dict(matches)
+    storms = respawn_guard.record(matches, process_table, detected_at)
+    log_for_rule = {} # rule key -> messages held back before this tick's, or None if this tick's are held back too
+    for rule in set(rule_by_proc.values()):
+        log_for_rule[rule.key] = respawn_guard.log_backoff.allow(rule.key, detected_at)
+    for proc, rule in matches:
+        held_back = log_for_rule[rule.key]
+        if held_back is not None:
+            repeated = f" ({held_back} similar messages held back.)" if held_back else ""
+            log_status_func(f"Found running instance of {rule.app_name} (PID: {proc.pid}). Terminating...{repeated}")
+    for storm in storms:
+        if respawn_guard.suppress(storm, {proc.pid for proc in rule_by_proc}, process_table, terminate_func,
+                                  terminate_grace_period, log_status_func):
+            metrics.launchers_suppressed.inc()
+    result = terminate_func(rule_by_proc.keys(), grace_period=terminate_grace_period)
+    metrics.terminated.inc(len(result.terminated))
+    metrics.killed.inc(len(result.killed))
+    metrics.kill_failed.inc(len(result.alive) + len(result.denied))
+    for exited_at in result.exited_at.values():
+        metrics.kill_latency.observe(exited_at - detected_at)
+    for proc in result.killed:
+        if log_for_rule[rule_by_proc[proc].key] is not None:
+            log_status_func(f"Force killed {rule_by_proc[proc].app_name} (PID: {proc.pid}) after timeout.")
+    for proc in result.terminated + result.killed:
+        if log_for_rule[rule_by_proc[proc].key] is not None:
+            log_status_func(f"{rule_by_proc[proc].app_name} (PID: {proc.pid}) terminated.")
+    for proc in result.alive:
+        log_status_func(f"{rule_by_proc[proc].app_name} (PID: {proc.pid}) is still running after being killed.")
+    now = clock.time()
+    for kind, procs in ((TERMINATED, result.terminated), (KILLED, result.killed), (KILL_FAILED, result.alive)):
+        events.extend((now, rule_by_proc[proc].key, kind, proc.pid) for proc in procs)
+    # Processes in result.denied are left alone; we do not have permission to signal them.
+
+def _scan_totals(scan_cache):
+    return (scan_cache.pids_scanned, scan_cache.exe_resolutions, scan_cache.access_denied, scan_cache.no_such_process,
+            scan_cache.fingerprints.hashed)
+
+def _record_scan(metrics, totals_before, totals_after):
+    """Adds one tick's worth of ScanCache activity to `metrics`."""
+    scanned, exe_resolutions, access_denied, no_such_process, exe_hashes = (
+        after - before for before, after in zip(totals_before, totals_after)
+    )
+    metrics.processes_scanned.observe(scanned)
+    metrics.exe_resolutions.inc(exe_resolutions)
+    metrics.access_denied.inc(access_denied)
+    metrics.no_such_process.inc(no_such_process)
+    metrics.exe_hashes.inc(exe_hashes)
+
+def _apply_schedule(rule_set, current_time, last_status_messages, log_status_func, events):
+    """
+    Lifts blocks that have run their course and activates blocks for rules whose schedule
+    blocks them at `current_time`, adding a history event for each to `events`.
+    Returns True if any rule's block state changed.
+    """
+    current_date = current_time.date()
+    state_changed = False
+
+    for rule in rule_set.rules:
+        # --- Reset Logic: the block lasts until the end of the window it was activated in ---
+        if rule.block_activated_today and current_time >= rule.blocked_until:
+            if rule.blocked_until.time() == datetime.time():
+                log_status_func(f"New day ({current_date}). Resetting block for {rule.app_name}.")
+            else:
+                log_status_func(f"Block for {rule.app_name} ended at {rule.blocked_until.strftime('%H:%M')}.")
+            rule.lift_block()
+            events.append((current_time.timestamp(), rule.key, BLOCK_ENDED, 0))
+            state_changed = True
+            last_status_messages.pop(rule.key, None)
+
+        # --- Block Activation Logic ---
+        if not rule.block_activated_today:
+            blocked_until = rule.schedule.blocked_until(current_time)
+            if blocked_until is not None:
+                log_status_func(f"Blocked time reached. Activating block for {rule.app_name} until {_format_transition(blocked_until, current_time)}.")
+                rule.activate_block(blocked_until, current_date)
+                events.append((current_time.timestamp(), rule.key, BLOCK_ACTIVATED, 0))
+                state_changed = True
+                last_status_messages.pop(rule.key, None)
+
+        if rule.block_activated_today:
+            current_message = f"Blocking {rule.app_name}. Access denied until {_format_transition(rule.blocked_until, current_time)}."
+        else:
+            block_start = rule.schedule.next_block_start(current_time)
+            current_message = (f"Monitoring {rule.app_name}. Allowed until {_format_transition(block_start, current_time)}."
+                               if block_start else f"Monitoring {rule.app_name}. No blocked time is scheduled.")
+        if current_message != last_status_messages.get(rule.key):
+            log_status_func(current_message)
+            last_status_messages[rule.key] = current_message
+
+    return state_changed
+
+def _format_transition(when, current_time):
+    """"17:00" today, "tomorrow" for the coming midnight, else "Sat 09:00"."""
+    if when.date() == current_time.date():
+        return when.strftime('%H:%M')
+    if when == datetime.datetime.combine(current_time.date() + datetime.timedelta(days=1), datetime.time()):
+        return "tomorrow"
+    return when.strftime('%a %H:%M')
+
+def monitor_rule_set(
+    rule_set,             # RuleSet from rules.py; rule block states are updated in place
     stop_event,
-    get_block_state_func, # Expected to return (block_activated_today, date_block_activated)
-    set_block_state_func, # Expected to take (block_activated_today, date_block_activated) and save config
+    save_rules_func,      # Called with the RuleSet after any rule's block state changed; should save the config
     log_status_func,
     call_after_func,      # For thread-safe calls to GUI or other main-thread functions
-    on_monitoring_stopped_func # Callback to inform GUI that monitoring has actually stopped
+    on_monitoring_stopped_func, # Callback to inform GUI that monitoring has actually stopped
+    process_watcher=None, # Optional watcher from process_watcher.py; the best available one is created if None
+    scan_cache=None,      # Optional ScanCache from scan_cache.py; a fresh one on `clock` is created if None
+    terminate_grace_period=DEFAULT_TERMINATE_GRACE_PERIOD, # Seconds between terminate and kill
+    on_ready_func=None,   # Called once, from the monitor thread, after the first evaluation and scan pass
+    config_store=None,    # Optional ConfigStore from config_store.py; edits to the file are applied without a restart
+    metrics=None,         # Optional MonitorMetrics from metrics.py to record into, e.g. for a MetricsExporter
+    usage_accountant=None, # Optional UsageAccountant from usage.py; records how long each target runs
+    scanner_backend="auto", # How a ScanCache created here reads the process table; see process_table.py
+    event_log=None,       # Optional EventLog from history.py; block changes and terminations are appended to it
+    clock=SYSTEM_CLOCK,   # now()/time()/monotonic(); see clock.py, or simulation.py for virtual time
+    sleeper=EVENT_SLEEPER, # sleep(seconds, stop_event) while idle
+    terminate_func=terminate_processes, # Called as terminate_func(procs, grace_period=...); returns a TerminationResult
+    respawn_guard=None,   # Optional RespawnGuard from respawn.py; a freezing one is created if None
+    profiler=None         # Optional Profiler from profiling.py; samples each tick while it is enabled
 ):
     """
-    Monitors the specified application and blocks it after the designated time.
-    This function is intended to be run in a separate thread.
+    Monitors every application in `rule_set` and blocks each one after its own cutoff time.
+    One pass over the process table per tick serves all rules, so scan cost does not grow
+    with the number of rules. This function is intended to be run in a separate thread.
+    With an event-driven watcher, new processes are checked as soon as they exec and the
+    full process table is only scanned once when a block becomes active. Either way, the
+    ScanCache means only processes not seen before have their executable resolved.
+    All matches found in a tick are terminated together, so clearing N instances takes one
+    grace period rather than N. While no block is active the thread sleeps until the next
+    cutoff or midnight instead of ticking every second.
+    With a `config_store`, the config file is checked every CONFIG_CHECK_INTERVAL and edited
+    rules and grace period are applied to the running loop in place.
+    Tick cost, scan activity and termination outcomes are recorded in `metrics`. With a
+    `usage_accountant`, running targets (blocked or not) are sampled every sample_interval.
+    With an `event_log`, each tick's block activations, block ends and terminations are
+    appended to it in one write.
+    What happens to a matched target is its rule's enforcement plan (enforcement.py): terminate
+    by default, or steps such as lowering its priority before the cutoff and freezing it after,
+    each undone when the block ends.
+    Launchers that keep restarting a terminated target are frozen by `respawn_guard` until the
+    block ends, so a respawn loop settles instead of thrashing.
+    Time is only read from `clock` (also by a ScanCache created here and by the usage samples;
+    pass a `scan_cache` built with the same clock) and idle waits go through `sleeper` (busy
+    waits through the process watcher), so with the doubles in simulation.py the loop runs on
+    virtual time. Only tick durations for `metrics` and the profiler are measured on the real
+    performance counter.
+    With a `profiler`, ticks (not idle waits) are sampled while profiling is turned on.
     """
-    target_app_full_path = app_path_val
-    if not target_app_full_path:
-        log_status_func("Critical Error: Target application path missing in monitor_loop.")
+    if not rule_set.rules:
+        log_status_func("Critical Error: No target applications configured in monitor_rule_set.")
         if on_monitoring_stopped_func: # Ensure GUI knows we stopped due to error
              call_after_func(on_monitoring_stopped_func)
         return
 
-    target_app_name = os.path.basename(target_app_full_path).lower()
-    last_status_message = ""
+    last_status_messages = {} # rule key -> last message logged for that rule
+
+    owns_watcher = process_watcher is None
+    if owns_watcher:
+        process_watcher = create_process_watcher(log_status_func)
+    # None means "scan the whole process table"; a set means "only these PIDs exec'd".
+    candidate_pids = None
+    full_scan_pending = False
+    owns_scan_cache = scan_cache is None
+    if owns_scan_cache:
+        scan_cache = ScanCache(process_table=create_process_table(scanner_backend, log_status_func), clock=clock)
+    last_enforced_keys = set()
+    next_transition_time = None # None means "evaluate the rules on the next pass"
+    due_steps = {} # rule key -> (rule, index of its enforcement step due now); see enforcement.py
+    next_step_time = None       # None means "work out the due steps on the next pass"
+    clock_jump_detector = ClockJumpDetector(monotonic=clock.monotonic)
+    if metrics is None:
+        metrics = MonitorMetrics()
+    if respawn_guard is None:
+        respawn_guard = RespawnGuard()
+    enforcer = Enforcer()
 
-    log_status_func(f"Monitoring thread will observe {target_app_name}. Block after {end_hour_val:02d}:{end_minute_val:02d}.")
+    for rule in rule_set.rules:
+        if rule.schedule.config_values is not None:
+            log_status_func(f"Monitoring thread will observe {rule.app_name} on its weekly schedule.")
+        else:
+            log_status_func(f"Monitoring thread will observe {rule.app_name}. Block after {rule.end_hour:02d}:{rule.end_minute:02d}.")
+
+    reloaded_config = [] # Values delivered by config_store, applied at the start of the next pass
+    on_config_changed = reloaded_config.append
+    if config_store is not None:
+        config_store.subscribe(on_config_changed)
 
     while not stop_event.is_set():
+        tick_started = time.perf_counter()
+        if profiler is not None:
+            profiler.tick_started()
+        events = [] # History events of this tick, for event_log
         try:
-            current_time = datetime.datetime.now()
-            current_date = current_time.date()
-            # These values (end_hour_val, end_minute_val) are fixed when the thread starts.
-            # If they need to be dynamic, they'd have to be fetched via a callback too.
-            end_time_today = current_time.replace(hour=end_hour_val, minute=end_minute_val, second=0, microsecond=0)
-
-            block_activated_today, date_block_activated = get_block_state_func()
-
-            # --- Daily Reset Logic ---
-            if block_activated_today and date_block_activated and current_date > date_block_activated:
-                log_status_func(f"New day ({current_date}). Resetting block for {target_app_name}.")
-                block_activated_today = False
-                date_block_activated = None 
-                set_block_state_func(block_activated_today, date_block_activated) # This call should handle saving the config.
-                last_status_message = "" 
-
-            # --- Block Activation Logic ---
-            if not block_activated_today and current_time >= end_time_today:
-                log_status_func(f"End time {end_time_today.strftime('%H:%M')} reached. Activating block for {target_app_name}.")
-                block_activated_today = True
-                date_block_activated = current_date
-                set_block_state_func(block_activated_today, date_block_activated) # This call should handle saving the config.
-                last_status_message = ""
-
-            # --- Process Killing Logic ---
-            if block_activated_today:
-                current_message = f"Blocking {target_app_name}. Access denied until tomorrow."
-                if current_message != last_status_message:
-                    log_status_func(current_message)
-                    last_status_message = current_message
-
-                for proc in psutil.process_iter(['pid', 'name', 'exe']):
+            if config_store is not None:
+                config_store.poll()
+            if reloaded_config:
+                config_values = reloaded_config[-1]
+                del reloaded_config[:]
+                terminate_grace_period = config_values["terminate_grace_period"]
+                if rule_set.merge_config(config_values["rules"]):
+                    log_status_func(f"Configuration changed. Now monitoring {len(rule_set)} application(s).")
+                    save_rules_func(rule_set) # Persist any block state the file was missing
+                    next_transition_time = None
+
+            current_time = clock.now()
+            if clock_jump_detector.jumped(current_time):
+                log_status_func(f"System clock changed (now {current_time.strftime('%Y-%m-%d %H:%M')}). Re-evaluating schedule.")
+                next_transition_time = None
+
+            # Rules can only change state at a cutoff or at midnight, so between those they are not re-evaluated.
+            if next_transition_time is None or current_time >= next_transition_time:
+                state_changed = _apply_schedule(rule_set, current_time, last_status_messages, log_status_func, events)
+                if state_changed:
+                    save_rules_func(rule_set) # This call should handle saving the config.
+                next_transition_time = next_transition(rule_set, current_time)
+                next_step_time = None
+
+            # Likewise, which enforcement step is due only changes at the times next_step_time() names.
+            if next_step_time is None or current_time >= next_step_time:
+                due_steps = enforcer.due_steps(rule_set, current_time)
+                next_step_time = enforcer.next_step_time(rule_set, current_time) or next_transition_time
+
+            # --- Enforcement Logic: terminate blocked targets, or whatever step of their rule's plan is due ---
+            enforced_keys = due_steps.keys()
+            recheck_all = False
+            if enforced_keys != last_enforced_keys:
+                if not last_enforced_keys:
+                    # Nothing was scanned while no rule was enforced, so cached entries may be stale.
+                    scan_cache.clear()
+                else:
+                    recheck_all = True # Cached processes may match a newly enforced rule
+                if enforced_keys - last_enforced_keys:
+                    candidate_pids = None # Targets may already be running, so do one full scan
+                last_enforced_keys = set(enforced_keys)
+                if respawn_guard.frozen:
+                    respawn_guard.release(enforced_keys, log_status_func)
+
+            if due_steps:
+                totals_before = _scan_totals(scan_cache)
+                matches = scan_cache.find_matches(rule_set.pipeline_for(enforced_keys), candidate_pids, recheck_all)
+                _record_scan(metrics, totals_before, _scan_totals(scan_cache))
+                metrics.matches.inc(len(matches))
+                matches, steps_applied = enforcer.enforce(matches, due_steps, log_status_func)
+                metrics.enforcement_steps.inc(steps_applied)
+                if matches:
                     try:
-                        proc_exe = proc.info.get('exe')
-                        if proc_exe and os.path.normcase(proc_exe) == os.path.normcase(target_app_full_path):
-                            log_status_func(f"Found running instance of {target_app_name} (PID: {proc.pid}). Terminating...")
-                            proc.terminate()
-                            try:
-                                proc.wait(timeout=1) # Wait for graceful termination
-                            except psutil.TimeoutExpired:
-                                log_status_func(f"Force killing {target_app_name} (PID: {proc.pid}) after timeout.")
-                                proc.kill() # Force kill if terminate didn't work
-                            log_status_func(f"{target_app_name} (PID: {proc.pid}) terminated.")
-                    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                        # Process might have terminated, or we don't have permissions.
-                        # LogAccessDenied if it's frequent and unexpected.
-                        pass 
+                        _terminate_matches(matches, terminate_grace_period, log_status_func, metrics, events, terminate_func, clock,
+                                           respawn_guard, scan_cache.process_table)
                     except Exception as e_proc:
-                        proc_name_str = "unknown_process"
-                        try:
-                            proc_name_str = proc.name()
-                        except (psutil.NoSuchProcess, psutil.AccessDenied):
-                             pass # Can't get name, use default
-                        log_status_func(f"Error checking/terminating '{proc_name_str}' (PID: {proc.pid if proc else 'N/A'}): {e_proc}")
-            else: # Not blocked yet for today
-                current_message = f"Monitoring {target_app_name}. Allowed until {end_time_today.strftime('%H:%M')}."
-                if current_message != last_status_message:
-                    log_status_func(current_message)
-                    last_status_message = current_message
-        
+                        pids_str = ", ".join(str(proc.pid) for proc, rule in matches)
+                        log_status_func(f"Error terminating processes (PIDs: {pids_str}): {e_proc}")
+            elif len(enforcer):
+                enforcer.release(log_status_func)
+
+            if usage_accountant is not None and usage_accountant.sample_due(clock.monotonic()):
+                try:
+                    usage_accountant.sample(scan_cache.running_targets(rule_set.pipeline),
+                                            now=clock.time(), now_monotonic=clock.monotonic())
+                except OSError as e_usage:
+                    log_status_func(f"Error recording usage: {e_usage}")
+
+            if events and event_log is not None:
+                try:
+                    event_log.append(events)
+                except OSError as e_history:
+                    log_status_func(f"Error recording history: {e_history}")
+
         except Exception as e_loop:
             log_status_func(f"Major error in monitoring loop: {e_loop}. Loop will attempt to continue.")
-            last_status_message = "" # Reset message to ensure it re-logs after error
+            last_status_messages.clear() # Reset messages to ensure they re-log after error
             # Consider adding a small delay here if errors are rapid.
-            time.sleep(5) # Wait 5 seconds after a major error to prevent tight error loops
+            sleeper.sleep(5, stop_event) # Wait 5 seconds after a major error to prevent tight error loops
+            full_scan_pending = True # Exec events may have been missed while handling the error
+            next_transition_time = None
+
+        metrics.ticks.inc()
+        metrics.tick_duration.observe(time.perf_counter() - tick_started)
+        if profiler is not None:
+            profiler.tick_finished()
+
+        if on_ready_func:
+            on_ready_func()
+            on_ready_func = None
+
+        # --- Sleep until the next thing that needs doing ---
+        wake_time = clock.now()
+        sleep_seconds = seconds_until(next_transition_time, wake_time) if next_transition_time else POLL_INTERVAL
+        if next_step_time is not None:
+            sleep_seconds = min(sleep_seconds, seconds_until(next_step_time, wake_time))
+        clock_jump_detector.start(wake_time)
+        if config_store is not None:
+            sleep_seconds = min(sleep_seconds, CONFIG_CHECK_INTERVAL)
+        if usage_accountant is not None:
+            sleep_seconds = min(sleep_seconds, usage_accountant.sample_interval)
+        if last_enforced_keys:
+            # An event-driven watcher wakes us as soon as something execs; a polling one has to tick.
+            if not process_watcher.event_driven:
+                sleep_seconds = min(sleep_seconds, POLL_INTERVAL)
+            if scan_cache.waiting_for_digests:
+                sleep_seconds = min(sleep_seconds, DIGEST_RECHECK_INTERVAL)
+            candidate_pids = process_watcher.wait_for_exec(sleep_seconds, stop_event)
+        else:
+            # Nothing to enforce until the next cutoff, so don't scan (other than usage samples).
+            sleeper.sleep(sleep_seconds, stop_event)
+            candidate_pids = None
+        if full_scan_pending:
+            candidate_pids = None
+            full_scan_pending = False
 
-        # Wait for the stop event or timeout. Check more frequently for responsiveness.
-        stop_event.wait(timeout=1.0) 
+    respawn_guard.release((), log_status_func) # Never leave a launcher frozen once we stop enforcing
+    enforcer.release(log_status_func) # Nor a target frozen, capped or deprioritized
+    if owns_watcher:
+        process_watcher.close()
+    if owns_scan_cache:
+        scan_cache.close()
+    if config_store is not None:
+        config_store.unsubscribe(on_config_changed)
+    if usage_accountant is not None:
+        try:
+            usage_accountant.close(now=clock.time())
+        except OSError as e_usage:
+            log_status_func(f"Error recording usage: {e_usage}")
 
-    log_status_func(f"Monitoring thread for {target_app_name} has gracefully stopped.")
+    log_status_func(f"Monitoring thread for {len(rule_set)} application(s) has gracefully stopped.")
     if on_monitoring_stopped_func: # Ensure GUI knows we stopped
         call_after_func(on_monitoring_stopped_func)
+
+def monitor_loop(
+    app_path_val,
+    end_hour_val,
+    end_minute_val,
+    stop_event,
+    get_block_state_func, # Expected to return (block_activated_today, date_block_activated)
+    set_block_state_func, # Expected to take (block_activated_today, date_block_activated) and save config
+    log_status_func,
+    call_after_func,      # For thread-safe calls to GUI or other main-thread functions
+    on_monitoring_stopped_func, # Callback to inform GUI that monitoring has actually stopped
+    process_watcher=None, # Optional watcher from process_watcher.py; the best available one is created if None
+    scan_cache=None,      # Optional ScanCache from scan_cache.py
+    terminate_grace_period=DEFAULT_TERMINATE_GRACE_PERIOD,
+    metrics=None          # Optional MonitorMetrics from metrics.py
+):
+    """
+    Monitors the specified application and blocks it after the designated time.
+    Single-target wrapper around monitor_rule_set(). Intended to be run in a separate thread.
+    """
+    target_app_full_path = app_path_val
+    if not target_app_full_path:
+        log_status_func("Critical Error: Target application path missing in monitor_loop.")
+        if on_monitoring_stopped_func: # Ensure GUI knows we stopped due to error
+             call_after_func(on_monitoring_stopped_func)
+        return
+
+    block_activated_today, date_block_activated = get_block_state_func()
+    rule = BlockRule(target_app_full_path, end_hour_val, end_minute_val, block_activated_today, date_block_activated)
+
+    def save_rule_state(rule_set):
+        set_block_state_func(rule.block_activated_today, rule.date_block_activated)
+
+    monitor_rule_set(
+        RuleSet([rule]),
+        stop_event,
+        save_rule_state,
+        log_status_func,
+        call_after_func,
+        on_monitoring_stopped_func,
+        process_watcher,
+        scan_cache,
+        terminate_grace_period,
+        metrics=metrics
+    )
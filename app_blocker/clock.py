@@ -0,0 +1,33 @@
+"""
+Time sources and sleeping for the monitor loop.
+
+monitor_rule_set() reads the time and sleeps only through a clock and a sleeper, so tests can
+swap in the virtual ones from simulation.py and fast-forward through weeks of schedule in
+milliseconds. These are the real ones.
+"""
+import datetime
+import time
+
+
+class SystemClock:
+    """The machine's clock. now() is naive local time, as the schedule code expects."""
+
+    def now(self):
+        return datetime.datetime.now()
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+
+class EventSleeper:
+    """Sleeps by waiting on the stop event, so a stop request cuts the sleep short."""
+
+    def sleep(self, seconds, stop_event):
+        stop_event.wait(timeout=seconds)
+
+
+SYSTEM_CLOCK = SystemClock()
+EVENT_SLEEPER = EventSleeper()
@@ -1,12 +1,19 @@
+import contextlib
 import os
 import json
 import datetime
+import re
+import tempfile
+
+from .enforcement import EnforcementPlan
+from .process_table import SCANNER_BACKENDS
+from .scheduler import WeeklySchedule
+from .terminator import DEFAULT_TERMINATE_GRACE_PERIOD # Seconds a blocked app gets to exit before it is killed
 
 CONFIG_FILE_NAME = "app_blocker_config_wx_v2.json"
 APP_DATA_DIR = os.path.join(os.path.expanduser("~"), "AppData", "Local", "AppBlockerWxV2")
-if not os.path.exists(APP_DATA_DIR):
-    os.makedirs(APP_DATA_DIR)
 CONFIG_FILE_PATH = os.path.join(APP_DATA_DIR, CONFIG_FILE_NAME)
+FILE_LOCK_ATTEMPTS = 3 # Windows only: each waits about 10 seconds; see file_lock()
 
 # Default values
 DEFAULT_APP_PATH = ""
@@ -15,74 +22,401 @@ DEFAULT_END_MINUTE = 0
 DEFAULT_BLOCK_ACTIVATED_TODAY = False
 DEFAULT_DATE_BLOCK_ACTIVATED = None
 DEFAULT_LANGUAGE = "en" # Default language
+FSYNC_POLICIES = ("always", "file", "never") # always: file and directory, file: file only, never: leave it to the OS
+DEFAULT_FSYNC_POLICY = "always"
+DEFAULT_SCANNER_BACKEND = "auto" # How the process table is read: auto, procfs or psutil; see process_table.py
+DEFAULT_PROFILING = False # Sample the monitor and time UI handlers; see profiling.py
+DEFAULT_RULES = [] # Blocked targets, each with its own cutoff and block state; see rules.py
+
+def _parse_block_state(block_activated_today, date_str):
+    """Returns (block_activated_today, date_block_activated), resetting blocks from past days."""
+    date_block_activated = DEFAULT_DATE_BLOCK_ACTIVATED
+    if block_activated_today and date_str:
+        try:
+            saved_block_date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+            if saved_block_date == datetime.date.today():
+                date_block_activated = saved_block_date
+            elif saved_block_date < datetime.date.today():
+                # Past date, so reset block_activated_today
+                block_activated_today = False
+            # else: future date, or malformed, treat as not blocked for today (keep defaults)
+        except ValueError:
+            block_activated_today = False # Malformed date string
+    else:
+        # If not block_activated_today or no date_str, ensure it's reset
+        block_activated_today = False
+    return block_activated_today, date_block_activated
+
+def _parse_rule_block_state(raw_rule):
+    """
+    Returns (block_activated_today, date_block_activated, blocked_until) for a rule. A block with
+    a blocked_until (written since weekly schedules) lasts until then, even across midnight;
+    one without falls back to the daily rule of _parse_block_state().
+    """
+    block_activated_today = raw_rule.get("block_activated_today", DEFAULT_BLOCK_ACTIVATED_TODAY)
+    date_str = raw_rule.get("date_block_activated", None)
+    if block_activated_today and raw_rule.get("blocked_until") and date_str:
+        try:
+            blocked_until = datetime.datetime.fromisoformat(raw_rule["blocked_until"])
+            date_block_activated = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            return False, DEFAULT_DATE_BLOCK_ACTIVATED, None
+        if blocked_until > datetime.datetime.now():
+            return True, date_block_activated, blocked_until
+        return False, DEFAULT_DATE_BLOCK_ACTIVATED, None
+    return _parse_block_state(block_activated_today, date_str) + (None,)
+
+def _parse_matcher_fields(raw_rule):
+    """
+    Returns the optional matcher fields of a rule (see matchers.py) that are set and valid:
+    process_name, uids (a list of ints), cmdline_pattern (a regular expression) and exe_sha256
+    (the hex SHA-256 of the executable, as printed by `python -m app_blocker.fingerprint`).
+    """
+    matcher_fields = {}
+    if raw_rule.get("process_name"):
+        matcher_fields["process_name"] = str(raw_rule["process_name"])
+    if raw_rule.get("uids"):
+        matcher_fields["uids"] = [int(uid) for uid in raw_rule["uids"]]
+    if raw_rule.get("cmdline_pattern"):
+        re.compile(raw_rule["cmdline_pattern"]) # Raises re.error
+        matcher_fields["cmdline_pattern"] = raw_rule["cmdline_pattern"]
+    if raw_rule.get("exe_sha256"):
+        exe_sha256 = str(raw_rule["exe_sha256"]).lower()
+        if len(exe_sha256) != 64 or not set(exe_sha256) <= set("0123456789abcdef"):
+            raise ValueError("exe_sha256 must be 64 hexadecimal digits")
+        matcher_fields["exe_sha256"] = exe_sha256
+    return matcher_fields
+
+def _parse_rule_cutoff(raw_rule):
+    """Returns a rule's (end_hour, end_minute). Raises TypeError or ValueError if they are not a time of day."""
+    end_hour = int(raw_rule.get("end_hour", DEFAULT_END_HOUR))
+    end_minute = int(raw_rule.get("end_minute", DEFAULT_END_MINUTE))
+    if not (0 <= end_hour <= 23 and 0 <= end_minute <= 59):
+        raise ValueError(f"{end_hour}:{end_minute:02d} is not a time of day")
+    return end_hour, end_minute
+
+def parse_rule(raw_rule):
+    """
+    Validates one entry of the config's "rules" list. Returns the rule dict, or None if it
+    matches nothing (no app_path, process_name, cmdline_pattern or exe_sha256). Raises
+    ValueError if it is not an object or has an invalid app_path, cutoff, matcher field,
+    schedule or enforcement plan.
+    """
+    if not isinstance(raw_rule, dict):
+        raise ValueError("not an object")
+    if not isinstance(raw_rule.get("app_path", ""), str):
+        raise ValueError("invalid app_path")
+    try:
+        end_hour, end_minute = _parse_rule_cutoff(raw_rule)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"invalid end_hour/end_minute: {e}")
+    try:
+        matcher_fields = _parse_matcher_fields(raw_rule)
+    except (TypeError, ValueError, re.error) as e:
+        raise ValueError(f"invalid matcher fields: {e}")
+    if not raw_rule.get("app_path") and not (matcher_fields.keys() - {"uids"}):
+        return None
+    if raw_rule.get("schedule"):
+        try:
+            WeeklySchedule.from_config(raw_rule["schedule"])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"invalid schedule: {e}")
+        matcher_fields["schedule"] = raw_rule["schedule"]
+    if raw_rule.get("enforcement"):
+        try:
+            EnforcementPlan.from_config(raw_rule["enforcement"])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"invalid enforcement plan: {e}")
+        matcher_fields["enforcement"] = raw_rule["enforcement"]
+    if raw_rule.get("match_renamed"):
+        if not isinstance(raw_rule["match_renamed"], bool):
+            raise ValueError("invalid match_renamed: must be true or false")
+        matcher_fields["match_renamed"] = True
+    block_activated_today, date_block_activated, blocked_until = _parse_rule_block_state(raw_rule)
+    if blocked_until is not None:
+        matcher_fields["blocked_until"] = blocked_until
+    return {
+        "app_path": raw_rule.get("app_path", ""),
+        "end_hour": end_hour,
+        "end_minute": end_minute,
+        "block_activated_today": block_activated_today,
+        "date_block_activated": date_block_activated,
+        **matcher_fields
+    }
+
+def _parse_rules(raw_rules):
+    """
+    Validates the "rules" list from the config file. Invalid entries are logged and dropped, as
+    are entries that match nothing; the other rules are kept.
+    """
+    rules = []
+    for raw_rule in raw_rules:
+        try:
+            rule = parse_rule(raw_rule)
+        except ValueError as e:
+            print(f"Ignoring rule {raw_rule!r}: {e}")
+            continue
+        if rule is not None:
+            rules.append(rule)
+    return rules
+
+def ensure_app_data_dir():
+    """Creates the app data directory if needed. Called lazily, on first write, not at import."""
+    os.makedirs(APP_DATA_DIR, exist_ok=True)
+
+@contextlib.contextmanager
+def file_lock(lock_path):
+    """
+    Holds an exclusive lock on `lock_path` (created if missing) for the duration of the block,
+    so that the window and a headless daemon sharing the app data directory take turns. On
+    Windows, raises OSError if the lock is still held by someone else after about
+    FILE_LOCK_ATTEMPTS * 10 seconds.
+    """
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if os.name == "nt":
+            import msvcrt
+            for attempt in range(FILE_LOCK_ATTEMPTS):
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1) # Retries for about 10 seconds before giving up
+                    break
+                except OSError:
+                    if attempt == FILE_LOCK_ATTEMPTS - 1:
+                        raise
+            try:
+                yield
+            finally:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield # Closing the file releases the lock
+    finally:
+        os.close(fd)
+
+class AppRecordLog:
+    """
+    Append-only file of fixed-size records (`record`, a struct.Struct) that refer to applications
+    by small integer ids: indexes into the JSON list of app keys at `apps_path`. The window and a
+    headless daemon may append to the same files, so ids are assigned under a file_lock. Used by
+    usage.UsageLog and history.EventLog, which pack and unpack the records.
+    """
+
+    def __init__(self, path, apps_path, record):
+        self.path = path
+        self.apps_path = apps_path
+        self.record = record
+        self.apps = self.load_apps()
+        self._app_ids = {app_key: app_id for app_id, app_key in enumerate(self.apps)}
+
+    def load_apps(self):
+        try:
+            with open(self.apps_path, "r") as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return []
+
+    def _app_id(self, app_key):
+        if app_key not in self._app_ids:
+            ensure_app_data_dir()
+            # Reread the file under the lock, so an id another writer assigned meanwhile is reused
+            # rather than handed out twice. The file wins even if it no longer starts with our list
+            # (e.g. it was reset): readers resolve ids through it, so writing ours back would
+            # relabel every record written since.
+            with file_lock(self.apps_path + ".lock"):
+                self.apps = self.load_apps()
+                self._app_ids = {key: app_id for app_id, key in enumerate(self.apps)}
+                if app_key not in self._app_ids:
+                    self._app_ids[app_key] = len(self.apps)
+                    self.apps.append(app_key)
+                    # Written before any record that uses the id, so readers never see an id without its app.
+                    fd, temp_path = tempfile.mkstemp(prefix=".apps-", suffix=".tmp", dir=os.path.dirname(self.apps_path))
+                    with os.fdopen(fd, "w") as f:
+                        json.dump(self.apps, f)
+                    os.replace(temp_path, self.apps_path)
+        return self._app_ids[app_key]
+
+    def _write(self, data):
+        """Appends packed records, which must only use ids from _app_id()."""
+        if not data:
+            return
+        ensure_app_data_dir()
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+    def read(self, offset=0):
+        """Returns the whole records stored from byte `offset` on."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return b""
+        # Ignore a partial record left by a crash mid-append (or still being written).
+        return data[:len(data) - len(data) % self.record.size]
+
+def default_config_values():
+    """Returns the values used when there is no config file."""
+    return {
+        "app_path": DEFAULT_APP_PATH,
+        "end_hour": DEFAULT_END_HOUR,
+        "end_minute": DEFAULT_END_MINUTE,
+        "block_activated_today": DEFAULT_BLOCK_ACTIVATED_TODAY,
+        "date_block_activated": DEFAULT_DATE_BLOCK_ACTIVATED,
+        "language": DEFAULT_LANGUAGE,
+        "terminate_grace_period": DEFAULT_TERMINATE_GRACE_PERIOD,
+        "fsync_policy": DEFAULT_FSYNC_POLICY,
+        "scanner_backend": DEFAULT_SCANNER_BACKEND,
+        "profiling": DEFAULT_PROFILING,
+        "rules": list(DEFAULT_RULES)
+    }
+
+def config_values_from_data(config_data):
+    """Validates the parsed JSON of a config file. Raises ValueError if it is not usable."""
+    if not isinstance(config_data, dict):
+        raise ValueError("Config file does not contain a JSON object")
+
+    app_path = config_data.get("app_path", DEFAULT_APP_PATH)
+    end_hour = int(config_data.get("end_hour", DEFAULT_END_HOUR))
+    end_minute = int(config_data.get("end_minute", DEFAULT_END_MINUTE))
+
+    # Date validation and reset logic
+    block_activated_today, date_block_activated = _parse_block_state(
+        config_data.get("block_activated_today", DEFAULT_BLOCK_ACTIVATED_TODAY),
+        config_data.get("date_block_activated", None)
+    )
+    language = config_data.get("language", DEFAULT_LANGUAGE)
+    terminate_grace_period = float(config_data.get("terminate_grace_period", DEFAULT_TERMINATE_GRACE_PERIOD))
+    fsync_policy = config_data.get("fsync_policy", DEFAULT_FSYNC_POLICY)
+    if fsync_policy not in FSYNC_POLICIES:
+        fsync_policy = DEFAULT_FSYNC_POLICY
+    scanner_backend = config_data.get("scanner_backend", DEFAULT_SCANNER_BACKEND)
+    if scanner_backend not in SCANNER_BACKENDS:
+        scanner_backend = DEFAULT_SCANNER_BACKEND
+    profiling = config_data.get("profiling", DEFAULT_PROFILING) is True
+
+    if "rules" in config_data:
+        rules = _parse_rules(config_data["rules"])
+    elif app_path:
+        # Older config files only have the single top-level target
+        rules = [{
+            "app_path": app_path,
+            "end_hour": end_hour,
+            "end_minute": end_minute,
+            "block_activated_today": block_activated_today,
+            "date_block_activated": date_block_activated
+        }]
+    else:
+        rules = list(DEFAULT_RULES)
+
+    return {
+        "app_path": app_path,
+        "end_hour": end_hour,
+        "end_minute": end_minute,
+        "block_activated_today": block_activated_today,
+        "date_block_activated": date_block_activated,
+        "language": language,
+        "terminate_grace_period": terminate_grace_period,
+        "fsync_policy": fsync_policy,
+        "scanner_backend": scanner_backend,
+        "profiling": profiling,
+        "rules": rules
+    }
+
+def read_config_file():
+    """Reads and validates the config file. Raises OSError or ValueError instead of falling back to defaults."""
+    with open(CONFIG_FILE_PATH, "r") as f:
+        return config_values_from_data(json.load(f))
 
 def load_config_from_file():
     """Loads configuration from the JSON file."""
     try:
         if os.path.exists(CONFIG_FILE_PATH):
-            with open(CONFIG_FILE_PATH, "r") as f:
-                config_data = json.load(f)
-                
-                app_path = config_data.get("app_path", DEFAULT_APP_PATH)
-                end_hour = int(config_data.get("end_hour", DEFAULT_END_HOUR))
-                end_minute = int(config_data.get("end_minute", DEFAULT_END_MINUTE))
-                
-                # Date validation and reset logic
-                block_activated_today = config_data.get("block_activated_today", DEFAULT_BLOCK_ACTIVATED_TODAY)
-                date_str = config_data.get("date_block_activated", None)
-                date_block_activated = DEFAULT_DATE_BLOCK_ACTIVATED
-                language = config_data.get("language", DEFAULT_LANGUAGE)
-
-                if block_activated_today and date_str:
-                    try:
-                        saved_block_date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-                        if saved_block_date == datetime.date.today():
-                            date_block_activated = saved_block_date
-                        elif saved_block_date < datetime.date.today():
-                            # Past date, so reset block_activated_today
-                            block_activated_today = False
-                        # else: future date, or malformed, treat as not blocked for today (keep defaults)
-                    except ValueError:
-                        block_activated_today = False # Malformed date string
-                else:
-                    # If not block_activated_today or no date_str, ensure it's reset
-                    block_activated_today = False
-                
-                return {
-                    "app_path": app_path,
-                    "end_hour": end_hour,
-                    "end_minute": end_minute,
-                    "block_activated_today": block_activated_today,
-                    "date_block_activated": date_block_activated,
-                    "language": language
-                }
+            return read_config_file()
     except (IOError, ValueError, json.JSONDecodeError) as e:
         # Log this error appropriately in the main app, e.g., self.log_status(f"Error loading config: {e}")
         print(f"Error loading config from {CONFIG_FILE_PATH}: {e}. Using defaults.")
     
     # Return defaults if file doesn't exist or an error occurred
-    return {
-        "app_path": DEFAULT_APP_PATH,
-        "end_hour": DEFAULT_END_HOUR,
-        "end_minute": DEFAULT_END_MINUTE,
-        "block_activated_today": DEFAULT_BLOCK_ACTIVATED_TODAY,
-        "date_block_activated": DEFAULT_DATE_BLOCK_ACTIVATED,
-        "language": DEFAULT_LANGUAGE
-    }
+    return default_config_values()
 
-def save_config_to_file(app_path, end_hour, end_minute, block_activated_today, date_block_activated, language):
-    """Saves configuration to the JSON file."""
-    config_to_save = {
+def build_config_to_save(app_path, end_hour, end_minute, block_activated_today, date_block_activated, language, rules=None,
+                         terminate_grace_period=DEFAULT_TERMINATE_GRACE_PERIOD, fsync_policy=DEFAULT_FSYNC_POLICY,
+                         scanner_backend=DEFAULT_SCANNER_BACKEND, profiling=DEFAULT_PROFILING):
+    """
+    Returns the JSON-ready dict that save_config_to_file() writes.
+    `rules` is the full list of rule dicts (see rules.py); if omitted, only the top-level target is saved as a rule.
+    """
+    if rules is None:
+        rules = [{
+            "app_path": app_path,
+            "end_hour": end_hour,
+            "end_minute": end_minute,
+            "block_activated_today": block_activated_today,
+            "date_block_activated": date_block_activated
+        }] if app_path else []
+    return {
         "app_path": app_path,
         "end_hour": end_hour,
         "end_minute": end_minute,
         "block_activated_today": block_activated_today,
         "date_block_activated": date_block_activated.isoformat() if date_block_activated else None,
-        "language": language
+        "language": language,
+        "terminate_grace_period": terminate_grace_period,
+        "fsync_policy": fsync_policy,
+        "scanner_backend": scanner_backend,
+        "profiling": profiling,
+        "rules": [
+            dict(rule,
+                 date_block_activated=rule["date_block_activated"].isoformat() if rule.get("date_block_activated") else None,
+                 **({"blocked_until": rule["blocked_until"].isoformat()} if rule.get("blocked_until") else {}))
+            for rule in rules
+        ]
     }
+
+def write_config_atomically(config_to_save):
+    """
+    Writes `config_to_save` to a temp file in the same directory and renames it over the config file,
+    so a crash mid-write leaves either the old or the new file, never a truncated one.
+    Raises OSError on failure.
+    """
+    fsync_policy = config_to_save.get("fsync_policy", DEFAULT_FSYNC_POLICY)
+    ensure_app_data_dir()
+    config_dir = os.path.dirname(CONFIG_FILE_PATH)
+    fd, temp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=config_dir)
     try:
-        with open(CONFIG_FILE_PATH, "w") as f:
+        with os.fdopen(fd, "w") as f:
             json.dump(config_to_save, f, indent=4)
+            if fsync_policy != "never":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, CONFIG_FILE_PATH)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    if fsync_policy == "always" and hasattr(os, "O_DIRECTORY"):
+        # Make the rename itself durable (POSIX only; Windows has no directory fsync).
+        dir_fd = os.open(config_dir, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def save_config_to_file(app_path, end_hour, end_minute, block_activated_today, date_block_activated, language, rules=None,
+                        terminate_grace_period=DEFAULT_TERMINATE_GRACE_PERIOD, fsync_policy=DEFAULT_FSYNC_POLICY,
+                        scanner_backend=DEFAULT_SCANNER_BACKEND, profiling=DEFAULT_PROFILING):
+    """
+    Saves configuration to the JSON file, synchronously and atomically.
+    Use config_store.ConfigWriter to save from threads that must not block on disk I/O.
+    """
+    config_to_save = build_config_to_save(app_path, end_hour, end_minute, block_activated_today, date_block_activated,
+                                          language, rules, terminate_grace_period, fsync_policy, scanner_backend, profiling)
+    try:
+        write_config_atomically(config_to_save)
         # Log this success in the main app, e.g., self.log_status("Configuration saved.")
         # print(f"Configuration saved to {CONFIG_FILE_PATH}") # For CLI debugging if needed
     except IOError as e:
@@ -0,0 +1,138 @@
+import os
+import threading
+
+from . import config
+
+# How long the writer waits after the first change before writing, so a burst of changes
+# (e.g. several rules activating at the same cutoff) becomes a single write.
+DEFAULT_COALESCE_DELAY = 0.5
+
+
+class ConfigWriter:
+    """
+    Write-behind config saver. save() takes the same arguments as config.save_config_to_file(),
+    only snapshots them and returns immediately; a background thread writes the latest snapshot
+    atomically. Saves that arrive while a write is pending replace it instead of queueing.
+    """
+
+    def __init__(self, coalesce_delay=DEFAULT_COALESCE_DELAY, log_error_func=print):
+        self._coalesce_delay = coalesce_delay
+        self._log_error_func = log_error_func
+        self._lock = threading.Lock()
+        self._pending = None              # Latest config dict not yet written
+        self._wakeup = threading.Event()  # Set when there is something to write
+        self._closing = threading.Event()
+        self._idle = threading.Event()    # Set when everything submitted has been written
+        self._idle.set()
+        self.writes = 0                   # Number of files actually written, for diagnostics
+        self._thread = threading.Thread(target=self._run, name="config-writer", daemon=True)
+        self._thread.start()
+
+    def save(self, *args, **kwargs):
+        """Queues a save. Never blocks on disk I/O, so it is safe to call from the monitor thread."""
+        config_to_save = config.build_config_to_save(*args, **kwargs)
+        with self._lock:
+            self._pending = config_to_save
+            self._idle.clear()
+        self._wakeup.set()
+
+    def flush(self, timeout=None):
+        """Waits until every queued save has been written. Returns False on timeout."""
+        return self._idle.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Writes anything still pending without waiting out the coalescing delay, then stops the thread."""
+        self._closing.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Let a burst of changes settle; close() cuts the wait short.
+            self._closing.wait(self._coalesce_delay)
+            with self._lock:
+                config_to_save = self._pending
+                self._pending = None
+                self._wakeup.clear()
+            if config_to_save is not None:
+                try:
+                    config.write_config_atomically(config_to_save)
+                    self.writes += 1
+                except OSError as e:
+                    self._log_error_func(f"Error saving config to {config.CONFIG_FILE_PATH}: {e}")
+            with self._lock:
+                if self._pending is None:
+                    self._idle.set()
+            if self._closing.is_set() and self._pending is None:
+                return
+
+
+class ConfigStore:
+    """
+    In-memory cache of the config file. get() costs a single stat() while the file is unchanged;
+    it is only re-read after its mtime, size or inode changed (atomic saves always change the inode).
+    Subscribers are called with the new values, on the thread that noticed the change, whenever
+    an edited file is picked up. Returned dicts are shared and must be treated as read-only.
+    """
+
+    def __init__(self, log_error_func=print):
+        self._log_error_func = log_error_func
+        self._lock = threading.Lock()
+        self._values = None
+        self._stat_key = None  # (mtime_ns, size, inode) of the file the cached values came from
+        self._subscribers = []
+        self.loads = 0         # Number of times the file was actually parsed, for diagnostics
+
+    def subscribe(self, callback):
+        """Registers `callback(values)` to be called after each change to the file is picked up."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def get(self):
+        """Returns the current config values, re-reading the file only if it changed."""
+        return self._refresh()[0]
+
+    def poll(self):
+        """Checks the file for changes and notifies subscribers. Returns True if the values changed."""
+        return self._refresh()[1]
+
+    def _refresh(self):
+        try:
+            stat_result = os.stat(config.CONFIG_FILE_PATH)
+            stat_key = (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+        except OSError:
+            stat_key = None
+
+        with self._lock:
+            if self._values is not None and stat_key == self._stat_key:
+                return self._values, False
+            previous = self._values
+            self._stat_key = stat_key
+            if stat_key is None:
+                # A missing file means "not configured yet", but deleting it must not wipe the
+                # rules of a monitor that is already running.
+                if previous is None:
+                    self._values = config.default_config_values()
+                return self._values, False
+            try:
+                values = config.read_config_file()
+            except (OSError, ValueError) as e:
+                # Probably caught mid-edit; keep the last good values until the file changes again.
+                self._log_error_func(f"Error loading config from {config.CONFIG_FILE_PATH}: {e}. Keeping previous settings.")
+                if previous is None:
+                    self._values = config.default_config_values()
+                return self._values, False
+            self.loads += 1
+            self._values = values
+            changed = previous is not None and values != previous
+            subscribers = list(self._subscribers) if changed else []
+
+        for callback in subscribers:
+            callback(values)
+        return values, changed
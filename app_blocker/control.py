@@ -0,0 +1,350 @@
+"""
+Local control API: JSON-RPC 2.0 over a Unix domain socket, one JSON message per line.
+
+    python -m app_blocker.control /run/app-blocker.sock status
+    python -m app_blocker.control /run/app-blocker.sock subscribe log status   # stream until Ctrl+C
+
+Methods:
+    status            {"monitoring", "rules", "blocked", "updated_at", ...} from the in-memory snapshot
+    rules             the current rules, as in the config file's "rules"
+    start_monitoring  asks the host (daemon or window) to start monitoring; result false if it already is
+    stop_monitoring   asks it to stop; result false if it is not monitoring
+    subscribe         {"topics": ["log", "status"]}: the connection then receives notifications
+                      {"method": "log", "params": {"message", "level"}} and
+                      {"method": "status", "params": <status>} as they happen
+    unsubscribe       {"topics": [...]}
+
+ControlServer runs an asyncio loop on its own thread, so any number of clients are served without
+the enforcement thread ever waiting on one. The host pushes state with update_status() and
+publish(), which only swap a dict or hand a message to the loop; requests never read the config
+file. A subscriber that cannot keep up loses its oldest notifications instead of queueing without
+bound. The socket is only accessible to the user running the blocker.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+
+DEFAULT_MAX_QUEUED_NOTIFICATIONS = 1000 # Per subscriber
+MAX_MESSAGE_BYTES = 64 * 1024
+TOPICS = ("log", "status")
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_message(message):
+    return json.dumps(message, default=_json_default).encode() + b"\n"
+
+
+def rules_snapshot(rule_set):
+    """Returns the rules of `rule_set` as config dicts with their "key" added, for update_status(rules=...)."""
+    return [dict(rule.to_config(), key=rule.key) for rule in rule_set.rules]
+
+
+class _Subscriber:
+    def __init__(self, max_queued):
+        self.topics = set()
+        self.queue = asyncio.Queue(max_queued)
+        self.dropped = 0
+
+    def offer(self, message):
+        if self.queue.full():
+            self.queue.get_nowait() # Drop the oldest; a slow client must not hold up the others
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+
+class ControlServer:
+    """
+    Serves the control API on `socket_path`. `start_monitoring_func` and `stop_monitoring_func`
+    are called on the server thread, must not block, and return False if there was nothing to do.
+    `metrics` (a MonitorMetrics) is included in status replies if given.
+    """
+
+    def __init__(self, socket_path, start_monitoring_func=None, stop_monitoring_func=None, metrics=None,
+                 max_queued=DEFAULT_MAX_QUEUED_NOTIFICATIONS, log_error_func=print):
+        self.socket_path = socket_path
+        self._start_monitoring_func = start_monitoring_func
+        self._stop_monitoring_func = stop_monitoring_func
+        self._metrics = metrics
+        self._max_queued = max_queued
+        self._log_error_func = log_error_func
+        self._status = {"monitoring": False, "rules": [], "blocked": [], "updated_at": None}
+        self._lock = threading.Lock() # Serializes update_status() calls from different threads
+        self._subscribers = set()
+        self._writers = set() # Open client connections, closed on shutdown
+        self._loop = None
+        self._stopped = None
+        self._thread = None
+        self.connections = 0 # Clients connected so far, for diagnostics
+
+    # --- Called by the host, from any thread ---
+
+    def update_status(self, **fields):
+        """Replaces fields of the status snapshot (e.g. monitoring=True, rules=rules_snapshot(rule_set))."""
+        with self._lock:
+            status = dict(self._status, **fields)
+            status["blocked"] = [rule["key"] for rule in status["rules"] if rule.get("block_activated_today")]
+            status["updated_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+            self._status = status # One reference swap, so readers always see a whole snapshot
+        self.publish("status", status)
+
+    def publish(self, topic, params):
+        """Sends a notification to every client subscribed to `topic`. Never blocks."""
+        if not self._subscribers or self._loop is None:
+            return # Nobody listening: costs the caller nothing
+        message = {"jsonrpc": "2.0", "method": topic, "params": params}
+        try:
+            self._loop.call_soon_threadsafe(self._fan_out, topic, message)
+        except RuntimeError:
+            pass # Loop already closed
+
+    def start(self):
+        """Starts listening on a background thread. Raises OSError if the socket cannot be created."""
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix domain sockets are not available on this platform")
+        listening = threading.Event()
+        errors = []
+        self._thread = threading.Thread(target=self._run, args=(listening, errors), name="control-server", daemon=True)
+        self._thread.start()
+        listening.wait()
+        if errors:
+            self._thread.join()
+            raise errors[0]
+
+    def close(self, timeout=5.0):
+        if self._loop is not None and self._stopped is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._stopped.set)
+            except RuntimeError:
+                pass
+        if self._thread:
+            self._thread.join(timeout)
+
+    # --- Server thread ---
+
+    def _bind(self):
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.remove(self.socket_path) # Left behind by a process that did not exit cleanly
+            else:
+                raise OSError(f"Another instance is already listening on {self.socket_path}")
+            finally:
+                probe.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o600) # Before listen(), so nobody else can ever connect
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _run(self, listening, errors):
+        try:
+            sock = self._bind()
+        except OSError as e:
+            errors.append(e)
+            listening.set()
+            return
+        asyncio.run(self._serve(sock, listening))
+
+    async def _serve(self, sock, listening):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        server = await asyncio.start_unix_server(self._handle_client, sock=sock, limit=MAX_MESSAGE_BYTES)
+        listening.set()
+        try:
+            await self._stopped.wait()
+        finally:
+            server.close()
+            for writer in list(self._writers):
+                writer.close() # Subscribed clients would otherwise keep the server open
+            await server.wait_closed()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+    def _fan_out(self, topic, message):
+        for subscriber in self._subscribers:
+            if topic in subscriber.topics:
+                subscriber.offer(message)
+
+    async def _handle_client(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        subscriber = _Subscriber(self._max_queued)
+        sender = asyncio.ensure_future(self._send_notifications(subscriber, writer))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError: # Longer than MAX_MESSAGE_BYTES
+                    writer.write(encode_message(self._error(None, INVALID_REQUEST, "Message too long")))
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                reply = self._handle_line(line, subscriber)
+                if reply is not None:
+                    writer.write(encode_message(reply))
+                    await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._subscribers.discard(subscriber)
+            self._writers.discard(writer)
+            sender.cancel()
+            writer.close()
+
+    async def _send_notifications(self, subscriber, writer):
+        try:
+            while True:
+                message = await subscriber.queue.get()
+                writer.write(encode_message(message))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    def _handle_line(self, line, subscriber):
+        try:
+            message = json.loads(line)
+        except ValueError as e:
+            return self._error(None, PARSE_ERROR, f"Parse error: {e}")
+        if isinstance(message, list):
+            if not message:
+                return self._error(None, INVALID_REQUEST, "Empty batch")
+            replies = [reply for reply in (self._handle_request(request, subscriber) for request in message) if reply]
+            return replies or None
+        return self._handle_request(message, subscriber)
+
+    def _handle_request(self, request, subscriber):
+        """Returns the response to one JSON-RPC request, or None for a notification."""
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+            return self._error(request.get("id") if isinstance(request, dict) else None, INVALID_REQUEST, "Invalid request")
+        request_id = request.get("id")
+        params = request.get("params", {})
+        handler = getattr(self, "_rpc_" + request["method"], None)
+        if handler is None:
+            reply = self._error(request_id, METHOD_NOT_FOUND, f"Unknown method {request['method']!r}")
+        elif not isinstance(params, dict):
+            reply = self._error(request_id, INVALID_PARAMS, "params must be an object")
+        else:
+            try:
+                reply = {"jsonrpc": "2.0", "id": request_id, "result": handler(subscriber, **params)}
+            except (TypeError, ValueError) as e:
+                reply = self._error(request_id, INVALID_PARAMS, str(e))
+            except Exception as e: # A bad request must not take the server down
+                self._log_error_func(f"Control request {request['method']} failed: {e}")
+                reply = self._error(request_id, INTERNAL_ERROR, str(e))
+        return reply if "id" in request else None
+
+    @staticmethod
+    def _error(request_id, code, message):
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+    # --- Methods ---
+
+    def _rpc_status(self, subscriber):
+        status = self._status
+        if self._metrics is not None:
+            status = dict(status, metrics=self._metrics.to_dict())
+        return status
+
+    def _rpc_rules(self, subscriber):
+        return self._status["rules"]
+
+    def _rpc_start_monitoring(self, subscriber):
+        if self._start_monitoring_func is None:
+            raise ValueError("Monitoring cannot be started from here")
+        return bool(self._start_monitoring_func())
+
+    def _rpc_stop_monitoring(self, subscriber):
+        if self._stop_monitoring_func is None:
+            raise ValueError("Monitoring cannot be stopped from here")
+        return bool(self._stop_monitoring_func())
+
+    def _rpc_subscribe(self, subscriber, topics=TOPICS):
+        unknown = set(topics) - set(TOPICS)
+        if unknown:
+            raise ValueError(f"Unknown topics {sorted(unknown)}")
+        subscriber.topics.update(topics)
+        self._subscribers.add(subscriber)
+        return sorted(subscriber.topics)
+
+    def _rpc_unsubscribe(self, subscriber, topics=TOPICS):
+        subscriber.topics.difference_update(topics)
+        if not subscriber.topics:
+            self._subscribers.discard(subscriber)
+        return sorted(subscriber.topics)
+
+
+class ControlLogHandler(logging.Handler):
+    """Forwards log records to the "log" topic of a ControlServer."""
+
+    def __init__(self, control_server):
+        super().__init__()
+        self.control_server = control_server
+
+    def emit(self, record):
+        self.control_server.publish("log", {"message": self.format(record), "level": record.levelname})
+
+
+def call(socket_path, method, params=None, timeout=5.0):
+    """Sends one request and returns its result. Raises OSError or RuntimeError (for an error reply)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(encode_message({"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}}))
+        reply = json.loads(sock.makefile("rb").readline())
+    if "error" in reply:
+        raise RuntimeError(reply["error"]["message"])
+    return reply["result"]
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) < 2:
+        print("Usage: python -m app_blocker.control SOCKET METHOD [TOPIC...]")
+        return 2
+    socket_path, method = args[0], args[1]
+    try:
+        if method != "subscribe":
+            print(json.dumps(call(socket_path, method), indent=4))
+            return 0
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendall(encode_message({"jsonrpc": "2.0", "id": 1, "method": "subscribe",
+                                         "params": {"topics": args[2:] or list(TOPICS)}}))
+            for line in sock.makefile("rb"):
+                print(line.decode().rstrip(), flush=True)
+    except (OSError, RuntimeError) as e:
+        print(f"Error: {e}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+Headless enforcement daemon: runs the monitor loop from the saved configuration without any GUI.
+
+    python -m app_blocker.daemon [--log-level INFO] [--log-file PATH] [--profile-startup]
+                                 [--metrics-file PATH] [--stats-port PORT] [--no-usage-tracking]
+                                 [--policy-url URL] [--policy-interval SECONDS] [--control-socket PATH]
+                                 [--profile]
+
+This module must never import wx, gui.py or the gettext UI setup in main.py.
+"""
+from . import startup # Imported first so --profile-startup covers everything below
+import argparse
+import logging
+import signal
+import sys
+import threading
+
+from .blocker import monitor_rule_set
+from .config_store import ConfigStore, ConfigWriter
+from .control import ControlLogHandler, ControlServer, rules_snapshot
+from .history import EventLog
+from .metrics import MetricsExporter, MonitorMetrics
+from .policy import DEFAULT_POLL_INTERVAL, PolicyClient, PolicySync
+from .profiling import Profiler
+from .rules import normalize_exe_path, rule_set_from_config
+from .usage import UsageAccountant
+
+startup.mark("imports")
+
+logger = logging.getLogger("app_blocker.daemon")
+
+
+def _save_rule_states(config_writer, config_values, rule_set):
+    """Persists the rule block states, mirroring the top-level target's state like the GUI does."""
+    app_path = config_values["app_path"]
+    primary_key = normalize_exe_path(app_path) if app_path else None
+    for rule in rule_set.rules:
+        if rule.key == primary_key:
+            config_values["end_hour"] = rule.end_hour
+            config_values["end_minute"] = rule.end_minute
+            config_values["block_activated_today"] = rule.block_activated_today
+            config_values["date_block_activated"] = rule.date_block_activated
+    config_values["rules"] = rule_set.to_config()
+    config_writer.save(
+        app_path,
+        config_values["end_hour"],
+        config_values["end_minute"],
+        config_values["block_activated_today"],
+        config_values["date_block_activated"],
+        config_values["language"],
+        config_values["rules"],
+        config_values["terminate_grace_period"],
+        config_values["fsync_policy"],
+        config_values["scanner_backend"],
+        config_values["profiling"]
+    )
+
+
+def _start_metrics_exporter(metrics, metrics_file, stats_port):
+    """Returns a started MetricsExporter, or None if exporting is off or could not be set up."""
+    if not metrics_file and stats_port is None:
+        return None
+    try:
+        exporter = MetricsExporter(metrics, textfile_path=metrics_file, http_port=stats_port, log_error_func=logger.error)
+    except OSError as e:
+        # Enforcement matters more than its statistics, so carry on without them.
+        logger.error(f"Could not start the stats endpoint on port {stats_port}: {e}")
+        return None
+    exporter.start()
+    if exporter.http_port is not None:
+        logger.info(f"Serving stats on http://127.0.0.1:{exporter.http_port}/stats")
+    return exporter
+
+
+class _MonitorRunner:
+    """
+    Owns the monitor thread, so the control socket can stop monitoring and start it again while
+    the daemon keeps running. `make_thread(stop_event)` returns a new, unstarted monitor thread.
+    """
+
+    def __init__(self, make_thread):
+        self._make_thread = make_thread
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = None
+        self.stop_requested = False # True if the current thread was asked to stop rather than ending by itself
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return False
+            self._stop_event = threading.Event()
+            self.stop_requested = False
+            self._thread = self._make_thread(self._stop_event)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        with self._lock:
+            if not self.running or self._stop_event.is_set():
+                return False
+            self.stop_requested = True
+            self._stop_event.set()
+            return True
+
+    def join(self):
+        if self._thread:
+            self._thread.join()
+
+
+def _start_control_server(socket_path, start_monitoring_func, stop_monitoring_func, metrics):
+    """Returns a started ControlServer, or None if it could not be set up."""
+    control_server = ControlServer(socket_path, start_monitoring_func, stop_monitoring_func, metrics, log_error_func=logger.error)
+    try:
+        control_server.start()
+    except OSError as e:
+        # As with the stats endpoint, enforcement matters more than being controllable.
+        logger.error(f"Could not start the control socket at {socket_path}: {e}")
+        return None
+    logger.info(f"Listening for control requests on {socket_path}")
+    return control_server
+
+
+def run(stop_event=None, profile_startup=False, metrics_file=None, stats_port=None, track_usage=True,
+        policy_url=None, policy_interval=DEFAULT_POLL_INTERVAL, control_socket=None, profile=False):
+    """
+    Loads the configuration and enforces it until `stop_event` is set. Returns an exit status.
+    With `profile_startup`, prints the startup phase timings once enforcement is ready and stops.
+    `metrics_file` and `stats_port` publish the monitor's metrics (see metrics.py).
+    With `track_usage`, target run times are recorded for `python -m app_blocker.usage`.
+    With `policy_url`, the rules are kept in sync with that fleet policy endpoint (see policy.py).
+    With `control_socket`, scripts can query and control the daemon over that socket (see control.py);
+    stopping monitoring through it leaves the daemon running until it is started again or signalled.
+    With `profile`, or "profiling" in the config file, the monitor is profiled (see profiling.py).
+    """
+    stop_event = stop_event or threading.Event()
+    config_store = ConfigStore(log_error_func=logger.error)
+    # Block state changes are written in the background so enforcement never waits on the disk.
+    config_writer = ConfigWriter(log_error_func=logger.error)
+    policy_sync = None
+    if policy_url:
+        policy_sync = PolicySync(PolicyClient(policy_url), config_store, config_writer, policy_interval,
+                                 log_status_func=logger.info, log_error_func=logger.error)
+        if not policy_sync.load_cache():
+            policy_sync.sync_once() # Nothing cached yet, so the rules may only exist on the server
+        config_writer.flush()
+        startup.mark("policy")
+    config_values = dict(config_store.get()) # Private copy; _save_rule_states updates it
+    # Runs on the thread that noticed the edit (the monitor's, or the policy sync's) before the
+    # monitor applies the new rules, so saves see the edited settings.
+    config_store.subscribe(config_values.update)
+    rule_set = rule_set_from_config(config_values)
+    startup.mark("config")
+    if not rule_set.rules:
+        logger.error("No target applications configured. Nothing to enforce.")
+        config_writer.close()
+        return 1
+
+    metrics = MonitorMetrics()
+    exporter = _start_metrics_exporter(metrics, metrics_file, stats_port)
+    profiler = Profiler(enabled=profile or config_values["profiling"], log_status_func=logger.info)
+    profiler.follow(config_store) # Editing "profiling" in the config file turns it on or off while running
+
+    def on_ready():
+        startup.mark("enforcement_ready")
+        if profile_startup:
+            startup.print_report()
+            stop_event.set()
+
+    control_server = None
+
+    def save_rule_states(rule_set):
+        _save_rule_states(config_writer, config_values, rule_set)
+        if control_server:
+            control_server.update_status(rules=rules_snapshot(rule_set))
+
+    def on_monitoring_stopped():
+        if control_server:
+            control_server.update_status(monitoring=False)
+
+    event_log = EventLog()
+
+    def make_monitor_thread(monitor_stop_event):
+        return threading.Thread(
+            target=monitor_rule_set,
+            args=(
+                rule_set,
+                monitor_stop_event,
+                save_rule_states,
+                logger.info,
+                lambda func, *args: func(*args), # No GUI thread to marshal onto
+                on_monitoring_stopped
+            ),
+            kwargs={
+                "terminate_grace_period": config_values["terminate_grace_period"],
+                "on_ready_func": on_ready,
+                "config_store": config_store, # Edits to the config file take effect without restarting the daemon
+                "metrics": metrics,
+                "usage_accountant": UsageAccountant() if track_usage else None,
+                "scanner_backend": config_values["scanner_backend"],
+                "event_log": event_log, # Enforcement history for `python -m app_blocker.history`
+                "profiler": profiler
+            },
+            name="app-blocker-monitor"
+        )
+
+    runner = _MonitorRunner(make_monitor_thread)
+
+    def start_monitoring():
+        started = runner.start()
+        if started and control_server:
+            control_server.update_status(monitoring=True)
+        return started
+
+    if control_socket:
+        control_server = _start_control_server(control_socket, start_monitoring, runner.stop, metrics)
+    if control_server:
+        log_handler = ControlLogHandler(control_server) # Streams the daemon's log to subscribed clients
+        logger.addHandler(log_handler)
+        control_server.update_status(rules=rules_snapshot(rule_set))
+    start_monitoring()
+    if policy_sync:
+        policy_sync.start()
+    # Signal handlers only run on the main thread, so keep it free and poll the monitor thread.
+    while not stop_event.wait(1.0):
+        if not runner.running and not runner.stop_requested:
+            break # The monitor ended by itself
+    runner.stop()
+    runner.join()
+    if control_server:
+        logger.removeHandler(log_handler)
+        control_server.close()
+    if policy_sync:
+        policy_sync.close()
+    config_writer.close()
+    profiler.close() # Writes out the last profile, if profiling
+    if exporter:
+        exporter.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run App Time Blocker enforcement without the GUI.")
+    parser.add_argument("--log-level", default="INFO", choices=("DEBUG", "INFO", "WARNING", "ERROR"))
+    parser.add_argument("--log-file", help="Log to this file instead of stderr")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print how long each startup phase took once enforcement is ready, then exit")
+    parser.add_argument("--metrics-file", help="Write Prometheus metrics to this file (for node_exporter's textfile collector)")
+    parser.add_argument("--stats-port", type=int, help="Serve JSON stats and Prometheus metrics on 127.0.0.1:PORT")
+    parser.add_argument("--no-usage-tracking", action="store_true", help="Do not record how long target applications run")
+    parser.add_argument("--control-socket", help="Accept JSON-RPC control requests on this Unix socket (see control.py)")
+    parser.add_argument("--policy-url", help="Keep the rules in sync with the fleet policy served at this URL")
+    parser.add_argument("--policy-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Average seconds between policy polls (default: %(default)s)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the monitor loop and write flamegraph stacks to the app data directory (see profiling.py)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=args.log_level,
+        filename=args.log_file,
+        format="[%(asctime)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+
+    stop_event = threading.Event()
+
+    def handle_stop_signal(signum, frame):
+        logger.info(f"Received signal {signum}. Stopping monitoring...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, handle_stop_signal)
+    signal.signal(signal.SIGTERM, handle_stop_signal)
+
+    return run(stop_event, args.profile_startup, args.metrics_file, args.stats_port, not args.no_usage_tracking,
+               args.policy_url, args.policy_interval, args.control_socket, args.profile)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
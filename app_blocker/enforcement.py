@@ -0,0 +1,407 @@
+"""
+Graduated enforcement: what happens to a blocked app, and when.
+
+By default a blocked target is terminated as soon as its block starts (and killed after the
+grace period), as it always was. A rule can instead give an "enforcement" plan: steps that each
+run one action at an offset in seconds from the start of the blocked window, negative for the
+approach to the cutoff:
+
+    "enforcement": [
+        {"action": "deprioritize", "after": -600},
+        {"action": "cpu_limit", "after": -300, "cpu_percent": 20},
+        {"action": "freeze", "after": 0},
+        {"action": "terminate", "after": 1800}
+    ]
+
+Every step due so far is applied to each running target, including ones started later. When the
+rule stops being enforced (the block ends, or the monitor stops) everything is undone: priority
+restored, CPU cap lifted, processes thawed. A frozen app keeps its memory, unsaved work included,
+and uses no CPU at all. cpu_limit and the cgroup freezer need a writable cgroup v2 hierarchy
+(Linux, as root); freeze falls back to SIGSTOP without one.
+
+Actions are looked up by name in ENFORCEMENT_ACTIONS; register_action() adds another.
+"""
+import bisect
+import collections
+import datetime
+import errno
+import hashlib
+import math
+import os
+import re
+
+import psutil
+
+CGROUP_PARENT = "app-blocker" # Each rule gets a group under this one
+CPU_PERIOD = 100000           # cpu.max period in microseconds
+# Where the cgroup v2 hierarchy is mounted; None means look it up in /proc/self/mounts.
+CGROUP_ROOT = None
+
+EnforcementStep = collections.namedtuple("EnforcementStep", "after action")
+
+
+def _find_cgroup2_mount():
+    try:
+        with open("/proc/self/mounts", "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 2 and fields[2] == "cgroup2":
+                    return fields[1]
+    except OSError:
+        pass
+    return None
+
+
+class RuleCgroup:
+    """
+    The cgroup v2 group app-blocker/<rule> that cpu_limit moves a rule's targets into. With a
+    `pid`, the group app-blocker/<rule>/pid-<pid> below it, which the cgroup freezer uses so that
+    each target (and whatever it forks) is frozen and thawed on its own.
+    """
+
+    def __init__(self, rule, pid=None):
+        self.root = CGROUP_ROOT or _find_cgroup2_mount()
+        if not self.root:
+            raise OSError(errno.ENOTSUP, "no cgroup v2 hierarchy is mounted")
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", rule.app_name)[:40]
+        self.path = os.path.join(self.root, CGROUP_PARENT, f"{name}-{hashlib.sha1(rule.key.encode()).hexdigest()[:8]}")
+        if pid is not None:
+            self.path = os.path.join(self.path, f"pid-{pid}")
+
+    def _read(self, directory, file_name):
+        with open(os.path.join(directory, file_name), "r") as f:
+            return f.read()
+
+    def write(self, file_name, value, directory=None):
+        with open(os.path.join(directory or self.path, file_name), "w") as f:
+            f.write(value)
+
+    def enable(self, controller):
+        """Creates the group with `controller` (e.g. "cpu") enabled for it. Raises OSError if the kernel does not offer it."""
+        if controller not in self._read(self.root, "cgroup.controllers").split():
+            raise OSError(errno.ENOTSUP, f"the cgroup v2 {controller} controller is not available")
+        parent = os.path.dirname(self.path)
+        os.makedirs(self.path, exist_ok=True)
+        for directory in (self.root, parent):
+            if controller not in self._read(directory, "cgroup.subtree_control").split():
+                self.write("cgroup.subtree_control", "+" + controller, directory)
+
+    def add(self, pid):
+        """Moves `pid` into the group. Returns the group it was in, relative to the root, for move_back()."""
+        original = "/"
+        with open(f"/proc/{pid}/cgroup", "r") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    original = line[3:].strip()
+        os.makedirs(self.path, exist_ok=True)
+        self.write("cgroup.procs", str(pid))
+        return original
+
+    def move_back(self, pid, original):
+        self.write("cgroup.procs", str(pid), os.path.join(self.root, original.lstrip("/")))
+
+    def move_all_back(self, original):
+        """Moves every process in the group, children it forked included, to `original`."""
+        for pid in self._read(self.path, "cgroup.procs").split():
+            try:
+                self.move_back(pid, original)
+            except ProcessLookupError:
+                pass # Exited meanwhile
+
+    def remove(self):
+        """Removes the group once it is empty; a group with processes left in it stays."""
+        try:
+            os.rmdir(self.path)
+        except OSError:
+            pass
+
+
+class EnforcementAction:
+    """
+    One kind of step. `params` are the step's keys other than "action" and "after"; raise
+    ValueError for bad ones. apply() returns whatever undo() needs to reverse it for that
+    process, and may raise psutil errors or OSError.
+    """
+    name = None
+    description = None  # For the log, e.g. "frozen"
+    terminates = False  # True only for terminate, which the monitor carries out itself
+
+    def __init__(self, params):
+        self.params = params
+
+    def apply(self, proc, rule):
+        raise NotImplementedError
+
+    def undo(self, proc, rule, token):
+        pass
+
+
+class Deprioritize(EnforcementAction):
+    """Lowest CPU priority (nice 19, or idle class on Windows) and idle I/O priority where the platform has ionice."""
+    name = "deprioritize"
+    description = "lowered CPU and I/O priority"
+
+    def apply(self, proc, rule):
+        token = (proc.nice(), proc.ionice() if hasattr(proc, "ionice") else None)
+        proc.nice(psutil.IDLE_PRIORITY_CLASS if psutil.WINDOWS else 19)
+        if token[1] is not None:
+            proc.ionice(psutil.IOPRIO_VERYLOW if psutil.WINDOWS else psutil.IOPRIO_CLASS_IDLE)
+        return token
+
+    def undo(self, proc, rule, token):
+        nice, ionice = token
+        proc.nice(nice)
+        if ionice is not None:
+            if psutil.WINDOWS:
+                proc.ionice(ionice)
+            else:
+                proc.ionice(ionice.ioclass, ionice.value)
+
+
+class CpuLimit(EnforcementAction):
+    """Caps the rule's targets together at `cpu_percent` of one CPU through the cgroup v2 cpu.max."""
+    name = "cpu_limit"
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.cpu_percent = float(params.get("cpu_percent", 20))
+        if not self.cpu_percent > 0:
+            raise ValueError("cpu_percent must be positive")
+        self.description = f"limited to {self.cpu_percent:g}% CPU"
+
+    def apply(self, proc, rule):
+        group = RuleCgroup(rule)
+        group.enable("cpu")
+        group.write("cpu.max", f"{max(1000, int(CPU_PERIOD * self.cpu_percent / 100))} {CPU_PERIOD}")
+        return group.add(proc.pid)
+
+    def undo(self, proc, rule, token):
+        RuleCgroup(rule).move_back(proc.pid, token)
+
+
+class Freeze(EnforcementAction):
+    """
+    Stops the process without killing it: with the cgroup v2 freezer (which also holds back
+    anything it forks) where one is writable, else SIGSTOP. "method" is auto, cgroup or signal.
+    """
+    name = "freeze"
+    description = "frozen"
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.method = params.get("method", "auto")
+        if self.method not in ("auto", "cgroup", "signal"):
+            raise ValueError("freeze method must be auto, cgroup or signal")
+
+    def apply(self, proc, rule):
+        if self.method != "signal":
+            original = None
+            try:
+                group = RuleCgroup(rule, proc.pid)
+                original = group.add(proc.pid)
+                group.write("cgroup.freeze", "1")
+                return ("cgroup", original)
+            except OSError:
+                if original is not None:
+                    group.move_back(proc.pid, original) # No freezer after all (e.g. kernel before 5.2)
+                    group.remove()
+                if self.method == "cgroup":
+                    raise
+        proc.suspend()
+        return ("signal", None)
+
+    def undo(self, proc, rule, token):
+        method, original = token
+        if method == "cgroup":
+            group = RuleCgroup(rule, proc.pid)
+            group.write("cgroup.freeze", "0")
+            group.move_all_back(original)
+            group.remove()
+        else:
+            proc.resume()
+
+
+class Terminate(EnforcementAction):
+    """Terminate, then kill after the monitor's grace period. Always the last step."""
+    name = "terminate"
+    terminates = True
+
+
+ENFORCEMENT_ACTIONS = {action.name: action for action in (Deprioritize, CpuLimit, Freeze, Terminate)}
+
+
+def register_action(action_class):
+    """Makes an EnforcementAction subclass usable in plans under its `name`."""
+    ENFORCEMENT_ACTIONS[action_class.name] = action_class
+    return action_class
+
+
+class EnforcementPlan:
+    """A rule's steps, sorted by offset, so the step due at a point in the window is one bisect."""
+
+    def __init__(self, steps, config_values=None):
+        self.config_values = config_values # As given, for to_config(); None for the default plan
+        self.steps = sorted(steps, key=lambda step: step.after)
+        self.offsets = [step.after for step in self.steps]
+        # Seconds before the block starts that the first step is due
+        self.lead_time = max(0.0, -self.offsets[0]) if self.offsets else 0.0
+
+    @classmethod
+    def from_config(cls, steps_values):
+        """Compiles the config form (see the module docstring). Raises ValueError if it is malformed."""
+        if not isinstance(steps_values, list) or not steps_values:
+            raise ValueError("enforcement must be a non-empty list of steps")
+        steps = []
+        for step_values in steps_values:
+            if not isinstance(step_values, dict) or step_values.get("action") not in ENFORCEMENT_ACTIONS:
+                raise ValueError(f"unknown enforcement step {step_values!r}; actions are {', '.join(ENFORCEMENT_ACTIONS)}")
+            params = {key: value for key, value in step_values.items() if key not in ("action", "after")}
+            after = float(step_values.get("after", 0))
+            if math.isnan(after):
+                raise ValueError("enforcement step offsets must be numbers")
+            steps.append(EnforcementStep(after, ENFORCEMENT_ACTIONS[step_values["action"]](params)))
+        plan = cls(steps, steps_values)
+        if any(step.action.terminates for step in plan.steps[:-1]):
+            raise ValueError("terminate must be the last enforcement step")
+        return plan
+
+    def step_index(self, elapsed):
+        """Index of the latest step due `elapsed` seconds after the block start (negative: before it), or None."""
+        index = bisect.bisect_right(self.offsets, elapsed) - 1
+        return index if index >= 0 else None
+
+
+DEFAULT_PLAN = EnforcementPlan([EnforcementStep(0.0, Terminate({}))])
+
+
+class _Target:
+    """What has been applied to one running target."""
+
+    def __init__(self, proc, rule, create_time):
+        self.proc = proc
+        self.rule = rule
+        self.create_time = create_time
+        self.next_step = 0 # Index of the first step of rule.enforcement not applied yet
+        self.applied = []  # [(action, token)] in the order applied
+
+
+class Enforcer:
+    """
+    Works out which step of each rule's plan is due and applies it to the rule's running
+    targets, undoing everything once a rule is no longer enforced. Monitor thread only.
+    """
+
+    def __init__(self):
+        self._targets = {} # pid -> _Target
+        self._failed = set() # (rule key, action name) whose failure has been logged
+
+    def __len__(self):
+        return len(self._targets)
+
+    @staticmethod
+    def _block_start(rule, now):
+        """Start of the window the rule's block (active or next) belongs to, or None if it has none."""
+        if rule.block_activated_today:
+            return rule.schedule.block_started(now)
+        return rule.schedule.next_block_start(now)
+
+    def due_steps(self, rule_set, now):
+        """{rule key: (rule, step index)} for every rule with a step due at `now`."""
+        due = {}
+        for rule in rule_set.rules:
+            plan = rule.enforcement
+            if not rule.block_activated_today and not plan.lead_time:
+                continue
+            block_start = self._block_start(rule, now)
+            if block_start is None:
+                # Blocked, but no longer by the (edited) schedule: the block outlives it, and so do all its steps.
+                elapsed = math.inf if rule.block_activated_today else -math.inf
+            else:
+                elapsed = (now - block_start).total_seconds()
+            index = plan.step_index(elapsed)
+            if index is not None:
+                due[rule.key] = (rule, index)
+        return due
+
+    def next_step_time(self, rule_set, now):
+        """When the next step of any rule falls due after `now`, or None."""
+        candidates = []
+        for rule in rule_set.rules:
+            block_start = self._block_start(rule, now)
+            if block_start is None:
+                continue
+            elapsed = (now - block_start).total_seconds()
+            index = bisect.bisect_right(rule.enforcement.offsets, elapsed)
+            if index < len(rule.enforcement.offsets):
+                candidates.append(block_start + datetime.timedelta(seconds=rule.enforcement.offsets[index]))
+        return min(candidates) if candidates else None
+
+    def enforce(self, matches, due, log_status_func):
+        """
+        Applies the steps due for each of `matches` ([(proc, rule)] of rules in `due`) that it has
+        not had yet, and undoes everything for targets no longer matched. Returns (the matches
+        whose due step is terminate, thawed and ready for it; the number of steps applied).
+        """
+        to_terminate = []
+        applied = 0
+        seen = set()
+        for proc, rule in matches:
+            _rule, index = due[rule.key]
+            target = self._targets.get(proc.pid)
+            if rule.enforcement.steps[index].action.terminates:
+                if target is not None:
+                    self._undo(self._targets.pop(proc.pid)) # Thawed, so it can handle the terminate
+                to_terminate.append((proc, rule))
+                continue
+            try:
+                create_time = proc.create_time()
+            except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+                continue
+            if target is None or target.create_time != create_time or target.rule.key != rule.key:
+                target = self._targets[proc.pid] = _Target(proc, rule, create_time)
+            seen.add(proc.pid)
+            while target.next_step <= index:
+                action = rule.enforcement.steps[target.next_step].action
+                target.next_step += 1
+                try:
+                    target.applied.append((action, action.apply(proc, rule)))
+                except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                    break
+                except (psutil.AccessDenied, OSError) as e:
+                    if (rule.key, action.name) not in self._failed:
+                        self._failed.add((rule.key, action.name))
+                        log_status_func(f"Could not apply {action.name} to {rule.app_name} (PID: {proc.pid}): {e}")
+                    continue
+                applied += 1
+                log_status_func(f"{rule.app_name} (PID: {proc.pid}): {action.description}.")
+        self._release(lambda pid: pid not in seen, log_status_func)
+        return to_terminate, applied
+
+    def release(self, log_status_func):
+        """Undoes everything applied to every target, e.g. when nothing is enforced any more or the monitor stops."""
+        self._release(lambda pid: True, log_status_func)
+
+    def _release(self, should_release, log_status_func):
+        groups = {}
+        for pid in [pid for pid in self._targets if should_release(pid)]:
+            target = self._targets.pop(pid)
+            if target.applied and self._undo(target):
+                log_status_func(f"Restored {target.rule.app_name} (PID: {pid}).")
+            if any(isinstance(action, (CpuLimit, Freeze)) for action, _token in target.applied):
+                groups[target.rule.key] = target.rule
+        for rule in groups.values():
+            try:
+                RuleCgroup(rule).remove()
+            except OSError:
+                pass
+
+    def _undo(self, target):
+        """Reverses the target's actions, newest first. Returns False if the process is gone."""
+        for action, token in reversed(target.applied):
+            try:
+                action.undo(target.proc, target.rule, token)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                return False
+            except (psutil.AccessDenied, OSError):
+                pass # e.g. raising the priority back needs privileges we lack; nothing more to do
+        return True
@@ -0,0 +1,115 @@
+"""
+Executable content fingerprints, so a rule can block a binary however it is copied or renamed.
+
+FingerprintCache hashes executables on a small thread pool and remembers each SHA-256 by
+(device, inode, size, mtime_ns), so every binary on disk is hashed once no matter how many
+processes run it or how often they start. The scan thread only ever does a stat() and a dict
+lookup; until a hash is ready the lookup reports PENDING and the process is looked at again.
+
+    python -m app_blocker.fingerprint /path/to/app   # print the value for a rule's "exe_sha256"
+"""
+import concurrent.futures
+import hashlib
+import mmap
+import os
+import sys
+import threading
+
+HASH_CHUNK_SIZE = 1024 * 1024 # hashlib releases the GIL per chunk, so workers hash in parallel
+DEFAULT_HASH_WORKERS = 2
+MAX_CACHED_FINGERPRINTS = 4096
+
+PENDING = "pending" # Returned by FingerprintCache.lookup() while the hash is being computed
+
+
+def stat_key(st):
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """Returns (stat key, SHA-256 hex digest) of the file at `path`, read through a memory map."""
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        digest = hashlib.sha256()
+        if st.st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, len(view), chunk_size):
+                        digest.update(view[offset:offset + chunk_size])
+                finally:
+                    view.release() # The map cannot close while a view is exported
+        return stat_key(st), digest.hexdigest()
+
+
+class FingerprintCache:
+    """
+    Content hashes of executables keyed by stat identity. lookup() never reads file contents;
+    new files are queued for the worker pool, whose threads are only started on first use.
+    """
+
+    def __init__(self, max_workers=DEFAULT_HASH_WORKERS, max_entries=MAX_CACHED_FINGERPRINTS):
+        self._executor = None
+        self._max_workers = max_workers
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._digests = {} # stat key -> hex digest, or None if the file could not be read
+        self._pending = set() # stat keys queued or being hashed
+        self.hashed = 0 # Files hashed so far; read by the monitor's metrics
+
+    def lookup(self, path):
+        """
+        Returns the hex digest of the file at `path`, PENDING if it is being hashed, or None if
+        it cannot be read (e.g. the process exited or permission was denied).
+        """
+        try:
+            key = stat_key(os.stat(path))
+        except OSError:
+            return None
+        if key in self._digests:
+            return self._digests[key]
+        with self._lock:
+            if key not in self._pending:
+                self._pending.add(key)
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(self._max_workers, thread_name_prefix="fingerprint")
+                self._executor.submit(self._hash, path, key)
+        return PENDING
+
+    def _hash(self, path, key):
+        try:
+            hashed_key, digest = hash_file(path)
+        except (OSError, ValueError):
+            hashed_key, digest = key, None
+        with self._lock:
+            self._pending.discard(key)
+            self.hashed += 1
+            # If the file changed since the stat(), the next lookup sees the new key and finds this.
+            self._digests[hashed_key] = digest
+            while len(self._digests) > self._max_entries:
+                del self._digests[next(iter(self._digests))] # Oldest first
+
+    def close(self):
+        """Stops the workers, dropping queued files."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    paths = sys.argv[1:] if argv is None else argv
+    if not paths:
+        print("Usage: python -m app_blocker.fingerprint FILE...")
+        return 2
+    for path in paths:
+        try:
+            print(f"{hash_file(path)[1]}  {path}")
+        except OSError as e:
+            print(f"Error hashing {path}: {e}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
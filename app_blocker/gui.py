@@ -9,50 +9,39 @@ import time # Keep for any direct time usage, though blocker handles its own loo
 import gettext
 
 # --- Language Setup ---
-def get_bundle_dir_gui():
-    """ Returns the base directory for PyInstaller bundle or script directory for normal execution. """
-    if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-        # Running in a PyInstaller bundle
-        return sys._MEIPASS
-    else:
-        # Running in a normal Python environment
-        # Assumes gui.py is in app_blocker, and project root is one level up.
-        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-
-GUI_LOCALE_DIR = os.path.join(get_bundle_dir_gui(), 'locale')
-
-# Global `_` function, initialized to default gettext
+# Global `_` function, initialized to default gettext. No catalog is loaded at import time;
+# AppBlockerFrame calls set_language() with the configured language, and again on a switch from
+# the Language menu. Labels must therefore call _() when they are shown, never at import time.
 _ = gettext.gettext
+_current_gui_lang = None
 
 def set_language(lang_code='en'):
-    """Sets the language for the GUI module."""
-    global _
-    if os.path.isdir(GUI_LOCALE_DIR):
-        try:
-            translation = gettext.translation('messages', localedir=GUI_LOCALE_DIR, languages=[lang_code], fallback=True)
-            _ = translation.gettext
-        except Exception as e:
-            print(f"Failed to set language to {lang_code} in gui.py: {e}. Using fallback gettext.")
-            _ = gettext.gettext # Fallback to basic gettext
-    else:
-        print(f"Locale directory '{GUI_LOCALE_DIR}' not found in gui.py. Using fallback gettext.")
-        _ = gettext.gettext # Fallback if locale directory isn't found
-
-# Initialize with a default language (e.g., 'en'). 
-# AppBlockerFrame will call this again with the configured language.
-set_language() 
+    """Sets the language for the GUI module. Catalogs are cached by i18n.get_translation()."""
+    global _, _current_gui_lang
+    if lang_code == _current_gui_lang:
+        return
+    _ = get_translation(lang_code).gettext
+    _current_gui_lang = lang_code
 
 # Import from our new modules
+from .i18n import N_, available_languages, get_translation, language_name, preload_translations
 from .config import (
     CONFIG_FILE_PATH, TRAY_ICON_PATH,
-    load_config_from_file, save_config_to_file
+    DEFAULT_TERMINATE_GRACE_PERIOD, DEFAULT_FSYNC_POLICY, DEFAULT_SCANNER_BACKEND, DEFAULT_PROFILING
 )
-from .blocker import monitor_loop # Import the refactored monitor_loop
+from .config_store import ConfigStore, ConfigWriter
+from .control import rules_snapshot
+from .log_sink import DEFAULT_MAX_LINES, LogSink
+from .blocker import monitor_rule_set # One monitoring thread serves every configured rule
+from .history import EventLog, HistoryIndex
+from .rules import BlockRule, RuleSet, normalize_exe_path
+from .usage import UsageAccountant
 
 class AppTaskBarIcon(wx.adv.TaskBarIcon):
     def __init__(self, frame, tooltip_text): 
         super(AppTaskBarIcon, self).__init__()
         self.frame = frame
+        self.icon = None # Kept so set_tooltip() can re-set it after a language switch
 
         # Set Icon
         try:
@@ -61,20 +50,27 @@ class AppTaskBarIcon(wx.adv.TaskBarIcon):
             else: 
                 icon = wx.Icon(wx.STOCK_ICON_APPLICATION)
             self.SetIcon(icon, tooltip_text) 
+            self.icon = icon
         except Exception as e:
             print(f"Error setting tray icon: {e}. Using default.")
             try:
                 std_icon = wx.Icon()
                 std_icon.CopyFromBitmap(wx.ArtProvider.GetBitmap(wx.ART_INFORMATION, wx.ART_TOOLBAR, (16,16)))
                 self.SetIcon(std_icon, tooltip_text) 
+                self.icon = std_icon
             except Exception as e_std:
                 print(f"Error setting standard tray icon: {e_std}")
 
-        self.Bind(wx.adv.EVT_TASKBAR_LEFT_DCLICK, self.on_left_dclick)
-        self.Bind(wx.EVT_MENU, self.on_show_hide, id=wx.ID_OPEN)
-        self.Bind(wx.EVT_MENU, self.on_exit_app, id=wx.ID_EXIT)
+        self.Bind(wx.adv.EVT_TASKBAR_LEFT_DCLICK, frame.timed(self.on_left_dclick))
+        self.Bind(wx.EVT_MENU, frame.timed(self.on_show_hide), id=wx.ID_OPEN)
+        self.Bind(wx.EVT_MENU, frame.timed(self.on_exit_app), id=wx.ID_EXIT)
+
+    def set_tooltip(self, tooltip_text):
+        if self.icon is not None:
+            self.SetIcon(self.icon, tooltip_text)
 
     def CreatePopupMenu(self):
+        # Built each time the menu opens, so it is always in the current language.
         menu = wx.Menu()
         menu.Append(wx.ID_OPEN, _("Show/Hide App"))
         menu.AppendSeparator()
@@ -98,13 +94,181 @@ class AppTaskBarIcon(wx.adv.TaskBarIcon):
             self.Destroy()
 
 
+# The status log is redrawn at most this often, however fast messages arrive.
+LOG_FLUSH_INTERVAL_MS = 250
+
+# History event kinds as shown in the History tab; translated when a row is drawn.
+EVENT_KIND_LABELS = {
+    "block_activated": N_("Block started"),
+    "block_ended": N_("Block ended"),
+    "terminated": N_("Terminated"),
+    "killed": N_("Force killed"),
+    "kill_failed": N_("Kill failed")
+}
+
+
+class TranslatedLabels:
+    """
+    Remembers which message each static label shows and how to set it, so relabel() can show
+    them all again in the language set_language() switched to without rebuilding any window.
+    """
+
+    def __init__(self):
+        self._labels = [] # (setter, untranslated message)
+
+    def add(self, setter, message):
+        """Calls setter(_(message)) now and on every relabel(). `message` should be marked with N_()."""
+        self._labels.append((setter, message))
+        setter(_(message))
+
+    def relabel(self):
+        for setter, message in self._labels:
+            setter(_(message))
+
+
+class HistoryListCtrl(wx.ListCtrl):
+    """Virtual list over a HistoryIndex: only the rows on screen are ever looked up and formatted."""
+
+    def __init__(self, parent, history_index, labels):
+        super(HistoryListCtrl, self).__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL)
+        self.history_index = history_index
+        self.rows = range(0) # Row numbers in history_index, in display order
+        self._formatted_item = (None, None) # wx asks for each column separately; format each row once
+        for column, (heading, width) in enumerate(((N_("Time"), 140), (N_("Application"), 240), (N_("Event"), 110), (N_("PID"), 60))):
+            self.InsertColumn(column, "", wx.LIST_FORMAT_RIGHT if column == 3 else wx.LIST_FORMAT_LEFT, width=width)
+            labels.add(lambda text, column=column: self._set_heading(column, text), heading)
+
+    def _set_heading(self, column, text):
+        item = self.GetColumn(column)
+        item.SetText(text)
+        self.SetColumn(column, item)
+
+    def show_rows(self, rows):
+        self.rows = rows
+        self.redraw()
+
+    def redraw(self):
+        """Forgets formatted rows (e.g. after a language switch) and redraws the visible ones."""
+        self._formatted_item = (None, None)
+        self.SetItemCount(len(self.rows))
+        self.Refresh()
+
+    def OnGetItemText(self, item, column):
+        if self._formatted_item[0] != item:
+            event = self.history_index.row(self.rows[item])
+            self._formatted_item = (item, (
+                datetime.datetime.fromtimestamp(event.time).strftime("%Y-%m-%d %H:%M:%S"), # Date format is not typically translated
+                event.app,
+                _(EVENT_KIND_LABELS[event.kind]) if event.kind in EVENT_KIND_LABELS else event.kind,
+                str(event.pid) if event.pid else ""
+            ))
+        return self._formatted_item[1][column]
+
+
+class HistoryPanel(wx.Panel):
+    """Enforcement history with app and date range filters. Call refresh_history() to load new events."""
+
+    def __init__(self, parent, history_index, labels, timed=lambda handler: handler):
+        # timed: wraps event handlers for the profiler (see AppBlockerFrame.timed()).
+        super(HistoryPanel, self).__init__(parent)
+        self.history_index = history_index
+        self.app_keys = [] # App key of each choice after "All applications"
+        self.shown_count = None # Events matching the filter, once loaded
+
+        filter_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.choice_app = wx.Choice(self, choices=[""])
+        labels.add(lambda text: self.choice_app.SetString(0, text), N_("All applications"))
+        self.choice_app.SetSelection(0)
+        self.choice_app.Bind(wx.EVT_CHOICE, timed(self.apply_filter))
+        filter_sizer.Add(self.choice_app, 1, wx.RIGHT | wx.ALIGN_CENTER_VERTICAL, 5)
+        today = datetime.date.today()
+        self.date_from = wx.adv.DatePickerCtrl(self, dt=self._wx_date(today - datetime.timedelta(days=30)), style=wx.adv.DP_DROPDOWN)
+        self.date_to = wx.adv.DatePickerCtrl(self, dt=self._wx_date(today), style=wx.adv.DP_DROPDOWN)
+        for label, picker in ((N_("From:"), self.date_from), (N_("To:"), self.date_to)):
+            lbl_date = wx.StaticText(self)
+            labels.add(lbl_date.SetLabel, label)
+            filter_sizer.Add(lbl_date, 0, wx.RIGHT | wx.ALIGN_CENTER_VERTICAL, 5)
+            filter_sizer.Add(picker, 0, wx.RIGHT | wx.ALIGN_CENTER_VERTICAL, 5)
+            picker.Bind(wx.adv.EVT_DATE_CHANGED, timed(self.apply_filter))
+        btn_refresh = wx.Button(self)
+        labels.add(btn_refresh.SetLabel, N_("Refresh"))
+        btn_refresh.Bind(wx.EVT_BUTTON, timed(self.refresh_history))
+        filter_sizer.Add(btn_refresh, 0, wx.ALIGN_CENTER_VERTICAL)
+
+        self.list_ctrl = HistoryListCtrl(self, history_index, labels)
+        self.lbl_count = wx.StaticText(self, label="")
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(filter_sizer, 0, wx.EXPAND | wx.ALL, 5)
+        sizer.Add(self.list_ctrl, 1, wx.EXPAND | wx.LEFT | wx.RIGHT, 5)
+        sizer.Add(self.lbl_count, 0, wx.ALL, 5)
+        self.SetSizer(sizer)
+
+    @staticmethod
+    def _wx_date(date):
+        return wx.DateTime.FromDMY(date.day, date.month - 1, date.year) # wx months start at 0
+
+    @staticmethod
+    def _picked_date(picker):
+        value = picker.GetValue()
+        return datetime.date(value.GetYear(), value.GetMonth() + 1, value.GetDay())
+
+    def refresh_history(self, event=None):
+        try:
+            self.history_index.refresh()
+        except OSError as e:
+            self.lbl_count.SetLabel(_("Could not read the history: {error}").format(error=e))
+            return
+        if len(self.history_index.apps) != len(self.app_keys):
+            selected_key = self._selected_app_key()
+            self.app_keys = sorted(self.history_index.apps)
+            self.choice_app.Set([_("All applications")] + self.app_keys)
+            self.choice_app.SetSelection(self.app_keys.index(selected_key) + 1 if selected_key in self.app_keys else 0)
+        self.apply_filter()
+
+    def _selected_app_key(self):
+        selection = self.choice_app.GetSelection()
+        return self.app_keys[selection - 1] if selection > 0 else None
+
+    def apply_filter(self, event=None):
+        start = time.mktime(self._picked_date(self.date_from).timetuple())
+        end = time.mktime((self._picked_date(self.date_to) + datetime.timedelta(days=1)).timetuple())
+        rows = self.history_index.query(self._selected_app_key(), start, end)
+        self.list_ctrl.show_rows(rows)
+        self.shown_count = len(rows)
+        self.lbl_count.SetLabel(_("{count} event(s)").format(count=self.shown_count))
+
+    def relabel(self):
+        """The parts TranslatedLabels cannot redo: the event count and the visible rows' event names."""
+        if self.shown_count is not None:
+            self.lbl_count.SetLabel(_("{count} event(s)").format(count=self.shown_count))
+        self.list_ctrl.redraw()
+
+
 class AppBlockerFrame(wx.Frame):
-    def __init__(self, parent, title, tray_tooltip_text, current_lang='en'): # Added current_lang
-        
+    def __init__(self, parent, title, tray_tooltip_text, current_lang='en', config_values=None, config_store=None,
+                 echo_log_to_console=True, metrics=None, track_usage=True, control_server=None, profiler=None):
+        # title, tray_tooltip_text: untranslated (marked with N_()); they are translated here and
+        # again whenever the language is switched.
+        # config_values: the dict from load_config_from_file(), if the caller already loaded it,
+        # so the file is not read and parsed a second time.
+        # config_store: the ConfigStore it came from, shared with the monitor thread for hot reload.
+        # echo_log_to_console: also print status log lines to stdout (in batches, from the GUI thread).
+        # metrics: MonitorMetrics the monitor thread records into, if the caller exports them.
+        # track_usage: record how long target applications run while monitoring (see usage.py).
+        # control_server: ControlServer from control.py to publish status and log lines to, if any.
+        # profiler: Profiler from profiling.py; times event handlers and samples the monitor while on.
+
         self.current_lang = current_lang # Store language
-        set_language(self.current_lang) # Set language for GUI module
+        set_language(self.current_lang) # Set language for GUI module; switch_language() changes it live
+        self.title_message = title
+        self.labels = TranslatedLabels() # Every static label, for relabeling after a language switch
+
+        super(AppBlockerFrame, self).__init__(parent, title=_(title), size=(600, 700)) # Increased height for lang menu
 
-        super(AppBlockerFrame, self).__init__(parent, title=title, size=(600, 700)) # Increased height for lang menu
+        # Status log pipeline: log_status() only enqueues; the GUI thread flushes batches.
+        self.echo_log_to_console = echo_log_to_console and sys.stdout is not None # No console under pythonw
+        self.log_sink = LogSink(DEFAULT_MAX_LINES, on_pending=self._on_log_pending)
 
         # Configuration attributes
         self.app_path_val = ""
@@ -112,6 +276,21 @@ class AppBlockerFrame(wx.Frame):
         self.end_minute_val = 0
         self.block_activated_today = False
         self.date_block_activated = None
+        self.blocked_until = None # When the primary target's active block ends; see BlockRule
+        self.primary_schedule = None # Weekly schedule of the primary target, if the config has one
+        self.primary_match_renamed = False # Set in the file only; see matchers.py
+        self.extra_rules = [] # Rule dicts for targets other than the one edited in the UI
+        self.terminate_grace_period = DEFAULT_TERMINATE_GRACE_PERIOD
+        self.fsync_policy = DEFAULT_FSYNC_POLICY
+        self.scanner_backend = DEFAULT_SCANNER_BACKEND
+        self.profiling = DEFAULT_PROFILING
+        self.config_writer = ConfigWriter(log_error_func=self.log_status)
+        self.config_store = config_store or ConfigStore(log_error_func=self.log_status)
+        self.metrics = metrics
+        self.track_usage = track_usage
+        self.control_server = control_server
+        self.profiler = profiler
+        self.event_log = EventLog() # Enforcement history, shown in the History tab
         # self.current_lang is already set
 
         # Monitoring state
@@ -122,16 +301,17 @@ class AppBlockerFrame(wx.Frame):
         self.taskBarIcon = None
         self.tray_tooltip_text = tray_tooltip_text 
 
-        self._load_initial_config() # This will load language too, and self.current_lang will be updated
-                                    # then we must re-set the language for the GUI
-        set_language(self.current_lang) # Re-set language based on loaded config
+        self._load_initial_config(config_values)
 
         self.InitUI() 
+        self.InitMenu()
         self.Centre()
         self.Show()
+        # Load the other catalogs once the window is up, so a later switch does not touch the disk.
+        wx.CallAfter(preload_translations)
 
-        self.Bind(wx.EVT_CLOSE, self.on_minimize_to_tray)
-        self.Bind(wx.EVT_ICONIZE, self.on_iconize_to_tray)
+        self.Bind(wx.EVT_CLOSE, self.timed(self.on_minimize_to_tray))
+        self.Bind(wx.EVT_ICONIZE, self.timed(self.on_iconize_to_tray))
 
         if not self.is_admin():
             self._prompt_for_admin_restart()
@@ -145,9 +325,13 @@ class AppBlockerFrame(wx.Frame):
         self.setup_taskbar_icon() # Ensure it's called after tray_tooltip_text is set
 
 
+    def timed(self, handler):
+        """`handler`, timed by the profiler while profiling is on (see profiling.py); bind handlers through this."""
+        return self.profiler.timed(handler) if self.profiler else handler
+
     def setup_taskbar_icon(self):
         if not self.taskBarIcon:
-            self.taskBarIcon = AppTaskBarIcon(self, self.tray_tooltip_text) # Pass it here
+            self.taskBarIcon = AppTaskBarIcon(self, _(self.tray_tooltip_text)) # Pass it here
 
     def is_admin(self):
         try:
@@ -185,20 +369,24 @@ class AppBlockerFrame(wx.Frame):
         main_sizer = wx.BoxSizer(wx.VERTICAL)
 
         # Application Path Section
-        path_box = wx.StaticBox(panel, label=_("Application Settings"))
+        path_box = wx.StaticBox(panel)
+        self.labels.add(path_box.SetLabel, N_("Application Settings"))
         path_box_sizer = wx.StaticBoxSizer(path_box, wx.VERTICAL)
         grid_sizer = wx.GridBagSizer(5, 5)
 
-        lbl_app = wx.StaticText(panel, label=_("Application to Block:"))
+        lbl_app = wx.StaticText(panel)
+        self.labels.add(lbl_app.SetLabel, N_("Application to Block:"))
         grid_sizer.Add(lbl_app, pos=(0, 0), flag=wx.ALIGN_CENTER_VERTICAL | wx.LEFT, border=5)
         self.txt_app_path = wx.TextCtrl(panel, style=wx.TE_READONLY)
         self.txt_app_path.SetValue(self.app_path_val) # Loaded from config
         grid_sizer.Add(self.txt_app_path, pos=(0, 1), span=(1,1), flag=wx.EXPAND)
-        btn_browse = wx.Button(panel, label=_("Browse..."))
-        btn_browse.Bind(wx.EVT_BUTTON, self.on_browse_app)
-        grid_sizer.Add(btn_browse, pos=(0, 2), flag=wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, border=5)
+        self.btn_browse = wx.Button(panel)
+        self.labels.add(self.btn_browse.SetLabel, N_("Browse..."))
+        self.btn_browse.Bind(wx.EVT_BUTTON, self.timed(self.on_browse_app))
+        grid_sizer.Add(self.btn_browse, pos=(0, 2), flag=wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, border=5)
 
-        lbl_time = wx.StaticText(panel, label=_("Block After (HH:MM):"))
+        lbl_time = wx.StaticText(panel)
+        self.labels.add(lbl_time.SetLabel, N_("Block After (HH:MM):"))
         grid_sizer.Add(lbl_time, pos=(1, 0), flag=wx.ALIGN_CENTER_VERTICAL | wx.LEFT, border=5)
         time_input_sizer = wx.BoxSizer(wx.HORIZONTAL)
         self.spin_hour = wx.SpinCtrl(panel, value=str(self.end_hour_val), min=0, max=23, size=(50,-1))
@@ -206,42 +394,117 @@ class AppBlockerFrame(wx.Frame):
         time_input_sizer.Add(self.spin_hour, 0, wx.RIGHT, 5)
         time_input_sizer.Add(wx.StaticText(panel, label=":"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5) # Not typically translated
         time_input_sizer.Add(self.spin_minute, 0)
+        # The cutoff may be changed while monitoring; the running monitor picks it up from the saved config.
+        self.spin_hour.Bind(wx.EVT_SPINCTRL, self.timed(self.on_block_time_changed))
+        self.spin_minute.Bind(wx.EVT_SPINCTRL, self.timed(self.on_block_time_changed))
         grid_sizer.Add(time_input_sizer, pos=(1, 1), flag=wx.ALIGN_LEFT)
         grid_sizer.AddGrowableCol(1)
         path_box_sizer.Add(grid_sizer, 1, wx.EXPAND | wx.ALL, 10)
         main_sizer.Add(path_box_sizer, 0, wx.EXPAND | wx.ALL, 10)
 
         # Controls Section
-        control_box = wx.StaticBox(panel, label=_("Controls"))
+        control_box = wx.StaticBox(panel)
+        self.labels.add(control_box.SetLabel, N_("Controls"))
         control_box_sizer = wx.StaticBoxSizer(control_box, wx.HORIZONTAL)
-        self.btn_start = wx.Button(panel, label=_("Start Monitoring"))
-        self.btn_start.Bind(wx.EVT_BUTTON, self.on_start_monitoring)
+        self.btn_start = wx.Button(panel)
+        self.labels.add(self.btn_start.SetLabel, N_("Start Monitoring"))
+        self.btn_start.Bind(wx.EVT_BUTTON, self.timed(self.on_start_monitoring))
         control_box_sizer.Add(self.btn_start, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
-        self.btn_stop = wx.Button(panel, label=_("Stop Monitoring"))
-        self.btn_stop.Bind(wx.EVT_BUTTON, self.on_stop_monitoring)
+        self.btn_stop = wx.Button(panel)
+        self.labels.add(self.btn_stop.SetLabel, N_("Stop Monitoring"))
+        self.btn_stop.Bind(wx.EVT_BUTTON, self.timed(self.on_stop_monitoring))
         control_box_sizer.Add(self.btn_stop, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         main_sizer.Add(control_box_sizer, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
 
-        # Status Log Section
-        status_box = wx.StaticBox(panel, label=_("Status Log"))
-        status_box_sizer = wx.StaticBoxSizer(status_box, wx.VERTICAL)
-        self.txt_status_log = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.TE_READONLY | wx.HSCROLL, size=(-1, 150))
-        status_box_sizer.Add(self.txt_status_log, 1, wx.EXPAND | wx.ALL, 5)
-        main_sizer.Add(status_box_sizer, 1, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
+        # Status Log and History Section
+        self.notebook = wx.Notebook(panel)
+        self.txt_status_log = wx.TextCtrl(self.notebook, style=wx.TE_MULTILINE | wx.TE_READONLY | wx.HSCROLL, size=(-1, 150))
+        self.notebook.AddPage(self.txt_status_log, "")
+        self.labels.add(lambda text: self.notebook.SetPageText(0, text), N_("Status Log"))
+        self.history_panel = HistoryPanel(self.notebook, HistoryIndex(self.event_log), self.labels, self.timed)
+        self.notebook.AddPage(self.history_panel, "")
+        self.labels.add(lambda text: self.notebook.SetPageText(1, text), N_("History"))
+        # The event log is only read when the tab is shown, and then only what was appended since.
+        self.notebook.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGED, self.timed(self.on_notebook_page_changed))
+        main_sizer.Add(self.notebook, 1, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 10)
 
         panel.SetSizer(main_sizer)
+        self.panel = panel
         self.update_ui_for_monitoring_state()
 
+    def InitMenu(self):
+        menu_bar = wx.MenuBar()
+        language_menu = wx.Menu()
+        # Language names are shown in their own language, so these items are never relabeled.
+        self.language_menu_ids = {}
+        for lang_code in available_languages():
+            item = language_menu.AppendRadioItem(wx.ID_ANY, language_name(lang_code))
+            item.Check(lang_code == self.current_lang)
+            self.language_menu_ids[item.GetId()] = lang_code
+            self.Bind(wx.EVT_MENU, self.timed(self.on_language_selected), item)
+        menu_bar.Append(language_menu, "")
+        self.SetMenuBar(menu_bar)
+        self.labels.add(lambda text: menu_bar.SetMenuLabel(0, text), N_("&Language"))
+
+    def on_language_selected(self, event):
+        self.switch_language(self.language_menu_ids[event.GetId()])
+
+    def switch_language(self, lang_code):
+        """
+        Shows the window, history and tray icon in `lang_code` and saves it to the config. Only
+        labels are changed: monitoring and everything else keeps running. Lines already in the
+        status log stay in the language they were logged in.
+        """
+        if lang_code == self.current_lang:
+            return
+        started = time.perf_counter()
+        set_language(lang_code)
+        self.current_lang = lang_code
+        self.relabel()
+        self._save_current_config()
+        self.log_status(_("Language changed to {language} in {milliseconds:.0f} ms.").format(
+            language=language_name(lang_code), milliseconds=(time.perf_counter() - started) * 1000))
+
+    def relabel(self):
+        """Sets every label again with the current `_`, e.g. after set_language()."""
+        self.SetTitle(_(self.title_message))
+        self.labels.relabel()
+        self.history_panel.relabel()
+        if self.taskBarIcon:
+            self.taskBarIcon.set_tooltip(_(self.tray_tooltip_text))
+        self.panel.Layout() # Translated labels have different widths
+
+    def on_notebook_page_changed(self, event):
+        if self.notebook.GetPage(event.GetSelection()) is self.history_panel:
+            self.history_panel.refresh_history()
+        event.Skip()
+
     def log_status(self, message): # message should be pre-translated if it's a translatable one
+        # Safe and cheap from any thread: the line is queued and shown by the next batched flush.
         now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        full_message = f"[{now_str}] {message}\n" # Date format is not typically translated
-        if hasattr(self, 'txt_status_log') and self.txt_status_log:
-            # Ensure this runs on the main GUI thread
-            if wx.IsMainThread():
-                self.txt_status_log.AppendText(full_message)
-            else:
-                wx.CallAfter(self.txt_status_log.AppendText, full_message)
-        print(full_message.strip()) # For console debugging, not translated
+        self.log_sink.write(f"[{now_str}] {message}\n") # Date format is not typically translated
+        if self.control_server:
+            self.control_server.publish("log", {"message": message, "level": "INFO"})
+
+    def _on_log_pending(self):
+        # Called once per batch, from whichever thread logged first; wx.CallLater needs the GUI thread.
+        wx.CallAfter(wx.CallLater, LOG_FLUSH_INTERVAL_MS, self._flush_status_log)
+
+    def _flush_status_log(self):
+        lines, dropped = self.log_sink.drain()
+        if dropped:
+            lines.insert(0, _("... {count} older messages were dropped ...").format(count=dropped) + "\n")
+        if not lines:
+            return
+        text = "".join(lines)
+        if self.echo_log_to_console:
+            print(text, end="") # For console debugging, not translated
+        if getattr(self, 'txt_status_log', None): # Not created yet, or already destroyed
+            self.txt_status_log.AppendText(text)
+            # Keep only the last DEFAULT_MAX_LINES lines so a long-running session stays small.
+            excess_lines = self.txt_status_log.GetNumberOfLines() - DEFAULT_MAX_LINES
+            if excess_lines > 0:
+                self.txt_status_log.Remove(0, self.txt_status_log.XYToPosition(0, excess_lines))
 
     def on_browse_app(self, event):
         if self.monitoring_active:
@@ -260,54 +523,134 @@ class AppBlockerFrame(wx.Frame):
             self._save_current_config()
 
 
-    def _load_initial_config(self):
-        config = load_config_from_file()
+    def _load_initial_config(self, config=None):
+        if config is None:
+            config = self.config_store.get()
         self.app_path_val = config["app_path"]
         self.end_hour_val = config["end_hour"]
         self.end_minute_val = config["end_minute"]
         self.block_activated_today = config["block_activated_today"]
         self.date_block_activated = config["date_block_activated"]
+        self.terminate_grace_period = config["terminate_grace_period"]
+        self.fsync_policy = config["fsync_policy"]
+        self.scanner_backend = config["scanner_backend"]
+        self.profiling = config["profiling"]
+        # The UI edits the top-level target; any other configured rules are carried along unchanged.
+        primary_key = normalize_exe_path(self.app_path_val) if self.app_path_val else None
+        self.extra_rules = [rule for rule in config["rules"] if BlockRule.from_config(rule).key != primary_key]
+        primary_rules = [rule for rule in config["rules"] if rule not in self.extra_rules]
+        # The window only edits the daily cutoff; a weekly schedule set in the file is kept as is.
+        self.primary_schedule = primary_rules[0].get("schedule") if primary_rules else None
+        self.blocked_until = primary_rules[0].get("blocked_until") if primary_rules else None
+        self.primary_match_renamed = primary_rules[0].get("match_renamed", False) if primary_rules else False
         # Log statements about config loading are in __init__ or handled by load_config_from_file itself for console.
 
     def _save_current_config(self):
-        # Get current values from UI controls if they exist, otherwise use stored values
-        current_hour = self.spin_hour.GetValue() if hasattr(self, 'spin_hour') and self.spin_hour else self.end_hour_val
-        current_minute = self.spin_minute.GetValue() if hasattr(self, 'spin_minute') and self.spin_minute else self.end_minute_val
-        
-        save_config_to_file(
+        self._write_current_config()
+        self.log_status(_("Configuration saved."))
+
+    def _write_current_config(self):
+        """Saves the current settings without logging it; for saves the user did not ask for."""
+        # Get current values from UI controls if they exist, otherwise use stored values.
+        # wx controls may only be touched from the main thread; the monitor thread uses the stored
+        # values, which match the (disabled) controls while monitoring is active.
+        on_main_thread = wx.IsMainThread()
+        current_hour = self.spin_hour.GetValue() if on_main_thread and hasattr(self, 'spin_hour') and self.spin_hour else self.end_hour_val
+        current_minute = self.spin_minute.GetValue() if on_main_thread and hasattr(self, 'spin_minute') and self.spin_minute else self.end_minute_val
+
+        # Written atomically by a background thread; bursts of saves are coalesced into one write.
+        self.config_writer.save(
             self.app_path_val,
             current_hour,
             current_minute,
             self.block_activated_today,
-            self.date_block_activated
+            self.date_block_activated,
+            self.current_lang,
+            self._current_rules(current_hour, current_minute),
+            self.terminate_grace_period,
+            self.fsync_policy,
+            self.scanner_backend,
+            self.profiling
         )
-        self.log_status(_("Configuration saved."))
+
+    def _current_rules(self, current_hour, current_minute):
+        """Returns every configured rule as config dicts, the UI-edited target first."""
+        rules = []
+        if self.app_path_val:
+            rules.append(BlockRule(
+                self.app_path_val, current_hour, current_minute,
+                self.block_activated_today, self.date_block_activated,
+                schedule=self.primary_schedule, blocked_until=self.blocked_until,
+                match_renamed=self.primary_match_renamed
+            ).to_config())
+        return rules + self.extra_rules
 
     def update_ui_for_monitoring_state(self):
         is_monitoring = self.monitoring_active
         if hasattr(self, 'btn_start'): # Ensure UI elements exist
             self.btn_start.Enable(not is_monitoring)
             self.btn_stop.Enable(is_monitoring)
-            
-            # Find the browse button correctly. self.GetChildren()[0] is the panel.
-            panel = self.GetChildren()[0]
-            browse_button = wx.FindWindowByLabel("Browse...", parent=panel)
-            if browse_button: browse_button.Enable(not is_monitoring)
-
-            self.spin_hour.Enable(not is_monitoring)
-            self.spin_minute.Enable(not is_monitoring)
-
-    # --- Callbacks for monitor_loop ---
-    def get_block_state(self):
-        return self.block_activated_today, self.date_block_activated
-
-    def set_block_state_and_save(self, block_activated, date_activated):
-        self.block_activated_today = block_activated
-        self.date_block_activated = date_activated
-        self._save_current_config() # This now saves the state passed from the blocker thread
+            self.btn_browse.Enable(not is_monitoring)
+            # The spin controls stay enabled: cutoff edits reach the running monitor (see on_block_time_changed).
+        if self.control_server:
+            rule_set = RuleSet(BlockRule.from_config(rule) for rule in self._current_rules(self.end_hour_val, self.end_minute_val))
+            self.control_server.update_status(monitoring=is_monitoring, rules=rules_snapshot(rule_set))
+
+    def request_monitoring(self, active):
+        """
+        For the control socket, from its thread: starts or stops monitoring on the GUI thread.
+        Returns False if monitoring already is in that state.
+        """
+        if self.monitoring_active == active:
+            return False
+        wx.CallAfter(self.on_start_monitoring if active else self.on_stop_monitoring, None)
+        return True
+
+    # --- Callbacks for monitor_rule_set ---
+    def save_rule_states(self, rule_set):
+        """
+        Called from the monitor thread: snapshots the block states of its RuleSet, which it keeps
+        changing, and has the GUI thread copy them back and save the config.
+        """
+        states = [(rule.key, rule.end_hour, rule.end_minute, rule.block_activated_today, rule.date_block_activated,
+                   rule.blocked_until, rule.schedule.config_values, rule.to_config()) for rule in rule_set.rules]
+        wx.CallAfter(self._apply_rule_states, states, rules_snapshot(rule_set))
+
+    def _apply_rule_states(self, states, rules_status):
+        primary_key = normalize_exe_path(self.app_path_val) if self.app_path_val else None
+        extra_rules = []
+        for key, end_hour, end_minute, block_activated_today, date_block_activated, blocked_until, schedule, rule_config in states:
+            if key == primary_key:
+                # The cutoff may have been edited in the config file while monitoring.
+                self.end_hour_val = end_hour
+                self.end_minute_val = end_minute
+                self.block_activated_today = block_activated_today
+                self.date_block_activated = date_block_activated
+                self.blocked_until = blocked_until
+                self.primary_schedule = schedule
+            else:
+                extra_rules.append(rule_config)
+        self.extra_rules = extra_rules
+        if self.control_server:
+            self.control_server.update_status(rules=rules_status)
+        self._sync_block_time_controls()
+        self._write_current_config() # Quietly, like the daemon: this runs on every block state change
+
+    def _sync_block_time_controls(self):
+        if self.spin_hour.GetValue() != self.end_hour_val:
+            self.spin_hour.SetValue(self.end_hour_val)
+        if self.spin_minute.GetValue() != self.end_minute_val:
+            self.spin_minute.SetValue(self.end_minute_val)
+
+    def on_block_time_changed(self, event):
+        if not self.monitoring_active:
+            return # Saved when monitoring starts, as before
+        self.end_hour_val = self.spin_hour.GetValue()
+        self.end_minute_val = self.spin_minute.GetValue()
+        self._save_current_config() # The running monitor reloads the saved file within a second
 
     def on_monitoring_stopped_by_thread(self):
-        """Called by monitor_loop (via wx.CallAfter) when it stops unexpectedly or finishes."""
+        """Called by monitor_rule_set (via wx.CallAfter) when it stops unexpectedly or finishes."""
         if self.monitoring_active: # If it was stopped by an error in the thread
             self.monitoring_active = False
             self.log_status(_("Monitoring stopped unexpectedly by the monitoring thread."))
@@ -318,7 +661,7 @@ class AppBlockerFrame(wx.Frame):
     # --- End Callbacks ---
 
     def on_start_monitoring(self, event):
-        if not self.app_path_val:
+        if not self.app_path_val and not self.extra_rules:
             wx.MessageBox(_("Please select an application to block."), _("Error"), wx.OK | wx.ICON_ERROR, self)
             return
 
@@ -337,19 +680,29 @@ class AppBlockerFrame(wx.Frame):
             app_name=app_name, hour=self.end_hour_val, minute=self.end_minute_val
         ))
 
+        rule_set = RuleSet(BlockRule.from_config(rule) for rule in self._current_rules(self.end_hour_val, self.end_minute_val))
+        if self.extra_rules:
+            self.log_status(_("Also monitoring {count} other configured application(s).").format(count=len(self.extra_rules)))
+
         self.monitor_thread = threading.Thread(
-            target=monitor_loop,
+            target=monitor_rule_set,
             args=(
-                self.app_path_val,
-                self.end_hour_val,
-                self.end_minute_val,
+                rule_set,
                 self.stop_event,
-                self.get_block_state,         # Pass callback for getting state
-                self.set_block_state_and_save,# Pass callback for setting state & saving
+                self.save_rule_states,        # Pass callback for saving block states
                 self.log_status,              # Pass logging callback
                 wx.CallAfter,                 # Pass wx.CallAfter for thread-safe GUI calls
                 self.on_monitoring_stopped_by_thread # Callback for when thread stops
             ),
+            kwargs={
+                "terminate_grace_period": self.terminate_grace_period,
+                "config_store": self.config_store,
+                "metrics": self.metrics,
+                "usage_accountant": UsageAccountant() if self.track_usage else None,
+                "scanner_backend": self.scanner_backend,
+                "event_log": self.event_log,
+                "profiler": self.profiler
+            },
             daemon=True
         )
         self.monitor_thread.start()
@@ -401,6 +754,9 @@ class AppBlockerFrame(wx.Frame):
 
         if not is_restarting:
             self._save_current_config() # Save final state
+        self.config_writer.close() # Flush any pending write before the process exits
+
+        self._flush_status_log() # Echo the last messages before the window goes away
 
         if self.taskBarIcon:
             self.taskBarIcon.cleanup()
@@ -0,0 +1,167 @@
+"""
+Enforcement history: what the monitor did, when, and to which application.
+
+The monitor appends an event whenever a block starts or ends and for every process it
+terminates, has to kill after the grace period (an escalation), or fails to kill. EventLog
+stores them as fixed-size binary records in the app data directory. HistoryIndex loads the
+file as columns (one array per field, straight from the bytes with no per-record unpacking)
+and answers "events of this app in this date range, newest first" with binary searches, so
+the GUI's virtual list only ever formats the rows on screen.
+
+    python -m app_blocker.history [--app KEY] [--days 7] [--limit 50]
+"""
+import argparse
+import bisect
+import collections
+import datetime
+import itertools
+import operator
+import os
+import struct
+import sys
+import time
+from array import array
+
+from . import config
+
+EVENTS_FILE_NAME = "events.bin"
+EVENT_APPS_FILE_NAME = "event_apps.json"
+# One record per event: Unix time, app id (index into the apps file), event kind, PID (0 for block events).
+# 16 bytes with the double first, so the file can be read as arrays of doubles, shorts and ints directly.
+RECORD = struct.Struct("<dHHI")
+
+BLOCK_ACTIVATED, BLOCK_ENDED, TERMINATED, KILLED, KILL_FAILED = range(5)
+EVENT_KINDS = ("block_activated", "block_ended", "terminated", "killed", "kill_failed")
+
+HistoryEvent = collections.namedtuple("HistoryEvent", "time app kind pid")
+
+
+def _event_paths():
+    return (os.path.join(config.APP_DATA_DIR, EVENTS_FILE_NAME), os.path.join(config.APP_DATA_DIR, EVENT_APPS_FILE_NAME))
+
+
+class EventLog(config.AppRecordLog):
+    """Append-only store of (time, app, kind, pid) records. App keys are mapped to small integer ids."""
+
+    def __init__(self, path=None, apps_path=None):
+        default_path, default_apps_path = _event_paths()
+        super().__init__(path or default_path, apps_path or default_apps_path, RECORD)
+
+    def append(self, events):
+        """Appends [(time, app key, kind, pid)] events."""
+        self._write(b"".join(RECORD.pack(event_time, self._app_id(app_key), kind, pid)
+                             for event_time, app_key, kind, pid in events))
+
+
+def _columns(data):
+    """Splits whole RECORDs into (times, app ids, kinds, pids) arrays with strided slices."""
+    doubles, shorts, ints = array("d"), array("H"), array("I")
+    for column in (doubles, shorts, ints):
+        column.frombytes(data)
+        if sys.byteorder != "little":
+            column.byteswap()
+    return doubles[::2], shorts[4::8], shorts[5::8], ints[3::4]
+
+
+class HistoryIndex:
+    """
+    Columnar, time-sorted view of an EventLog. refresh() picks up events appended since the last
+    call. query() returns row numbers and row() turns one into a HistoryEvent, so a caller that
+    shows a window of rows only builds those. Per-app row lists are built the first time an app
+    is filtered on and kept up to date by refresh().
+    """
+
+    def __init__(self, event_log=None):
+        self.event_log = event_log or EventLog()
+        self.apps = []
+        self.times = array("d")
+        self.app_ids = array("H")
+        self.kinds = array("H")
+        self.pids = array("I")
+        self._offset = 0
+        self._rows_by_app = {} # app id -> array of row numbers, in time order
+
+    def __len__(self):
+        return len(self.times)
+
+    def refresh(self):
+        """Loads events appended since the last refresh. Returns how many there were."""
+        data = self.event_log.read(self._offset)
+        if not data:
+            return 0
+        self._offset += len(data)
+        self.apps = self.event_log.load_apps()
+        first_new = len(self.times)
+        for column, new in zip((self.times, self.app_ids, self.kinds, self.pids), _columns(data)):
+            column.extend(new)
+        # Appends are in time order unless the clock was set back or two monitors shared the file.
+        tail = self.times[max(first_new - 1, 0):]
+        if all(map(operator.le, tail, itertools.islice(tail, 1, None))):
+            for app_id, rows in self._rows_by_app.items():
+                rows.extend(self._scan_rows(app_id, first_new))
+        else:
+            self._sort()
+        return len(self.times) - first_new
+
+    def _sort(self):
+        order = sorted(range(len(self.times)), key=self.times.__getitem__)
+        for name in ("times", "app_ids", "kinds", "pids"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, map(column.__getitem__, order)))
+        self._rows_by_app.clear()
+
+    def _scan_rows(self, app_id, first_row=0):
+        rows = range(first_row, len(self.app_ids))
+        return array("I", itertools.compress(rows, map(app_id.__eq__, self.app_ids[first_row:])))
+
+    def _rows_for(self, app_id):
+        if app_id not in self._rows_by_app:
+            self._rows_by_app[app_id] = self._scan_rows(app_id)
+        return self._rows_by_app[app_id]
+
+    def query(self, app_key=None, start=None, end=None):
+        """
+        Row numbers of the events of `app_key` (every app if None) with start <= time < end
+        (Unix times; None for open-ended), newest first. Returns a sequence, not a list: for
+        every app it is a range, so even a million rows cost nothing to hand to a list control.
+        """
+        if app_key is None:
+            low = 0 if start is None else bisect.bisect_left(self.times, start)
+            high = len(self.times) if end is None else bisect.bisect_left(self.times, end)
+            return range(high - 1, low - 1, -1)
+        if app_key not in self.apps:
+            return range(0)
+        rows = self._rows_for(self.apps.index(app_key))
+        low = 0 if start is None else bisect.bisect_left(rows, start, key=self.times.__getitem__)
+        high = len(rows) if end is None else bisect.bisect_left(rows, end, key=self.times.__getitem__)
+        return rows[low:high][::-1]
+
+    def row(self, row_number):
+        app_id = self.app_ids[row_number]
+        return HistoryEvent(
+            self.times[row_number],
+            self.apps[app_id] if app_id < len(self.apps) else f"#{app_id}",
+            EVENT_KINDS[self.kinds[row_number]] if self.kinds[row_number] < len(EVENT_KINDS) else "unknown",
+            self.pids[row_number]
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print recent enforcement events, newest first.")
+    parser.add_argument("--app", help="Only events of this app (a rule key, e.g. the normalized executable path)")
+    parser.add_argument("--days", type=int, default=7, help="Number of days to show, ending now")
+    parser.add_argument("--limit", type=int, default=50, help="Maximum number of events to print")
+    args = parser.parse_args(argv)
+    index = HistoryIndex()
+    index.refresh()
+    rows = index.query(args.app, time.time() - args.days * 86400)
+    for row_number in rows[:args.limit]:
+        event = index.row(row_number)
+        when = datetime.datetime.fromtimestamp(event.time).strftime("%Y-%m-%d %H:%M:%S")
+        pid = f" (PID: {event.pid})" if event.pid else ""
+        print(f"{when}  {event.kind:<15}  {event.app}{pid}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import gettext
+import os
+import sys
+
+def get_bundle_dir():
+    """ Returns the base directory for PyInstaller bundle or script directory for normal execution. """
+    if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
+        # Running in a PyInstaller bundle
+        return sys._MEIPASS
+    else:
+        # Running in a normal Python environment
+        # Assumes i18n.py is in app_blocker, and project root is one level up.
+        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+LOCALE_DIR = os.path.join(get_bundle_dir(), 'locale')
+
+# Shown in the Language menu in their own language, so they are never translated.
+LANGUAGE_NAMES = {"en": "English", "ar": "العربية"}
+
+_translations = {} # lang_code -> gettext translation object, loaded at most once each
+_available_languages = None
+
+def N_(message):
+    """Marks `message` for extraction without translating it; it is translated with _() where it is shown."""
+    return message
+
+def available_languages():
+    """Returns the codes of the languages with a catalog under LOCALE_DIR, sorted. The directory is listed once."""
+    global _available_languages
+    if _available_languages is None:
+        try:
+            entries = os.listdir(LOCALE_DIR)
+        except OSError:
+            entries = []
+        _available_languages = sorted(
+            lang_code for lang_code in entries
+            if any(os.path.exists(os.path.join(LOCALE_DIR, lang_code, 'LC_MESSAGES', 'messages' + extension))
+                   for extension in ('.mo', '.po'))
+        )
+    return _available_languages
+
+def language_name(lang_code):
+    return LANGUAGE_NAMES.get(lang_code, lang_code)
+
+def preload_translations(lang_codes=None):
+    """Loads the catalogs of `lang_codes` (every available language by default) so switching to one later is instant."""
+    for lang_code in available_languages() if lang_codes is None else lang_codes:
+        get_translation(lang_code)
+
+def get_translation(lang_code):
+    """Returns the translation for `lang_code`, loading the catalog only the first time it is asked for."""
+    if lang_code in _translations:
+        return _translations[lang_code]
+    if os.path.isdir(LOCALE_DIR):
+        try:
+            translation = gettext.translation('messages', localedir=LOCALE_DIR, languages=[lang_code], fallback=True)
+        except Exception as e:
+            print(f"Failed to load language '{lang_code}': {e}. Using fallback gettext.")
+            translation = gettext.NullTranslations()
+    else:
+        print(f"Locale directory '{LOCALE_DIR}' not found. Using fallback gettext.")
+        translation = gettext.NullTranslations()
+    _translations[lang_code] = translation
+    return translation
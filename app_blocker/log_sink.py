@@ -0,0 +1,42 @@
+import collections
+import threading
+
+# Lines kept in the GUI status log, and queued between flushes. Older lines are discarded.
+DEFAULT_MAX_LINES = 1000
+
+
+class LogSink:
+    """
+    Bounded buffer between log producers (any thread, including the monitor loop) and one consumer
+    that drains it in batches. write() only appends to a ring buffer; when more than `max_lines`
+    are queued between drains the oldest are dropped and counted, so memory stays flat however
+    fast messages arrive. `on_pending` is called once when the buffer goes from empty to non-empty,
+    so the consumer is woken once per batch rather than once per line.
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, on_pending=None):
+        self._lock = threading.Lock()
+        self._pending = collections.deque(maxlen=max_lines)
+        self._dropped = 0
+        self._notified = False
+        self.on_pending = on_pending
+
+    def write(self, line):
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self._dropped += 1
+            self._pending.append(line)
+            notify = not self._notified
+            self._notified = True
+        if notify and self.on_pending:
+            self.on_pending()
+
+    def drain(self):
+        """Returns (lines, dropped): everything queued since the last drain and how many lines were discarded."""
+        with self._lock:
+            lines = list(self._pending)
+            self._pending.clear()
+            dropped = self._dropped
+            self._dropped = 0
+            self._notified = False
+        return lines, dropped
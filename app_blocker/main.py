@@ -1,50 +1,21 @@
+from . import startup # Imported first so --profile-startup covers everything below
 import wx
-import os 
-import sys # Added for sys.frozen and sys._MEIPASS
-import gettext
+import os
+import argparse
 
 # Import configuration loading functions and constants
-from .config import load_config_from_file, TRAY_ICON_PATH, DEFAULT_LANGUAGE
-
-def get_bundle_dir():
-    """ Returns the base directory for PyInstaller bundle or script directory for normal execution. """
-    if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-        # Running in a PyInstaller bundle
-        return sys._MEIPASS
-    else:
-        # Running in a normal Python environment
-        # Assumes main.py is in app_blocker, and project root is one level up.
-        return os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-
-MAIN_LOCALE_DIR = os.path.join(get_bundle_dir(), 'locale')
-
-# --- Initial Language Setup ---
-# Load language from config first to set up gettext correctly
-app_config_values = load_config_from_file()
-current_language = app_config_values.get('language', DEFAULT_LANGUAGE)
-
-# Initialize gettext with the loaded language
-try:
-    if os.path.isdir(MAIN_LOCALE_DIR):
-        translation = gettext.translation('messages', localedir=MAIN_LOCALE_DIR, languages=[current_language], fallback=True)
-        _ = translation.gettext
-    else: # Fallback if locale directory isn't found
-        print(f"Locale directory not found at {MAIN_LOCALE_DIR}. Using fallback gettext.")
-        _ = gettext.gettext
-except Exception as e_gettext:
-    print(f"Error setting up gettext in main.py with language '{current_language}': {e_gettext}. Using fallback gettext.")
-    _ = gettext.gettext # Fallback
-
-# Now import GUI components which might use _ in their definitions or need the language
+from .config import TRAY_ICON_PATH, DEFAULT_LANGUAGE
+from .config_store import ConfigStore
+from .control import ControlServer
+from .metrics import MetricsExporter, MonitorMetrics
+from .profiling import Profiler
+from .i18n import N_, get_translation
 from .gui import AppBlockerFrame
 
+startup.mark("imports")
 
-# Define translatable strings used in main.py
-APP_NAME = _("App Time Blocker v2")
-TRAY_TOOLTIP_TEXT = _('App Time Blocker Tray')
-
-if __name__ == '__main__':
-    # Create a dummy icon.png if it doesn't exist for testing tray icon
+def create_dummy_icon():
+    """Creates a dummy icon.png for testing the tray icon if it doesn't exist."""
     if not os.path.exists(TRAY_ICON_PATH): # TRAY_ICON_PATH is imported from config
         try:
             from PIL import Image, ImageDraw # Pillow is an external dependency
@@ -58,12 +29,91 @@ if __name__ == '__main__':
         except Exception as e_img:
             print(f"Error creating dummy icon: {e_img}")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="App Time Blocker")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print how long each startup phase took once the window is ready, then exit")
+    parser.add_argument("--no-console-log", action="store_true",
+                        help="Show status messages only in the window, without echoing them to the console")
+    parser.add_argument("--metrics-file", help="Write Prometheus metrics to this file (for node_exporter's textfile collector)")
+    parser.add_argument("--stats-port", type=int, help="Serve JSON stats and Prometheus metrics on 127.0.0.1:PORT")
+    parser.add_argument("--no-usage-tracking", action="store_true", help="Do not record how long target applications run")
+    parser.add_argument("--control-socket", help="Accept JSON-RPC control requests on this Unix socket (see control.py)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the monitor loop and UI handlers and write flamegraph stacks to the app data directory")
+    args, _unknown = parser.parse_known_args(argv)
+
+    # --- Initial Language Setup ---
+    # The config is read once here and handed to the frame, which does not read it again.
+    # The store keeps it cached and is shared with the monitor thread, which reloads it when the file changes.
+    config_store = ConfigStore()
+    app_config_values = config_store.get()
+    current_language = app_config_values.get('language', DEFAULT_LANGUAGE)
+    startup.mark("config")
+
+    # The catalog is cached, so the frame's set_language() call reuses it.
+    get_translation(current_language)
+    startup.mark("locale")
+
+    # Translated by the frame, which shows them again in a newly selected language without a restart
+    app_name = N_("App Time Blocker v2")
+    tray_tooltip_text = N_('App Time Blocker Tray')
+
+    create_dummy_icon()
+
+    metrics = MonitorMetrics()
+    exporter = None
+    if args.metrics_file or args.stats_port is not None:
+        try:
+            exporter = MetricsExporter(metrics, textfile_path=args.metrics_file, http_port=args.stats_port)
+            exporter.start()
+        except OSError as e:
+            print(f"Could not start the stats endpoint on port {args.stats_port}: {e}")
+
+    profiler = Profiler(enabled=args.profile or app_config_values["profiling"])
+    profiler.follow(config_store) # Editing "profiling" in the config file turns it on or off while running
+
+    frame = None
+    control_server = None
+    if args.control_socket:
+        # Requests arrive on the server's thread; the frame hands them to the GUI thread.
+        control_server = ControlServer(args.control_socket,
+                                       lambda: frame is not None and frame.request_monitoring(True),
+                                       lambda: frame is not None and frame.request_monitoring(False),
+                                       metrics)
+
     app = wx.App(False)
-    # Pass the translated title, tooltip text, and current_language to the frame
+    # Pass the title, tooltip text, current_language and the loaded config to the frame
     frame = AppBlockerFrame(
-        None, 
-        title=APP_NAME, 
-        tray_tooltip_text=TRAY_TOOLTIP_TEXT,
-        current_lang=current_language # Pass loaded language
-    ) 
+        None,
+        title=app_name,
+        tray_tooltip_text=tray_tooltip_text,
+        current_lang=current_language, # Pass loaded language
+        config_values=app_config_values,
+        config_store=config_store,
+        echo_log_to_console=not args.no_console_log,
+        metrics=metrics,
+        track_usage=not args.no_usage_tracking,
+        control_server=control_server,
+        profiler=profiler
+    )
+    startup.mark("window_ready")
+    if control_server:
+        try:
+            control_server.start()
+        except OSError as e:
+            print(f"Could not start the control socket at {args.control_socket}: {e}")
+            control_server = None
+
+    if args.profile_startup:
+        startup.print_report()
+        wx.CallAfter(frame.on_proper_exit)
     app.MainLoop()
+    profiler.close() # Writes out the last profile, if profiling
+    if control_server:
+        control_server.close()
+    if exporter:
+        exporter.close()
+
+if __name__ == '__main__':
+    main()
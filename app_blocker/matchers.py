@@ -0,0 +1,201 @@
+"""
+Cost-ordered process matching.
+
+Each rule is compiled into stages run from cheapest to most expensive: process name (read along
+with create_time when a PID is first seen; see process_table.py), then uid, then executable path
+(a readlink that fails with AccessDenied for other users' processes on Linux), then the executable's content hash
+(looked up in a FingerprintCache, hashed in the background the first time), then command line. A
+stage only runs for processes that passed the ones before it, and each attribute is fetched at
+most once per process.
+
+A path rule expects the names its app_path can run under (see names_for_path()), so processes
+with any other name are rejected without reading their executable. A binary started through a
+differently named symlink or hardlink, or one that renamed itself with prctl, runs under another
+name and slips past that; a rule with match_renamed looks such processes up by executable path
+too, at the cost of one readlink per new process while any such rule is configured.
+"""
+import os
+import re
+
+import psutil
+
+from .fingerprint import PENDING
+
+# Linux keeps only this many characters of a process name (comm). psutil recovers the full name
+# from the command line when it can, so both forms are accepted.
+COMM_NAME_LENGTH = 15
+
+_UNRESOLVED = object()
+
+
+def normalize_exe_path(path):
+    """Normalizes an executable path so it can be used as a lookup key."""
+    return os.path.normcase(os.path.normpath(path))
+
+
+def normalize_process_name(name):
+    return os.path.normcase(name)
+
+
+def names_for_path(app_path):
+    """
+    The process names an executable at `app_path` can run under: its file name, the file name it
+    resolves to if it is a symlink (exe() reports the resolved path, comm the name it was started as),
+    and the truncated comm form of each.
+    """
+    names = set()
+    for path in (app_path, os.path.realpath(app_path)):
+        name = normalize_process_name(os.path.basename(path))
+        names.add(name)
+        names.add(name[:COMM_NAME_LENGTH])
+    return names
+
+
+class ProcessInfo:
+    """
+    What the scan knows about one process. `name` and `create_time` are read when the PID is first
+    seen; uid(), exe_key(), exe_digest() and cmdline() are read on first use and cached, with None
+    meaning the attribute could not be read. Failed reads are counted on `scan_cache`, whose
+    FingerprintCache supplies digests. The psutil.Process is only created once something needs
+    it, if the scan did not pass one in; attributes are read through the ScanCache's process table,
+    so the procfs backend never needs one until the process is terminated.
+    """
+
+    __slots__ = ("pid", "create_time", "name", "_proc", "_scan_cache", "_uid", "_exe_key", "_exe_digest", "_cmdline")
+
+    def __init__(self, pid, create_time, name, scan_cache, proc=None):
+        self.pid = pid
+        self.create_time = create_time
+        self.name = normalize_process_name(name) if name else ""
+        self._proc = proc
+        self._scan_cache = scan_cache
+        self._uid = _UNRESOLVED
+        self._exe_key = _UNRESOLVED
+        self._exe_digest = _UNRESOLVED
+        self._cmdline = _UNRESOLVED
+
+    def process(self):
+        """Returns the psutil.Process. Raises psutil.NoSuchProcess if it is gone."""
+        if self._proc is None:
+            self._proc = psutil.Process(self.pid)
+        return self._proc
+
+    def _read(self, attribute):
+        try:
+            return getattr(self._scan_cache.process_table, attribute)(self)
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            self._scan_cache.no_such_process += 1
+        except psutil.AccessDenied:
+            self._scan_cache.access_denied += 1
+        return None
+
+    def uid(self):
+        """Real uid, or None. Always None on Windows."""
+        if self._uid is _UNRESOLVED:
+            self._uid = self._read("uid")
+        return self._uid
+
+    def exe_key(self):
+        if self._exe_key is _UNRESOLVED:
+            self._scan_cache.exe_resolutions += 1
+            proc_exe = self._read("exe")
+            self._exe_key = normalize_exe_path(proc_exe) if proc_exe else None
+        return self._exe_key
+
+    def exe_digest(self):
+        """SHA-256 of the executable, PENDING while it is being hashed, or None."""
+        if self._exe_digest is _UNRESOLVED or self._exe_digest is PENDING:
+            exe_key = self.exe_key()
+            self._exe_digest = self._scan_cache.fingerprints.lookup(exe_key) if exe_key else None
+        return self._exe_digest
+
+    @property
+    def waiting_for_digest(self):
+        return self._exe_digest is PENDING
+
+    def cmdline(self):
+        """The command line joined with spaces, or None."""
+        if self._cmdline is _UNRESOLVED:
+            args = self._read("cmdline")
+            self._cmdline = " ".join(args) if args is not None else None
+        return self._cmdline
+
+
+class RuleMatcher:
+    """The stages compiled from one BlockRule. A stage that is not configured always passes."""
+
+    def __init__(self, rule):
+        self.rule = rule
+        # Else `names` only says which processes to try first; the rest are looked up by exe path
+        self.name_required = bool(rule.process_name) or not rule.match_renamed
+        if rule.process_name:
+            names = {normalize_process_name(rule.process_name)}
+            self.names = names | {name[:COMM_NAME_LENGTH] for name in names}
+        elif rule.app_path:
+            self.names = names_for_path(rule.app_path)
+        else:
+            self.names = None # Only content or command line; every process has to be looked at
+        self.uids = frozenset(rule.uids) if rule.uids else None
+        self.exe_key = normalize_exe_path(rule.app_path) if rule.app_path else None
+        self.exe_sha256 = rule.exe_sha256.lower() if rule.exe_sha256 else None
+        self.cmdline_re = re.compile(rule.cmdline_pattern) if rule.cmdline_pattern else None
+
+    def matches(self, info):
+        """Runs every stage after the name, which MatchPipeline has already checked."""
+        if self.uids is not None:
+            uid = info.uid()
+            # An unknown uid (Windows) does not rule the process out; the other stages still apply.
+            if uid is not None and uid not in self.uids:
+                return False
+        if self.exe_key is not None and info.exe_key() != self.exe_key:
+            return False
+        if self.exe_sha256 is not None and info.exe_digest() != self.exe_sha256:
+            return False # Also while the digest is PENDING; the ScanCache looks again
+        if self.cmdline_re is not None:
+            cmdline = info.cmdline()
+            if cmdline is None or not self.cmdline_re.search(cmdline):
+                return False
+        return True
+
+
+class MatchPipeline:
+    """
+    RuleMatchers indexed by process name and, for match_renamed rules, by executable path. A
+    process whose name no rule accepts is rejected without reading anything else unless there are
+    match_renamed rules; then its executable is read (once, then cached) and looked up as well.
+    See the module docstring.
+    """
+
+    def __init__(self, matchers):
+        self._by_name = {} # normalized name -> [RuleMatcher]
+        self._by_exe = {}  # normalized exe path -> [RuleMatcher] whose name is only a hint (match_renamed)
+        self._exe_matcher_count = 0
+        self._any_name = [] # Matchers without a name stage
+        for matcher in matchers:
+            if matcher.names is None:
+                self._any_name.append(matcher)
+                continue
+            for name in matcher.names:
+                self._by_name.setdefault(name, []).append(matcher)
+            if not matcher.name_required:
+                self._by_exe.setdefault(matcher.exe_key, []).append(matcher)
+                self._exe_matcher_count += 1
+
+    def __bool__(self):
+        return bool(self._by_name or self._any_name)
+
+    def match(self, info):
+        """Returns the first rule whose stages all pass for `info` (a ProcessInfo), or None."""
+        named = self._by_name.get(info.name, ())
+        for matcher in named:
+            if matcher.matches(info):
+                return matcher.rule
+        # match_renamed rules not tried by name yet; if all were, their exe stage has already been run.
+        if self._exe_matcher_count > sum(1 for matcher in named if not matcher.name_required):
+            for matcher in self._by_exe.get(info.exe_key(), ()):
+                if info.name not in matcher.names and matcher.matches(info):
+                    return matcher.rule
+        for matcher in self._any_name:
+            if matcher.matches(info):
+                return matcher.rule
+        return None
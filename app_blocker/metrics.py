@@ -0,0 +1,211 @@
+"""
+Counters and histograms for the enforcement loop, exported as a Prometheus text file and as
+JSON over a local HTTP endpoint. Only the monitor thread updates them, with plain integer and
+float arithmetic, so collection is cheap enough to leave on. Readers may see a tick half-applied.
+"""
+import bisect
+import http.server
+import json
+import os
+import tempfile
+import threading
+import time
+
+METRIC_PREFIX = "app_blocker_"
+DEFAULT_EXPORT_INTERVAL = 15.0 # Seconds between rewrites of the Prometheus text file
+
+# Histogram upper bounds. Tick durations and kill latencies are in seconds.
+TICK_DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+PROCESSES_SCANNED_BUCKETS = (0, 1, 10, 100, 500, 1000, 5000, 10000, 50000)
+KILL_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value}"
+        ]
+
+    def to_dict(self):
+        return self.value
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1) # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + ("+Inf",), self.bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {str(bound): bucket_count for bound, bucket_count in zip(self.buckets + ("+Inf",), self.bucket_counts)}
+        }
+
+
+class MonitorMetrics:
+    """Everything monitor_rule_set() records. One instance per monitor; pass it in to read it from outside."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.ticks = Counter(METRIC_PREFIX + "ticks_total", "Monitor loop passes.")
+        self.tick_duration = Histogram(METRIC_PREFIX + "tick_duration_seconds",
+                                       "Time spent per monitor loop pass, excluding sleep.", TICK_DURATION_BUCKETS)
+        self.processes_scanned = Histogram(METRIC_PREFIX + "processes_scanned",
+                                           "PIDs listed or received from the watcher per pass with an active block.",
+                                           PROCESSES_SCANNED_BUCKETS)
+        self.exe_resolutions = Counter(METRIC_PREFIX + "exe_resolutions_total", "Executable paths resolved.")
+        self.access_denied = Counter(METRIC_PREFIX + "access_denied_total", "Processes that could not be inspected (AccessDenied).")
+        self.exe_hashes = Counter(METRIC_PREFIX + "exe_hashes_total", "Executables hashed for exe_sha256 rules (once per file).")
+        self.no_such_process = Counter(METRIC_PREFIX + "no_such_process_total", "Processes that exited while being inspected.")
+        self.matches = Counter(METRIC_PREFIX + "matches_total", "Running processes found matching an active block.")
+        self.terminated = Counter(METRIC_PREFIX + "terminated_total", "Matched processes that exited after SIGTERM.")
+        self.killed = Counter(METRIC_PREFIX + "killed_total", "Matched processes that had to be escalated to kill.")
+        self.kill_failed = Counter(METRIC_PREFIX + "kill_failed_total", "Matched processes still running after kill, or not signalable.")
+        self.enforcement_steps = Counter(METRIC_PREFIX + "enforcement_steps_total",
+                                         "Enforcement steps short of terminate (deprioritize, cpu_limit, freeze) applied to targets.")
+        self.launchers_suppressed = Counter(METRIC_PREFIX + "launchers_suppressed_total",
+                                            "Launchers frozen or terminated for respawning a blocked target.")
+        self.kill_latency = Histogram(METRIC_PREFIX + "kill_latency_seconds",
+                                      "Time from detecting a blocked process to its exit.", KILL_LATENCY_BUCKETS)
+
+    def all_metrics(self):
+        return [
+            self.ticks, self.tick_duration, self.processes_scanned, self.exe_resolutions, self.exe_hashes,
+            self.access_denied, self.no_such_process, self.matches, self.terminated, self.killed, self.kill_failed,
+            self.enforcement_steps, self.launchers_suppressed, self.kill_latency
+        ]
+
+    def render_prometheus(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.all_metrics():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """Returns every metric keyed by its name without the prefix, for the JSON stats endpoint."""
+        stats = {metric.name[len(METRIC_PREFIX):]: metric.to_dict() for metric in self.all_metrics()}
+        stats["uptime_seconds"] = round(time.time() - self.started_at, 3)
+        return stats
+
+
+def write_prometheus_textfile(metrics, path):
+    """Writes the metrics for node_exporter's textfile collector, atomically so it never reads half a file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".metrics-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(metrics.render_prometheus())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class _StatsRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        metrics = self.server.metrics
+        if self.path in ("/", "/stats"):
+            body, content_type = json.dumps(metrics.to_dict(), indent=4).encode(), "application/json"
+        elif self.path == "/metrics":
+            body, content_type = metrics.render_prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes are not worth a status log line each
+
+
+class MetricsExporter:
+    """
+    Publishes `metrics` to a Prometheus text file every `interval` seconds and/or serves
+    /stats (JSON) and /metrics (Prometheus text) on 127.0.0.1:`http_port`. Either may be None.
+    """
+
+    def __init__(self, metrics, textfile_path=None, http_port=None, interval=DEFAULT_EXPORT_INTERVAL, log_error_func=print):
+        self.metrics = metrics
+        self.textfile_path = textfile_path
+        self.interval = interval
+        self._log_error_func = log_error_func
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._server = None
+        if http_port is not None:
+            # Loopback only: the stats reveal what is blocked and are not meant for the network.
+            self._server = http.server.ThreadingHTTPServer(("127.0.0.1", http_port), _StatsRequestHandler)
+            self._server.daemon_threads = True
+            self._server.metrics = metrics
+
+    @property
+    def http_port(self):
+        return self._server.server_address[1] if self._server else None
+
+    def start(self):
+        if self._server:
+            self._threads.append(threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True))
+        if self.textfile_path:
+            self._threads.append(threading.Thread(target=self._write_periodically, name="metrics-textfile", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def _write_textfile(self):
+        try:
+            write_prometheus_textfile(self.metrics, self.textfile_path)
+        except OSError as e:
+            self._log_error_func(f"Error writing metrics to {self.textfile_path}: {e}")
+
+    def _write_periodically(self):
+        while True:
+            self._write_textfile()
+            if self._stop_event.wait(self.interval):
+                return
+
+    def close(self):
+        self._stop_event.set()
+        if self._server:
+            if self._threads:
+                self._server.shutdown() # Only returns once serve_forever() has been running
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        if self.textfile_path:
+            self._write_textfile() # Final values
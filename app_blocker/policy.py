@@ -0,0 +1,297 @@
+"""
+Fleet policy sync: pulls the blocked rules from a central HTTP endpoint.
+
+The server returns a JSON policy document, {"rules": [...]}, with rule dicts shaped like the
+config's "rules" (block state fields are ignored; each machine keeps its own). The client:
+
+  * sends If-None-Match with the ETag of the policy it has, so an unchanged policy costs a 304;
+  * sends "A-IM: rules-delta", so a server that keeps history can answer 226 IM Used with
+    {"upsert": [rule, ...], "remove": [rule key, ...]} relative to that ETag instead of the whole
+    document (rule keys are rules.rule_key()); a plain 200 with the full document always works;
+  * caches the last good policy and its ETag on disk, so enforcement carries on while the server
+    is unreachable, including across restarts;
+  * rejects a policy or delta with a rule the config file would drop as invalid, keeping the
+    current policy, so a typo on the server is a failed poll rather than a silently missing rule.
+
+PolicySync polls on a background thread, with the first poll spread over a whole interval and
+every later one jittered, so a fleet that boots together does not hit the server together. A
+changed policy is written to the config file through the shared ConfigWriter; running monitors
+pick it up through their ConfigStore without a restart.
+"""
+import json
+import os
+import random
+import tempfile
+import threading
+
+from . import config
+from .rules import MATCHER_FIELDS, rule_key
+
+POLICY_CACHE_FILE_NAME = "policy_cache.json"
+DEFAULT_POLL_INTERVAL = 300.0 # Seconds between polls
+DEFAULT_JITTER = 0.2          # Each poll interval is stretched or shrunk by up to this fraction
+DEFAULT_TIMEOUT = 10.0
+RETRY_DELAY = 15.0            # First retry after a failed poll; doubles per failure...
+MAX_RETRY_DELAY = 900.0       # ...up to this
+DELTA_ENCODING = "rules-delta"
+BLOCK_STATE_FIELDS = ("block_activated_today", "date_block_activated", "blocked_until")
+
+
+def _policy_cache_path():
+    return os.path.join(config.APP_DATA_DIR, POLICY_CACHE_FILE_NAME)
+
+
+def _key_of(raw_rule):
+    return rule_key(raw_rule.get("app_path"), *(raw_rule.get(field) for field in MATCHER_FIELDS))
+
+
+def _without_block_state(rule):
+    return {field: value for field, value in rule.items() if field not in BLOCK_STATE_FIELDS}
+
+
+def validate_policy_rules(rules):
+    """Raises ValueError if any of `rules` (raw policy rule dicts) would be dropped from a config file as invalid."""
+    for raw_rule in rules:
+        try:
+            config.parse_rule(raw_rule)
+        except ValueError as e:
+            raise ValueError(f"Policy rule {raw_rule!r} is {e}")
+
+
+def apply_delta(rules, delta):
+    """
+    Returns `rules` (raw policy rule dicts) with a rules-delta applied: rules whose key is in
+    "remove" are dropped, "upsert" rules replace the rule with the same key in place or are
+    appended. Raises ValueError if the delta is malformed or upserts an invalid rule.
+    """
+    if not isinstance(delta, dict) or not isinstance(delta.get("upsert", []), list) or not isinstance(delta.get("remove", []), list):
+        raise ValueError("Policy delta must be an object with \"upsert\" and \"remove\" lists")
+    if not all(isinstance(key, str) for key in delta.get("remove", [])):
+        raise ValueError("Policy delta \"remove\" entries must be rule keys")
+    removed = set(delta.get("remove", []))
+    upserts = {}
+    validate_policy_rules(delta.get("upsert", []))
+    for raw_rule in delta.get("upsert", []):
+        upserts[_key_of(raw_rule)] = raw_rule
+    patched = []
+    for raw_rule in rules:
+        key = _key_of(raw_rule)
+        if key in removed:
+            continue
+        patched.append(upserts.pop(key, raw_rule))
+    return patched + list(upserts.values())
+
+
+def merge_policy_rules(current_rules, policy_rules):
+    """
+    Returns the config "rules" list for `policy_rules` (raw policy rule dicts), validated like the
+    config file, with the block state of any rule in `current_rules` (parsed config rules) that
+    has the same key carried over.
+    """
+    parsed = config.config_values_from_data({"rules": [_without_block_state(rule) for rule in policy_rules]})["rules"]
+    current_by_key = {_key_of(rule): rule for rule in current_rules}
+    merged = []
+    for rule in parsed:
+        current = current_by_key.get(_key_of(rule))
+        if current:
+            rule.update({field: current[field] for field in BLOCK_STATE_FIELDS if field in current})
+        merged.append(rule)
+    return merged
+
+
+class PolicyClient:
+    """
+    Fetches the policy at `url` with conditional and delta requests, and keeps the last good
+    copy in `cache_path`. `rules` is None until a policy has been loaded or fetched.
+    """
+
+    def __init__(self, url, cache_path=None, timeout=DEFAULT_TIMEOUT):
+        self.url = url
+        self.cache_path = cache_path or _policy_cache_path()
+        self.timeout = timeout
+        self.etag = None
+        self.rules = None
+        self.full_fetches = 0  # Responses that carried the whole policy, for diagnostics
+        self.delta_fetches = 0
+        self.not_modified = 0
+
+    def load_cache(self):
+        """Loads the cached policy for this URL. Returns True if there was one."""
+        try:
+            with open(self.cache_path, "r") as f:
+                cached = json.load(f)
+        except (IOError, ValueError):
+            return False
+        if not isinstance(cached, dict) or cached.get("url") != self.url or not isinstance(cached.get("rules"), list):
+            return False
+        try:
+            validate_policy_rules(cached["rules"])
+        except ValueError:
+            return False
+        self.etag = cached.get("etag")
+        self.rules = cached["rules"]
+        return True
+
+    def _save_cache(self):
+        config.ensure_app_data_dir()
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        fd, temp_path = tempfile.mkstemp(prefix=".policy-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"url": self.url, "etag": self.etag, "rules": self.rules}, f, indent=4)
+            os.replace(temp_path, self.cache_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _request(self, conditional):
+        import urllib.error # Only daemons with a policy URL pay for these at startup
+        import urllib.request
+        headers = {"Accept": "application/json"}
+        if conditional and self.etag and self.rules is not None:
+            headers["If-None-Match"] = self.etag
+            headers["A-IM"] = DELTA_ENCODING
+        request = urllib.request.Request(self.url, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return 304, e.headers, b""
+            raise
+
+    def fetch(self):
+        """
+        Polls the server once. Returns True if the policy changed. Raises OSError if the server
+        cannot be reached, http.client.HTTPException if the connection breaks mid-response (e.g.
+        IncompleteRead) and ValueError if its answer is unusable or contains an invalid rule; the
+        current policy is kept.
+        """
+        status, headers, body = self._request(conditional=True)
+        if status == 304:
+            self.not_modified += 1
+            return False
+        rules = None
+        if status == 226:
+            try:
+                if headers.get("IM", "").strip() != DELTA_ENCODING:
+                    raise ValueError(f"Unsupported delta encoding {headers.get('IM')!r}")
+                rules = apply_delta(self.rules, json.loads(body))
+                self.delta_fetches += 1
+            except (TypeError, ValueError):
+                # A delta we cannot use is no reason to go without the policy; ask for all of it.
+                status, headers, body = self._request(conditional=False)
+        if rules is None:
+            if status != 200:
+                raise ValueError(f"Unexpected policy server response {status}")
+            document = json.loads(body)
+            if not isinstance(document, dict) or not isinstance(document.get("rules"), list):
+                raise ValueError("Policy document does not contain a \"rules\" list")
+            validate_policy_rules(document["rules"])
+            rules = document["rules"]
+            self.full_fetches += 1
+        changed = rules != self.rules
+        self.rules = rules
+        self.etag = headers.get("ETag")
+        self._save_cache()
+        return changed
+
+
+class PolicySync:
+    """
+    Keeps the config file's rules in line with a PolicyClient's policy. sync_once() polls and, if
+    the config's rules differ from the policy (because it changed, or because the file was edited
+    or overwritten since), saves the policy's rules through `config_writer`, keeping block state.
+    start() runs sync_once() on a jittered schedule on a background thread.
+    """
+
+    def __init__(self, client, config_store, config_writer, poll_interval=DEFAULT_POLL_INTERVAL,
+                 jitter=DEFAULT_JITTER, log_status_func=print, log_error_func=print, rng=None):
+        self.client = client
+        self.config_store = config_store
+        self.config_writer = config_writer
+        self.poll_interval = poll_interval
+        self.jitter = jitter
+        self._log_status_func = log_status_func
+        self._log_error_func = log_error_func
+        self._rng = rng or random.Random()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._failures = 0
+
+    def load_cache(self):
+        """Applies the cached policy, if any, without contacting the server. Returns True if there was one."""
+        if not self.client.load_cache():
+            return False
+        self._apply_or_log()
+        return True
+
+    def apply(self):
+        """Saves the policy's rules to the config file if they differ from it. Returns True if it saved."""
+        if self.client.rules is None:
+            return False
+        values = self.config_store.get()
+        rules = merge_policy_rules(values["rules"], self.client.rules)
+        if [_without_block_state(rule) for rule in rules] == [_without_block_state(rule) for rule in values["rules"]]:
+            return False
+        self.config_writer.save(
+            values["app_path"],
+            values["end_hour"],
+            values["end_minute"],
+            values["block_activated_today"],
+            values["date_block_activated"],
+            values["language"],
+            rules,
+            values["terminate_grace_period"],
+            values["fsync_policy"],
+            values["scanner_backend"],
+            values["profiling"]
+        )
+        version = f" {self.client.etag}" if self.client.etag else ""
+        self._log_status_func(f"Applied fleet policy{version}: {len(rules)} rule(s).")
+        return True
+
+    def sync_once(self):
+        """Polls the server and applies the policy. Returns False if the poll failed."""
+        import http.client # Loaded by urllib.request already; imported here for the same reason
+        try:
+            self.client.fetch()
+            succeeded = True
+            self._failures = 0
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            self._failures += 1
+            self._log_error_func(f"Could not fetch policy from {self.client.url}: {e}. Keeping the current rules.")
+            succeeded = False
+        self._apply_or_log() # Also after a failure: puts the cached policy back if the file was overwritten
+        return succeeded
+
+    def _apply_or_log(self):
+        """apply(), logging instead of raising if the policy cannot be applied; the sync thread carries on."""
+        try:
+            self.apply()
+        except (OSError, TypeError, ValueError) as e:
+            self._log_error_func(f"Could not apply policy from {self.client.url}: {e}. Keeping the current rules.")
+
+    def next_delay(self, succeeded):
+        """Seconds until the next poll: the interval with jitter, or an exponential backoff after failures."""
+        if succeeded:
+            return self.poll_interval * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+        backoff = min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (self._failures - 1), self.poll_interval)
+        return backoff / 2 + self._rng.uniform(0, backoff / 2)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="policy-sync", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        delay = self._rng.uniform(0, self.poll_interval) # Spread out clients that start together
+        while not self._stop_event.wait(delay):
+            delay = self.next_delay(self.sync_once())
+
+    def close(self, timeout=5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
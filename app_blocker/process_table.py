@@ -0,0 +1,170 @@
+"""
+Process table backends for ScanCache: how PIDs are listed and how process attributes are read.
+
+ProcfsProcessTable (Linux) walks /proc with os.scandir and reads stat, status and cmdline with
+os.open/os.readv into one reused buffer and the exe link with os.readlink, so scanning builds no
+psutil.Process and no file objects; a psutil.Process is only created for a process that is about
+to be terminated. PsutilProcessTable is the portable fallback. Both raise psutil's exceptions, so
+callers handle errors the same way whichever backend is in use.
+
+listing() returns {pid: generation}, where the generation changes when a PID is reused by a new
+process, or is None where the backend cannot tell without reading the process.
+
+Backends are used from the monitor thread only; the procfs buffer is not shared safely.
+"""
+import errno
+import os
+
+import psutil
+
+SCANNER_BACKENDS = ("auto", "procfs", "psutil")
+_READ_CHUNK = 4096
+
+
+class PsutilProcessTable:
+    """Reads everything through psutil. Works wherever psutil does."""
+
+    name = "psutil"
+
+    def listing(self):
+        """Returns {pid: None}: psutil cannot tell a reused PID apart without reading it."""
+        return dict.fromkeys(psutil.pids())
+
+    def read(self, pid):
+        """Returns (psutil.Process or None, name, create_time). Raises psutil errors."""
+        proc = psutil.Process(pid)
+        return proc, proc.name(), proc.create_time()
+
+    def uid(self, info):
+        """Real uid of `info` (a ProcessInfo), or None where psutil has no uids() (Windows)."""
+        proc = info.process()
+        return proc.uids().real if hasattr(proc, "uids") else None
+
+    def exe(self, info):
+        return info.process().exe()
+
+    def cmdline(self, info):
+        return info.process().cmdline()
+
+    def ppid(self, pid):
+        return psutil.Process(pid).ppid()
+
+
+def _raise_for(pid, error):
+    """Re-raises an OSError from /proc as the psutil error the psutil backend would raise."""
+    if isinstance(error, PermissionError):
+        raise psutil.AccessDenied(pid) from None
+    if error.errno in (errno.ENOENT, errno.ESRCH):
+        raise psutil.NoSuchProcess(pid) from None
+    raise error
+
+
+class ProcfsProcessTable:
+    """Linux: reads /proc directly. See the module docstring."""
+
+    name = "procfs"
+
+    def __init__(self):
+        self._buffer = bytearray(_READ_CHUNK)
+        self._clock_ticks = os.sysconf("SC_CLK_TCK")
+        self._boot_time = psutil.boot_time()
+
+    @staticmethod
+    def available():
+        return os.path.exists("/proc/self/stat")
+
+    def listing(self):
+        """
+        Returns {pid: inode of /proc/<pid>}. The inode comes with the directory entry, so it costs
+        no syscall, and a new process behind a reused PID gets a new one.
+        """
+        with os.scandir("/proc") as entries:
+            return {int(entry.name): entry.inode() for entry in entries if entry.name.isdigit()}
+
+    def _read_file(self, pid, file_name):
+        """Returns the contents of /proc/<pid>/<file_name> as bytes, read into the reused buffer."""
+        try:
+            fd = os.open(f"/proc/{pid}/{file_name}", os.O_RDONLY)
+        except OSError as e:
+            _raise_for(pid, e)
+        try:
+            buffer = self._buffer
+            length = 0
+            while True:
+                view = memoryview(buffer)[length:]
+                try:
+                    count = os.readv(fd, [view])
+                finally:
+                    view.release()
+                if count == 0:
+                    break
+                length += count
+                if length == len(buffer): # Only long command lines get here
+                    buffer.extend(bytes(len(buffer)))
+            with memoryview(buffer)[:length] as view:
+                return bytes(view) # The only copy: straight from the buffer, without slicing a new bytearray first
+        except OSError as e:
+            _raise_for(pid, e)
+        finally:
+            os.close(fd)
+            if len(self._buffer) != _READ_CHUNK:
+                self._buffer = bytearray(_READ_CHUNK) # Don't keep one huge command line's worth around
+
+    def read(self, pid):
+        """
+        Returns (None, name, create_time) from one read of /proc/<pid>/stat. The name is comm (15
+        chars at most). Raises ZombieProcess for a zombie.
+        """
+        data = self._read_file(pid, "stat")
+        name_end = data.rfind(b")") # comm may itself contain ")" or spaces
+        if name_end < 0:
+            raise psutil.NoSuchProcess(pid) # Empty read: the process exited mid-read
+        name = data[data.find(b"(") + 1:name_end].decode(errors="replace")
+        if data[name_end + 2:name_end + 3] == b"Z":
+            # Exited, waiting for its parent to reap it (which a frozen launcher never does); nothing left to block.
+            raise psutil.ZombieProcess(pid, name)
+        start_ticks = int(data[name_end + 2:].split()[19]) # Field 22, counting from 1 at the PID
+        return None, name, start_ticks / self._clock_ticks + self._boot_time
+
+    def ppid(self, pid):
+        """Parent PID from /proc/<pid>/stat (field 4)."""
+        data = self._read_file(pid, "stat")
+        name_end = data.rfind(b")")
+        if name_end < 0:
+            raise psutil.NoSuchProcess(pid)
+        return int(data[name_end + 2:].split()[1])
+
+    def uid(self, info):
+        for line in self._read_file(info.pid, "status").splitlines():
+            if line.startswith(b"Uid:"):
+                return int(line.split()[1]) # Real, effective, saved, filesystem
+        return None
+
+    def exe(self, info):
+        pid = info.pid
+        try:
+            exe = os.readlink(f"/proc/{pid}/exe")
+        except OSError as e:
+            if e.errno in (errno.ENOENT, errno.ESRCH) and os.path.lexists(f"/proc/{pid}"):
+                return "" # Kernel threads and zombies have no executable, as with psutil
+            _raise_for(pid, e)
+        if exe.endswith(" (deleted)") and not os.path.exists(exe):
+            exe = exe[:-len(" (deleted)")] # Binary replaced on disk (e.g. by an upgrade) since it started
+        return exe
+
+    def cmdline(self, info):
+        data = self._read_file(info.pid, "cmdline")
+        return [arg.decode(errors="replace") for arg in data.rstrip(b"\0").split(b"\0")] if data else []
+
+
+def create_process_table(backend="auto", log_status_func=None):
+    """
+    Returns the process table for `backend` (one of SCANNER_BACKENDS). "auto" picks procfs on
+    Linux; procfs falls back to psutil where /proc is not available.
+    """
+    if backend in ("auto", "procfs"):
+        if ProcfsProcessTable.available():
+            return ProcfsProcessTable()
+        if backend == "procfs" and log_status_func:
+            log_status_func("The procfs scanner needs Linux /proc. Falling back to psutil.")
+    return PsutilProcessTable()
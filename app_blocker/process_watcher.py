@@ -0,0 +1,192 @@
+import os
+import select
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+# --- Linux proc connector constants (see linux/connector.h and linux/cn_proc.h) ---
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+PROC_CN_MCAST_LISTEN = 1
+PROC_CN_MCAST_IGNORE = 2
+PROC_EVENT_EXEC = 0x00000002
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLMSG_OVERRUN = 4
+
+NLMSGHDR_FORMAT = "=IHHII"   # len, type, flags, seq, pid
+CN_MSG_FORMAT = "=IIIIHH"    # idx, val, seq, ack, len, flags
+PROC_EVENT_HEADER_FORMAT = "=IIQ" # what, cpu, timestamp_ns
+EXEC_EVENT_FORMAT = "=II"    # process_pid, process_tgid
+
+NLMSGHDR_SIZE = struct.calcsize(NLMSGHDR_FORMAT)
+CN_MSG_SIZE = struct.calcsize(CN_MSG_FORMAT)
+PROC_EVENT_HEADER_SIZE = struct.calcsize(PROC_EVENT_HEADER_FORMAT)
+EXEC_EVENT_SIZE = struct.calcsize(EXEC_EVENT_FORMAT)
+
+# How long the startup self-test waits for the exec event of its probe process, and for it to exit.
+SELF_TEST_TIMEOUT = 1.0
+# The probe is a trivial system binary, never sys.executable: in a frozen build that is the app itself.
+PROBE_PATHS = ("/bin/true", "/usr/bin/true")
+# Longest single wait on the netlink socket, so a stop request is noticed quickly.
+STOP_CHECK_INTERVAL = 0.25
+RECV_BUFFER_SIZE = 64 * 1024
+
+
+def parse_exec_events(data):
+    """
+    Parses a datagram from the proc connector and returns (exec_tgids, overrun).
+    `overrun` is True when the kernel reported lost messages and a full rescan is needed.
+    """
+    exec_tgids = set()
+    overrun = False
+    offset = 0
+    while offset + NLMSGHDR_SIZE <= len(data):
+        msg_len, msg_type, _flags, _seq, _pid = struct.unpack_from(NLMSGHDR_FORMAT, data, offset)
+        if msg_len < NLMSGHDR_SIZE:
+            break # Malformed header, stop parsing this datagram
+        if msg_type in (NLMSG_ERROR, NLMSG_OVERRUN):
+            overrun = True
+        elif msg_type == NLMSG_DONE:
+            event_offset = offset + NLMSGHDR_SIZE + CN_MSG_SIZE
+            if event_offset + PROC_EVENT_HEADER_SIZE + EXEC_EVENT_SIZE <= offset + msg_len:
+                what, _cpu, _ts = struct.unpack_from(PROC_EVENT_HEADER_FORMAT, data, event_offset)
+                if what == PROC_EVENT_EXEC:
+                    _pid, tgid = struct.unpack_from(EXEC_EVENT_FORMAT, data, event_offset + PROC_EVENT_HEADER_SIZE)
+                    exec_tgids.add(tgid)
+        # Netlink messages are 4-byte aligned
+        offset += (msg_len + 3) & ~3
+    return exec_tgids, overrun
+
+
+class PollingProcessWatcher:
+    """
+    Portable fallback: sleeps for the tick interval and asks for a full process scan every time.
+    This is the behaviour monitor_loop always had.
+    """
+    name = "polling"
+    event_driven = False
+
+    def wait_for_exec(self, timeout, stop_event):
+        """Waits up to `timeout` seconds. Always returns None, meaning "scan everything"."""
+        stop_event.wait(timeout=timeout)
+        return None
+
+    def close(self):
+        pass
+
+
+class NetlinkProcessWatcher:
+    """
+    Linux-only watcher that subscribes to exec events from the kernel proc connector.
+    Requires CAP_NET_ADMIN (usually root). Raises OSError from __init__ if unavailable.
+    """
+    name = "netlink"
+    event_driven = True
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("The proc connector is only available on Linux.")
+        self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        try:
+            self._sock.bind((os.getpid(), CN_IDX_PROC))
+            self._send_mcast_op(PROC_CN_MCAST_LISTEN)
+            self._sock.setblocking(False)
+            self._verify_delivery()
+        except OSError:
+            self._sock.close()
+            raise
+
+    def _verify_delivery(self):
+        """
+        Spawns a short-lived probe and checks its exec event arrives with a PID we can see.
+        Inside containers the subscription can succeed while events never arrive, or arrive with
+        PIDs from another namespace; relying on it there would silently miss launches.
+        """
+        probe_path = next((path for path in PROBE_PATHS if os.access(path, os.X_OK)), None)
+        if probe_path is None:
+            raise OSError("No probe binary to test the proc connector with.")
+        probe = subprocess.Popen([probe_path], stdin=subprocess.DEVNULL,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + SELF_TEST_TIMEOUT
+            while time.monotonic() < deadline:
+                readable, _, _ = select.select([self._sock], [], [], deadline - time.monotonic())
+                if not readable:
+                    break
+                exec_tgids = self._drain()
+                if exec_tgids is not None and probe.pid in exec_tgids:
+                    return
+        finally:
+            try:
+                probe.wait(timeout=SELF_TEST_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                probe.kill()
+                probe.wait()
+        raise OSError("No exec events received from the proc connector.")
+
+    def _send_mcast_op(self, op):
+        op_payload = struct.pack("=I", op)
+        cn_msg = struct.pack(CN_MSG_FORMAT, CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(op_payload), 0)
+        total_len = NLMSGHDR_SIZE + len(cn_msg) + len(op_payload)
+        header = struct.pack(NLMSGHDR_FORMAT, total_len, NLMSG_DONE, 0, 0, os.getpid())
+        self._sock.send(header + cn_msg + op_payload)
+
+    def wait_for_exec(self, timeout, stop_event):
+        """
+        Waits up to `timeout` seconds for exec events. Returns the set of TGIDs that exec'd
+        (returning as soon as at least one arrives), or None if events were lost and a full
+        scan is required.
+        """
+        deadline = time.monotonic() + timeout
+        while not stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return set()
+            readable, _, _ = select.select([self._sock], [], [], min(remaining, STOP_CHECK_INTERVAL))
+            if readable:
+                exec_tgids = self._drain()
+                # Fork and exit events wake us too; only return once something exec'd.
+                if exec_tgids is None or exec_tgids:
+                    return exec_tgids
+        return set()
+
+    def _drain(self):
+        """Reads every queued datagram without blocking."""
+        exec_tgids = set()
+        while True:
+            try:
+                data = self._sock.recv(RECV_BUFFER_SIZE)
+            except BlockingIOError:
+                return exec_tgids
+            except OSError:
+                # ENOBUFS: the socket buffer overflowed and events were dropped.
+                return None
+            tgids, overrun = parse_exec_events(data)
+            if overrun:
+                return None
+            exec_tgids |= tgids
+
+    def close(self):
+        try:
+            self._send_mcast_op(PROC_CN_MCAST_IGNORE)
+        except OSError:
+            pass
+        self._sock.close()
+
+
+def create_process_watcher(log_status_func=None):
+    """
+    Returns the best available process watcher: the netlink proc connector on Linux
+    when permitted, otherwise the polling fallback.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return NetlinkProcessWatcher()
+        except OSError as e:
+            if log_status_func:
+                log_status_func(f"Proc connector unavailable ({e}). Falling back to polling scan.")
+    return PollingProcessWatcher()
@@ -0,0 +1,249 @@
+"""
+Built-in profiling for "the blocker is using CPU" reports.
+
+Profiling is off by default and costs one attribute check per monitor tick and per UI event
+while off. Turn it on with `"profiling": true` in the config file (picked up while running) or
+`--profile` on the command line. While it is on:
+
+*   a sampler thread takes the monitor thread's stack every SAMPLE_INTERVAL seconds while a tick
+    is running (idle sleeps are not sampled), counting identical stacks;
+*   tracemalloc traces allocations, and each dump records where memory grew since the last one;
+*   UI event handlers wrapped with Profiler.timed() that take longer than SLOW_HANDLER_THRESHOLD
+    are logged and counted in milliseconds per handler.
+
+Every DUMP_INTERVAL seconds, and when profiling is turned off, the counts are written to the
+profiles directory in the app data directory as collapsed stacks, one "frame;frame;frame count"
+line per stack, ready for flamegraph.pl or speedscope:
+
+    monitor-<time>-<n>.folded   monitor tick samples
+    ui-<time>-<n>.folded        slow UI handlers, in milliseconds
+    memory-<time>-<n>.txt       top allocation growth since the previous dump
+
+The oldest files are deleted once the directory holds more than MAX_PROFILE_BYTES.
+"""
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+from . import config
+
+PROFILE_DIR_NAME = "profiles"
+PROFILE_FILE_PREFIXES = ("monitor-", "ui-", "memory-")
+SAMPLE_INTERVAL = 0.005        # Seconds between stack samples of a running tick
+SLOW_HANDLER_THRESHOLD = 0.05  # UI handlers slower than this many seconds are recorded
+DUMP_INTERVAL = 60.0           # Seconds between dumps while profiling
+MAX_PROFILE_BYTES = 20 * 1024 * 1024 # Disk budget for the profiles directory
+TRACEMALLOC_FRAMES = 8         # Stack depth tracemalloc keeps per allocation
+TOP_ALLOCATIONS = 25           # Lines of allocation growth written per dump
+
+
+def profile_dir():
+    return os.path.join(config.APP_DATA_DIR, PROFILE_DIR_NAME)
+
+
+def collapse_stack(frame):
+    """`frame` and its callers as one collapsed-stack line, outermost first: "file:function;file:function"."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}".replace(";", ":").replace(" ", "_"))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """
+    Samples monitor ticks, traces allocations and times UI handlers while enabled; see the
+    module docstring. tick_started()/tick_finished() are called by the monitor thread, timed()
+    handlers on the UI thread, and set_enabled() from any thread.
+    """
+
+    def __init__(self, enabled=False, directory=None, sample_interval=SAMPLE_INTERVAL,
+                 handler_threshold=SLOW_HANDLER_THRESHOLD, dump_interval=DUMP_INTERVAL,
+                 max_bytes=MAX_PROFILE_BYTES, log_status_func=print):
+        self.directory = directory or profile_dir()
+        self.sample_interval = sample_interval
+        self.handler_threshold = handler_threshold
+        self.dump_interval = dump_interval
+        self.max_bytes = max_bytes
+        self._log_status_func = log_status_func
+        self._lock = threading.Lock()       # Guards the counters below, and turning on and off
+        self._enabled = False
+        self._tick_stacks = collections.Counter()    # Collapsed monitor stack -> samples
+        self._handler_times = collections.Counter()  # "ui;handler" -> milliseconds spent in slow calls
+        self._ticking = threading.Event()   # Set while the monitor thread is inside a tick
+        self._tick_thread = None            # Thread ident of the monitor thread
+        self._sampler = None
+        self._stop_sampler = None
+        self._owns_tracemalloc = False
+        self._snapshot = None               # tracemalloc snapshot of the previous dump
+        self._configured = None             # Last "profiling" value seen in the config file
+        self.dumps = 0
+        if enabled:
+            self.set_enabled(True)
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    def set_enabled(self, enabled):
+        """Turns profiling on or off. Turning it off writes out what was collected."""
+        with self._lock:
+            if enabled == self._enabled:
+                return
+            self._enabled = enabled
+            if enabled:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(TRACEMALLOC_FRAMES)
+                    self._owns_tracemalloc = True
+                self._stop_sampler = threading.Event()
+                self._sampler = threading.Thread(target=self._run_sampler, args=(self._stop_sampler,),
+                                                 name="profiler-sampler", daemon=True)
+                self._sampler.start()
+            else:
+                self._stop_sampler.set()
+                self._ticking.set() # Wake the sampler so it sees the stop
+                sampler = self._sampler
+                self._sampler = None
+        if enabled:
+            self._log_status_func(f"Profiling on. Writing profiles to {self.directory}.")
+            return
+        sampler.join()
+        self._ticking.clear()
+        self.dump()
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+        self._snapshot = None
+        self._log_status_func("Profiling off.")
+
+    def follow(self, config_store):
+        """Turns profiling on or off whenever the "profiling" setting in `config_store`'s file changes."""
+        self._configured = config_store.get().get("profiling")
+        config_store.subscribe(self._on_config_changed)
+
+    def _on_config_changed(self, config_values):
+        # Only an edit of the setting itself counts, so --profile stays on while other settings change.
+        profiling = config_values.get("profiling")
+        if profiling != self._configured:
+            self._configured = profiling
+            self.set_enabled(bool(profiling))
+
+    def close(self):
+        """Turns profiling off, writing out anything collected."""
+        self.set_enabled(False)
+
+    # --- Monitor thread ---
+    def tick_started(self):
+        if not self._enabled:
+            return
+        self._tick_thread = threading.get_ident()
+        self._ticking.set()
+
+    def tick_finished(self):
+        if not self._enabled:
+            return
+        self._ticking.clear()
+
+    def _run_sampler(self, stop_event):
+        next_dump = time.monotonic() + self.dump_interval
+        while not stop_event.is_set():
+            if self._ticking.wait(min(self.dump_interval, 1.0)) and not stop_event.is_set():
+                frame = sys._current_frames().get(self._tick_thread)
+                if frame is not None:
+                    stack = collapse_stack(frame)
+                    with self._lock:
+                        self._tick_stacks[stack] += 1
+                del frame
+                stop_event.wait(self.sample_interval)
+            if time.monotonic() >= next_dump:
+                self.dump() # On this thread, so the monitor never waits on the disk for it
+                next_dump = time.monotonic() + self.dump_interval
+
+    # --- UI thread ---
+    def timed(self, handler):
+        """Wraps an event handler so calls slower than handler_threshold are recorded while profiling."""
+        name = getattr(handler, "__qualname__", None) or repr(handler)
+
+        @functools.wraps(handler)
+        def timed_handler(*args, **kwargs):
+            if not self._enabled:
+                return handler(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                self.record_handler(name, time.perf_counter() - started)
+        return timed_handler
+
+    def record_handler(self, name, seconds):
+        """Records one call of UI handler `name` that took `seconds`, if that is over the threshold."""
+        if seconds < self.handler_threshold:
+            return
+        with self._lock:
+            self._handler_times[f"ui;{name}"] += round(seconds * 1000)
+        self._log_status_func(f"Slow UI handler {name}: {seconds * 1000:.0f} ms.")
+
+    # --- Output ---
+    def dump(self):
+        """Writes what was collected since the last dump to the profiles directory. Returns the paths written."""
+        with self._lock:
+            tick_stacks, self._tick_stacks = self._tick_stacks, collections.Counter()
+            handler_times, self._handler_times = self._handler_times, collections.Counter()
+        memory_lines = self._memory_growth()
+        if not tick_stacks and not handler_times and not memory_lines:
+            return []
+        self.dumps += 1
+        suffix = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.dumps:04d}"
+        written = []
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for prefix, extension, lines in (
+                ("monitor-", ".folded", (f"{stack} {count}" for stack, count in tick_stacks.most_common())),
+                ("ui-", ".folded", (f"{stack} {ms}" for stack, ms in handler_times.most_common())),
+                ("memory-", ".txt", memory_lines)
+            ):
+                lines = list(lines)
+                if not lines:
+                    continue
+                path = os.path.join(self.directory, f"{prefix}{suffix}{extension}")
+                with open(path, "w") as f:
+                    f.write("\n".join(lines) + "\n")
+                written.append(path)
+            self._prune()
+        except OSError as e:
+            self._log_status_func(f"Error writing profile to {self.directory}: {e}")
+        return written
+
+    def _memory_growth(self):
+        """Lines describing where traced memory grew since the previous call, or [] on the first one."""
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return []
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"# Traced memory: {current} bytes, peak {peak} bytes"]
+        lines.extend(str(stat) for stat in snapshot.compare_to(previous, "lineno")[:TOP_ALLOCATIONS] if stat.size_diff)
+        return lines
+
+    def _prune(self):
+        """Deletes the oldest profile files until the directory fits in max_bytes; the newest always stays."""
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.startswith(PROFILE_FILE_PREFIXES) and entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+        files.sort()
+        total = sum(size for _mtime, _name, size in files)
+        for _mtime, name, size in files[:-1]:
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
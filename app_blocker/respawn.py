@@ -0,0 +1,194 @@
+"""
+Respawn-storm detection and suppression.
+
+Launchers and updaters often start a target again as soon as it is killed, so without help the
+monitor and the launcher trade kills and spawns for as long as the block lasts. RespawnGuard
+records the ancestors of every process the monitor terminates. When the same ancestor has had
+targets killed under it in RESPAWN_THRESHOLD separate ticks within RESPAWN_WINDOW seconds, it is
+taken to be a respawning launcher and its whole subtree is frozen (SIGSTOP) until the block that
+caught it ends, or terminated with action="terminate". Frozen launchers use no CPU and spawn
+nothing, so the monitor goes back to sleeping on exec events.
+
+Ancestors that must never be touched (init, session and desktop shells, interactive shells,
+terminals and IDEs, and the blocker's own ancestors) are protected: if one of them is the repeat spawner, only the log is quietened.
+LogBackoff does that quietening for every target: repeated kill messages are logged 1, 2, 4,
+8... times with a count of what was held back.
+"""
+import collections
+import os
+
+import psutil
+
+RESPAWN_ACTIONS = ("freeze", "terminate", "off")
+DEFAULT_RESPAWN_ACTION = "freeze"
+RESPAWN_WINDOW = 30.0   # Seconds in which repeated kills under one ancestor count as a storm
+RESPAWN_THRESHOLD = 3   # Ticks with a kill under the same ancestor, within the window
+MAX_ANCESTRY_DEPTH = 32 # Stop walking up after this many parents
+# Lower-case process names never frozen or terminated, even if targets keep appearing under them.
+PROTECTED_NAMES = frozenset((
+    "init", "systemd", "kthreadd", "launchd", "login", "sshd", "cron", "crond", "dbus-daemon",
+    "gdm", "gdm-session-wor", "sddm", "lightdm", "xorg", "xwayland", "gnome-shell", "gnome-session-b",
+    "plasmashell", "kwin_x11", "kwin_wayland", "xfce4-session", "xfdesktop", "finder", "dock", "loginwindow",
+    "explorer.exe", "winlogon.exe", "wininit.exe", "services.exe", "svchost.exe", "csrss.exe", "smss.exe",
+    "userinit.exe", "sihost.exe",
+    # Interactive shells, terminals and IDEs: a user relaunching a blocked app from one is not a respawn loop.
+    # Linux reports at most 15 characters of a name, so long ones are listed truncated as well.
+    "sh", "bash", "dash", "zsh", "fish", "ksh", "mksh", "tcsh", "csh", "nu", "xonsh", "tmux: server", "tmux",
+    "screen", "sudo", "su", "doas", "gnome-terminal-server", "gnome-terminal-", "konsole", "xterm", "urxvt",
+    "alacritty", "kitty", "wezterm-gui", "foot", "terminator", "tilix", "xfce4-terminal", "lxterminal",
+    "mate-terminal", "qterminal", "terminal", "iterm2", "code", "code-oss", "codium", "cursor",
+    "cmd.exe", "powershell.exe", "pwsh.exe", "pwsh", "windowsterminal.exe", "windowsterminal", "openconsole.exe",
+    "conhost.exe", "wsl.exe", "bash.exe", "code.exe", "cursor.exe", "devenv.exe"
+))
+
+
+class LogBackoff:
+    """
+    Exponential backoff for repeated messages: of a run of occurrences of one key, the 1st, 2nd,
+    4th, 8th... are let through. A run ends after `quiet_period` seconds without an occurrence.
+    """
+
+    def __init__(self, quiet_period=RESPAWN_WINDOW):
+        self.quiet_period = quiet_period
+        self._runs = {} # key -> (occurrences in the current run, time of the last one)
+
+    def allow(self, key, now):
+        """Counts an occurrence of `key` at `now`. Returns how many were held back since the last one let through, or None to hold this one back."""
+        count, last = self._runs.get(key, (0, None))
+        if last is not None and now - last > self.quiet_period:
+            count = 0
+        count += 1
+        self._runs[key] = (count, now)
+        if count & (count - 1): # Not a power of two
+            return None
+        return count - count // 2 - 1
+
+
+class RespawnGuard:
+    """
+    Tracks the ancestry of terminated targets and suppresses launchers that keep respawning them.
+    Used from the monitor thread only; see the module docstring.
+    """
+
+    def __init__(self, action=DEFAULT_RESPAWN_ACTION, window=RESPAWN_WINDOW, threshold=RESPAWN_THRESHOLD):
+        self.action = action
+        self.window = window
+        self.threshold = threshold
+        self.log_backoff = LogBackoff(window)
+        self.suppressions = 0 # Launchers frozen or terminated so far
+        self._kills = {} # (pid, create_time) of an ancestor -> deque of times a tick killed something under it
+        self._frozen = {} # (pid, create_time) of a frozen launcher -> (name, rule key, [psutil.Process], launcher last)
+        self._own_lineage = None # PIDs of this process and its ancestors
+
+    @property
+    def frozen(self):
+        return bool(self._frozen)
+
+    def ancestry(self, process_table, pid):
+        """[(pid, create_time, name)] of the ancestors of `pid`, nearest first, up to but excluding PID 1."""
+        chain = []
+        try:
+            pid = process_table.ppid(pid)
+            while pid > 1 and len(chain) < MAX_ANCESTRY_DEPTH:
+                _proc, name, create_time = process_table.read(pid)
+                chain.append((pid, create_time, name))
+                pid = process_table.ppid(pid)
+        except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+            pass # Keep what we have; an ancestor that is gone cannot respawn anything
+        return chain
+
+    def _is_protected(self, pid, name, process_table):
+        if self._own_lineage is None:
+            self._own_lineage = {os.getpid()} | {ancestor[0] for ancestor in self.ancestry(process_table, os.getpid())}
+        return pid in self._own_lineage or name.lower() in PROTECTED_NAMES
+
+    def record(self, matches, process_table, now):
+        """
+        Records one tick's kills of `matches` ([(proc, rule)], still running) at monotonic time
+        `now`. Returns [(pid, create_time, name, rule)] for the launchers that just became a
+        respawn storm. Must be called before the matches are terminated, while their parents can still be read.
+        """
+        if self.action == "off":
+            return []
+        matched_pids = {proc.pid for proc, _rule in matches}
+        chains = []
+        counted = set() # Each ancestor counts once per tick, however many targets it has running
+        for proc, rule in matches:
+            chain = [ancestor for ancestor in self.ancestry(process_table, proc.pid) if ancestor[0] not in matched_pids]
+            chains.append((chain, rule))
+            for pid, create_time, _name in chain:
+                if (pid, create_time) not in counted:
+                    counted.add((pid, create_time))
+                    self._kills.setdefault((pid, create_time), collections.deque()).append(now)
+        for key in list(self._kills):
+            kills = self._kills[key]
+            while kills and kills[0] < now - self.window:
+                kills.popleft()
+            if not kills:
+                del self._kills[key]
+
+        storms = {}
+        for chain, rule in chains:
+            # The nearest ancestor that keeps spawning is the launcher; the ones above it only started it once.
+            for pid, create_time, name in chain:
+                if (pid, create_time) in self._frozen:
+                    break # Spawned just before the freeze
+                if len(self._kills.get((pid, create_time), ())) >= self.threshold:
+                    if not self._is_protected(pid, name, process_table):
+                        storms[(pid, create_time)] = (pid, create_time, name, rule)
+                    break
+        for key in storms:
+            del self._kills[key]
+        return list(storms.values())
+
+    def suppress(self, storm, matched_pids, process_table, terminate_func, grace_period, log_status_func):
+        """
+        Freezes or terminates the subtree of one launcher returned by record(), except the
+        `matched_pids` being terminated anyway. Returns True if it froze or stopped anything.
+        """
+        pid, create_time, name, rule = storm
+        try:
+            if process_table.read(pid)[2] != create_time:
+                return False # PID reused since record()
+            launcher = psutil.Process(pid)
+            if self.action == "freeze":
+                launcher.suspend() # First, so it cannot start anything while its children are listed
+            tree = [child for child in launcher.children(recursive=True) if child.pid not in matched_pids]
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            return False
+        except psutil.AccessDenied:
+            log_status_func(f"{rule.app_name} keeps being restarted by {name} (PID: {pid}), which we are not allowed to stop.")
+            return False
+        if self.action == "terminate":
+            result = terminate_func([launcher] + tree, grace_period=grace_period)
+            stopped = len(result.terminated) + len(result.killed)
+            log_status_func(f"{rule.app_name} keeps being restarted by {name} (PID: {pid}). "
+                            f"Terminated it and the processes it started ({stopped} of {len(tree) + 1}).")
+            self.suppressions += bool(stopped)
+            return stopped > 0
+        frozen = []
+        for child in tree:
+            try:
+                child.suspend()
+                frozen.append(child)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+                pass
+        frozen.append(launcher) # Resumed last, so its children are running again before it notices anything
+        self._frozen[(pid, create_time)] = (name, rule.key, frozen)
+        log_status_func(f"{rule.app_name} keeps being restarted by {name} (PID: {pid}). "
+                        f"Froze it and {len(frozen) - 1} process(es) it started until the block ends.")
+        self.suppressions += 1
+        return True
+
+    def release(self, blocked_keys, log_status_func):
+        """Resumes the launchers frozen for rules no longer in `blocked_keys` (pass () to resume all)."""
+        for key, (name, rule_key, frozen) in list(self._frozen.items()):
+            if rule_key in blocked_keys:
+                continue
+            del self._frozen[key]
+            for proc in frozen:
+                try:
+                    proc.resume()
+                except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+                    pass
+            log_status_func(f"Resumed {name} (PID: {key[0]}).")
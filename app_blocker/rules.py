@@ -0,0 +1,174 @@
+import datetime
+import os
+
+from .enforcement import DEFAULT_PLAN, EnforcementPlan
+from .matchers import MatchPipeline, RuleMatcher, normalize_exe_path
+from .scheduler import WeeklySchedule
+
+# Optional matcher fields a rule may have besides (or instead of) app_path; see matchers.py.
+MATCHER_FIELDS = ("process_name", "uids", "cmdline_pattern", "exe_sha256")
+
+
+def rule_key(app_path, process_name=None, uids=None, cmdline_pattern=None, exe_sha256=None):
+    """
+    Identifies a rule. A plain path rule is keyed by its normalized path, as before matcher
+    fields existed, so block state and usage history carry over.
+    """
+    if not (app_path or process_name or cmdline_pattern or exe_sha256):
+        return "" # uids alone would match every process of those users
+    parts = [normalize_exe_path(app_path)] if app_path else []
+    if process_name:
+        parts.append("name=" + process_name)
+    if uids:
+        parts.append("uids=" + ",".join(str(uid) for uid in sorted(uids)))
+    if cmdline_pattern:
+        parts.append("cmdline=" + cmdline_pattern)
+    if exe_sha256:
+        parts.append("sha256=" + exe_sha256.lower())
+    return "|".join(parts)
+
+
+def _midnight_after(date):
+    """When a block activated on `date` ends by default, as in configs saved before schedules existed."""
+    return datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time()) if date else None
+
+
+class BlockRule:
+    """
+    One blocked application with its own schedule and block state. The schedule is the weekly
+    `schedule` (see scheduler.WeeklySchedule) if given, else the daily end_hour:end_minute cutoff.
+    An active block lasts until `blocked_until`, fixed when it was activated, so editing the
+    schedule cannot lift it early. `block_activated_today` keeps its old name for the config's sake
+    but means "a block is active". What is done to the target and when is the `enforcement` plan
+    (see enforcement.py); by default it is terminated as soon as the block starts.
+    """
+
+    def __init__(self, app_path, end_hour, end_minute, block_activated_today=False, date_block_activated=None,
+                 process_name=None, uids=None, cmdline_pattern=None, exe_sha256=None,
+                 schedule=None, blocked_until=None, enforcement=None, match_renamed=False):
+        self.app_path = app_path
+        self.end_hour = int(end_hour)
+        self.end_minute = int(end_minute)
+        self.block_activated_today = block_activated_today
+        self.date_block_activated = date_block_activated
+        if block_activated_today and blocked_until is None:
+            blocked_until = _midnight_after(date_block_activated or datetime.date.today())
+        self.blocked_until = blocked_until if block_activated_today else None
+        self.schedule = (WeeklySchedule.from_config(schedule) if schedule
+                         else WeeklySchedule.daily_cutoff(self.end_hour, self.end_minute))
+        self.enforcement = EnforcementPlan.from_config(enforcement) if enforcement else DEFAULT_PLAN
+        self.process_name = process_name
+        self.uids = list(uids) if uids else None
+        self.cmdline_pattern = cmdline_pattern
+        self.exe_sha256 = exe_sha256
+        self.match_renamed = bool(match_renamed) # Also match app_path running under another name (matchers.py)
+        self.app_name = (os.path.basename(app_path).lower() if app_path
+                         else process_name or cmdline_pattern or (exe_sha256 and "sha256:" + exe_sha256[:12]) or "")
+        self.key = rule_key(app_path, process_name, uids, cmdline_pattern, exe_sha256)
+
+    def to_config(self):
+        """Returns the rule as a dict in the shape stored under "rules" in the config."""
+        rule_values = {
+            "app_path": self.app_path,
+            "end_hour": self.end_hour,
+            "end_minute": self.end_minute,
+            "block_activated_today": self.block_activated_today,
+            "date_block_activated": self.date_block_activated
+        }
+        for field in MATCHER_FIELDS:
+            if getattr(self, field):
+                rule_values[field] = getattr(self, field)
+        if self.schedule.config_values is not None:
+            rule_values["schedule"] = self.schedule.config_values
+        if self.enforcement.config_values is not None:
+            rule_values["enforcement"] = self.enforcement.config_values
+        if self.match_renamed:
+            rule_values["match_renamed"] = True
+        if self.blocked_until is not None and self.blocked_until != _midnight_after(self.date_block_activated):
+            rule_values["blocked_until"] = self.blocked_until
+        return rule_values
+
+    def activate_block(self, blocked_until, current_date):
+        self.block_activated_today = True
+        self.date_block_activated = current_date
+        self.blocked_until = blocked_until
+
+    def lift_block(self):
+        self.block_activated_today = False
+        self.date_block_activated = None
+        self.blocked_until = None
+
+    @classmethod
+    def from_config(cls, rule_values):
+        return cls(
+            rule_values.get("app_path", ""),
+            rule_values["end_hour"],
+            rule_values["end_minute"],
+            rule_values.get("block_activated_today", False),
+            rule_values.get("date_block_activated"),
+            *(rule_values.get(field) for field in MATCHER_FIELDS),
+            schedule=rule_values.get("schedule"),
+            blocked_until=rule_values.get("blocked_until"),
+            enforcement=rule_values.get("enforcement"),
+            match_renamed=rule_values.get("match_renamed", False)
+        )
+
+
+class RuleSet:
+    """
+    A collection of BlockRules compiled into one RuleMatcher per rule, so a single pass over
+    the process table can check every rule with one name lookup per process.
+    """
+
+    def __init__(self, rules):
+        self._compile(rules)
+
+    def _compile(self, rules):
+        self.rules = [rule for rule in rules if rule.key]
+        self._matchers = [RuleMatcher(rule) for rule in self.rules]
+        self.pipeline = MatchPipeline(self._matchers)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def blocked_index(self):
+        """Returns {rule key: rule} for every rule whose block is currently active."""
+        return {rule.key: rule for rule in self.rules if rule.block_activated_today}
+
+    def blocked_pipeline(self):
+        """Returns a MatchPipeline of the rules whose block is currently active."""
+        return MatchPipeline(matcher for matcher in self._matchers if matcher.rule.block_activated_today)
+
+    def pipeline_for(self, keys):
+        """Returns a MatchPipeline of the rules whose key is in `keys`, e.g. those with an enforcement step due."""
+        return MatchPipeline(matcher for matcher in self._matchers if matcher.rule.key in keys)
+
+    def to_config(self):
+        return [rule.to_config() for rule in self.rules]
+
+    def merge_config(self, rule_values_list):
+        """
+        Replaces the rules in place with those from a reloaded config "rules" list.
+        A block that is already active stays active until its blocked_until even if the file says otherwise, so
+        neither a stale write nor a hand edit can lift it early. Returns True if anything changed.
+        """
+        current_by_key = {rule.key: rule for rule in self.rules}
+        new_rules = []
+        for rule_values in rule_values_list:
+            rule = BlockRule.from_config(rule_values)
+            if not rule.key:
+                continue
+            current = current_by_key.get(rule.key)
+            if current and current.block_activated_today and (
+                    not rule.block_activated_today or rule.blocked_until < current.blocked_until):
+                rule.activate_block(current.blocked_until, current.date_block_activated)
+            new_rules.append(rule)
+        if [rule.to_config() for rule in new_rules] == self.to_config():
+            return False
+        self._compile(new_rules)
+        return True
+
+
+def rule_set_from_config(config_values):
+    """Builds a RuleSet from the dict returned by config.load_config_from_file()."""
+    return RuleSet(BlockRule.from_config(rule_values) for rule_values in config_values.get("rules", []))
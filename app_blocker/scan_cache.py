@@ -0,0 +1,188 @@
+import psutil
+
+from .clock import SYSTEM_CLOCK
+from .fingerprint import FingerprintCache
+from .matchers import ProcessInfo
+from .process_table import create_process_table
+
+# Even with the cache, re-resolve everything this often. This catches a process that exec()s
+# into a target without changing PID, which a PID delta cannot see when polling.
+FULL_REVALIDATE_INTERVAL = 60.0
+
+class ScanCache:
+    """
+    Remembers a ProcessInfo for every process, keyed by PID, so each tick only has to inspect
+    PIDs it has not seen before. A full refresh compares the generation the process table lists
+    for each PID (see process_table.py) with the one it had and re-reads only PIDs whose generation
+    changed, so a PID that was reused between two listings is inspected afresh rather than taken
+    for the process it used to be, without a read per cached PID. Backends that list no generation
+    leave reuse to the periodic full revalidation. Inspecting reads just the name; the expensive
+    attributes are read by the MatchPipeline for processes whose name a rule accepts, and are
+    cached on the ProcessInfo, so one that could not be read (AccessDenied) is not retried
+    until its PID goes away. Processes whose name cannot be read are parked in a negative cache.
+    Processes that could only be matched once their executable is hashed are looked at again on
+    every find_matches() until the hash is ready.
+    """
+
+    def __init__(self, revalidate_interval=FULL_REVALIDATE_INTERVAL, fingerprints=None, process_table=None, clock=SYSTEM_CLOCK):
+        self._entries = {} # pid -> ProcessInfo
+        self._denied = {}  # pid -> None
+        self._generations = {} # pid -> generation it was listed with, for cached and denied PIDs
+        self._matched = set() # PIDs that matched last time; rechecked until they are gone
+        self._unchecked = set() # PIDs inspected by refresh() that find_matches() has not looked up yet
+        self._waiting = set() # PIDs whose match depends on an executable hash still being computed
+        self.fingerprints = fingerprints or FingerprintCache()
+        self.process_table = process_table or create_process_table() # See process_table.py
+        self._revalidate_interval = revalidate_interval
+        self._clock = clock # Only its monotonic() is read, to time the full revalidation
+        self._last_full_resolve = clock.monotonic()
+        # Running totals read by the monitor's metrics; plain ints so counting costs next to nothing.
+        self.pids_scanned = 0     # PIDs listed on full scans plus PIDs received from the watcher
+        self.exe_resolutions = 0
+        self.access_denied = 0
+        self.no_such_process = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self._denied.clear()
+        self._generations.clear()
+        self._matched.clear()
+        self._unchecked.clear()
+        self._waiting.clear()
+        self._last_full_resolve = self._clock.monotonic()
+
+    def _inspect(self, pid):
+        """Reads the name of one PID and caches it. Returns True if it was added to the positive cache."""
+        try:
+            proc, name, create_time = self.process_table.read(pid)
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            self.no_such_process += 1
+            return False
+        except psutil.AccessDenied:
+            self.access_denied += 1
+            self._denied[pid] = None
+            return False
+        self._entries[pid] = ProcessInfo(pid, create_time, name, self, proc)
+        return True
+
+    def _same_process(self, pid, info):
+        """True if `pid` is still the process `info` was read from."""
+        try:
+            return self.process_table.read(pid)[2] == info.create_time
+        except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+            return False
+
+    def refresh(self, candidate_pids=None):
+        """
+        Brings the cache up to date and returns the PIDs that were newly inspected. They are also
+        remembered for the next find_matches(), so refreshing from elsewhere cannot hide a match.
+        `candidate_pids` of None lists the whole PID table, evicts exited and reused PIDs and
+        inspects new ones. A set (from an event-driven watcher) re-inspects just those PIDs, since they exec'd.
+        Once the revalidation interval is up the cache is cleared and the whole table listed either
+        way, so running processes the watcher has nothing new about are not forgotten.
+        """
+        if self._clock.monotonic() - self._last_full_resolve >= self._revalidate_interval:
+            self.clear()
+            candidate_pids = None
+
+        if candidate_pids is None:
+            listing = self.process_table.listing()
+            self.pids_scanned += len(listing)
+            generations = self._generations
+            for pid in self._entries.keys() - listing.keys():
+                del self._entries[pid]
+            for pid in self._denied.keys() - listing.keys():
+                del self._denied[pid]
+            for pid in generations.keys() - listing.keys():
+                del generations[pid]
+            # A PID can exit and be reused between two listings; its generation gives that away.
+            # A changed one is confirmed by the create time, as procfs can hand out a new inode for the same process.
+            for pid in [pid for pid in self._entries if generations.get(pid) != listing[pid]]:
+                if self._same_process(pid, self._entries[pid]):
+                    generations[pid] = listing[pid]
+                else:
+                    del self._entries[pid]
+            for pid in [pid for pid in self._denied if generations.get(pid) != listing[pid]]:
+                del self._denied[pid]
+            new_pids = listing.keys() - self._entries.keys() - self._denied.keys()
+            for pid in new_pids:
+                generations[pid] = listing[pid]
+        else:
+            # An exec replaces the image, so whatever we knew about these PIDs is stale.
+            for pid in candidate_pids:
+                self._entries.pop(pid, None)
+                self._denied.pop(pid, None)
+            new_pids = candidate_pids
+            self.pids_scanned += len(candidate_pids)
+        inspected = [pid for pid in new_pids if self._inspect(pid)]
+        self._unchecked.update(inspected)
+        return inspected
+
+    def find_matches(self, pipeline, candidate_pids=None, recheck_all=False):
+        """
+        Returns a list of (psutil.Process, rule) for running processes that `pipeline` (a
+        MatchPipeline, e.g. RuleSet.blocked_pipeline()) matches. Only newly inspected PIDs (and
+        earlier matches that are still around) are looked up, unless `recheck_all` is set (e.g.
+        because the set of active rules changed), in which case every cached entry is looked up,
+        reading only attributes that no earlier lookup needed.
+        """
+        self.refresh(candidate_pids)
+        if recheck_all:
+            pids_to_check = list(self._entries)
+        else:
+            pids_to_check = (self._unchecked | self._matched | self._waiting) & self._entries.keys()
+        self._unchecked = set()
+
+        matches = []
+        self._matched = set()
+        self._waiting = set()
+        for pid in pids_to_check:
+            info = self._entries[pid]
+            rule = pipeline.match(info)
+            if not rule:
+                if info.waiting_for_digest:
+                    self._waiting.add(pid)
+                continue
+            try:
+                # Re-read through the same table so create times are comparable.
+                if self.process_table.read(pid)[2] != info.create_time:
+                    # PID was reused by another process; look at the new one next tick.
+                    del self._entries[pid]
+                    continue
+                proc = info.process()
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                self.no_such_process += 1
+                del self._entries[pid]
+                continue
+            except psutil.AccessDenied:
+                self.access_denied += 1
+                del self._entries[pid]
+                continue
+            matches.append((proc, rule))
+            self._matched.add(pid)
+        return matches
+
+    @property
+    def waiting_for_digests(self):
+        """True if a process may turn out to match once the FingerprintCache has hashed its executable."""
+        return bool(self._waiting)
+
+    def close(self):
+        self.fingerprints.close()
+
+    def running_targets(self, pipeline):
+        """
+        Returns [(pid, create_time, rule key)] for every running process that `pipeline` (e.g.
+        RuleSet.pipeline) matches, blocked or not. Lists the PID table, so it is meant for
+        periodic sampling rather than every tick.
+        """
+        self.refresh()
+        targets = []
+        for pid, info in self._entries.items():
+            rule = pipeline.match(info)
+            if rule:
+                targets.append((pid, info.create_time, rule.key))
+        return targets
@@ -0,0 +1,164 @@
+import bisect
+import datetime
+import time
+
+# Longest single sleep while idle. A wall-clock jump (manual change, NTP step, resume from
+# suspend) during a sleep is noticed at the latest after this long.
+MAX_IDLE_SLEEP = 300.0
+# How far wall-clock time may drift from monotonic time across one sleep before it counts as a jump.
+CLOCK_JUMP_TOLERANCE = 5.0
+
+
+DAY_SECONDS = 86400
+WEEK_SECONDS = 7 * DAY_SECONDS
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def _parse_clock(text):
+    """Seconds since midnight for "HH:MM". "24:00" is allowed as the end of a day."""
+    hour, minute = (int(part) for part in text.split(":"))
+    if not (0 <= hour <= 24 and 0 <= minute < 60) or (hour == 24 and minute):
+        raise ValueError(f"invalid time {text!r}")
+    return hour * 3600 + minute * 60
+
+
+class WeeklySchedule:
+    """
+    When a rule blocks its target, as blocked windows per weekday in local wall-clock time.
+    The windows are compiled into sorted, non-overlapping [start, end) offsets in seconds from
+    Monday 00:00, so "is this blocked now" and "when is the next transition" are each one bisect.
+
+    In the config a schedule maps weekdays to "HH:MM-HH:MM" windows; time not covered by a window
+    is allowed. A window whose end is not after its start runs past midnight into the next day:
+
+        {"mon": ["09:00-12:00", "13:00-17:00"], "sat": ["20:00-02:00"]}
+    """
+
+    def __init__(self, windows, config_values=None):
+        self.config_values = config_values # As given, for to_config(); None for a daily cutoff
+        self._starts = []
+        self._ends = []
+        for start, end in sorted(windows):
+            if self._ends and start <= self._ends[-1]:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    @classmethod
+    def daily_cutoff(cls, end_hour, end_minute):
+        """The original schedule: allowed from midnight until end_hour:end_minute, blocked for the rest of every day."""
+        cutoff = end_hour * 3600 + end_minute * 60
+        return cls((day * DAY_SECONDS + cutoff, (day + 1) * DAY_SECONDS) for day in range(7))
+
+    @classmethod
+    def from_config(cls, schedule_values):
+        """Compiles the config form (see the class docstring). Raises ValueError if it is malformed."""
+        if not isinstance(schedule_values, dict):
+            raise ValueError("schedule must map weekdays to lists of windows")
+        windows = []
+        for weekday, day_windows in schedule_values.items():
+            if weekday not in WEEKDAYS:
+                raise ValueError(f"unknown weekday {weekday!r}; use one of {', '.join(WEEKDAYS)}")
+            day_start = WEEKDAYS.index(weekday) * DAY_SECONDS
+            for window in day_windows:
+                start_text, end_text = str(window).split("-")
+                start, end = _parse_clock(start_text), _parse_clock(end_text)
+                if end <= start:
+                    end += DAY_SECONDS # Runs past midnight
+                start, end = day_start + start, day_start + end
+                if end > WEEK_SECONDS: # Sunday night into Monday morning
+                    windows.append((0, end - WEEK_SECONDS))
+                    end = WEEK_SECONDS
+                windows.append((start, end))
+        return cls(windows, schedule_values)
+
+    def __bool__(self):
+        return bool(self._starts)
+
+    def windows(self):
+        """The compiled [(start, end)] offsets from Monday 00:00, in order."""
+        return list(zip(self._starts, self._ends))
+
+    @staticmethod
+    def _week_position(when):
+        """Returns (Monday 00:00 of the week containing `when`, seconds since then)."""
+        midnight = when.replace(hour=0, minute=0, second=0, microsecond=0)
+        week_start = midnight - datetime.timedelta(days=when.weekday())
+        return week_start, (when - week_start).total_seconds()
+
+    def blocked_until(self, when):
+        """If `when` is inside a blocked window, returns the datetime that window ends; otherwise None."""
+        week_start, offset = self._week_position(when)
+        i = bisect.bisect_right(self._starts, offset) - 1
+        if i < 0 or offset >= self._ends[i]:
+            return None
+        end = self._ends[i]
+        if end == WEEK_SECONDS and i > 0 and self._starts[0] == 0:
+            end += self._ends[0] # Continues into next Monday's first window
+        return week_start + datetime.timedelta(seconds=end)
+
+    def block_started(self, when):
+        """If `when` is inside a blocked window, returns the datetime that window started; otherwise None."""
+        week_start, offset = self._week_position(when)
+        i = bisect.bisect_right(self._starts, offset) - 1
+        if i < 0 or offset >= self._ends[i]:
+            return None
+        if i == 0 and self._starts[0] == 0 and self._ends[-1] == WEEK_SECONDS and len(self._starts) > 1:
+            # Continues from last Sunday's window
+            return week_start - datetime.timedelta(seconds=WEEK_SECONDS - self._starts[-1])
+        return week_start + datetime.timedelta(seconds=self._starts[i])
+
+    def next_block_start(self, when):
+        """The start of the next blocked window after `when`, or None if nothing is ever blocked."""
+        if not self._starts:
+            return None
+        week_start, offset = self._week_position(when)
+        i = bisect.bisect_right(self._starts, offset)
+        if i < len(self._starts):
+            return week_start + datetime.timedelta(seconds=self._starts[i])
+        return week_start + datetime.timedelta(seconds=WEEK_SECONDS + self._starts[0])
+
+
+def next_transition(rule_set, now):
+    """
+    Returns the datetime of the next moment any rule's state can change: the end of an active
+    block, or the start of a rule's next blocked window. Midnight if no rule will ever change.
+    """
+    candidates = []
+    for rule in rule_set.rules:
+        if rule.block_activated_today:
+            candidates.append(rule.blocked_until)
+        else:
+            block_start = rule.schedule.next_block_start(now)
+            if block_start is not None:
+                candidates.append(block_start)
+    if not candidates:
+        return datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+    return min(candidates)
+
+
+def seconds_until(deadline, now, max_sleep=MAX_IDLE_SLEEP):
+    """Seconds from `now` until `deadline`, clamped to [0, max_sleep]."""
+    return min(max(0.0, (deadline - now).total_seconds()), max_sleep)
+
+
+class ClockJumpDetector:
+    """Compares wall-clock and monotonic time across a sleep to spot clock changes."""
+
+    def __init__(self, tolerance=CLOCK_JUMP_TOLERANCE, monotonic=None):
+        self._tolerance = tolerance
+        self._monotonic = monotonic or time.monotonic # e.g. a simulated clock's, see simulation.py
+        self._wall_start = None
+        self._monotonic_start = None
+
+    def start(self, now):
+        self._wall_start = now
+        self._monotonic_start = self._monotonic()
+
+    def jumped(self, now):
+        """True if `now` differs from what the monotonic clock predicts by more than the tolerance."""
+        if self._wall_start is None:
+            return False
+        expected = self._wall_start + datetime.timedelta(seconds=self._monotonic() - self._monotonic_start)
+        return abs((now - expected).total_seconds()) > self._tolerance
@@ -0,0 +1,316 @@
+"""
+Deterministic simulation of the monitor loop on virtual time.
+
+Simulation runs blocker.monitor_rule_set() unchanged against a virtual clock, process table,
+process watcher, sleeper and terminator. Every wait fast-forwards the clock to the next thing
+that happens (a scripted launch, exit or clock step, or the monitor's own wake-up), so weeks of
+schedule take milliseconds while going through exactly the code the real monitor runs. Wall
+time is shown in a chosen IANA time zone, set through TZ for the duration of run() so DST
+changes behave as they would on a machine in that zone, and can be stepped without moving
+monotonic time, like an NTP step, a manual change or a resume from suspend.
+
+    simulation = Simulation(datetime.datetime(2024, 3, 25), tz="Europe/Berlin")
+    simulation.launch(datetime.datetime(2024, 3, 25, 18, 30), "/apps/game.exe", lifetime=3600)
+    simulation.step_clock(datetime.datetime(2024, 3, 26, 12, 0), hours=3)
+    simulation.run(rule_set, until=datetime.datetime(2024, 4, 8))
+    simulation.terminations # [SimulatedTermination(time, wall_time, pid, exe, outcome)]
+
+Script times are naive local times in `tz`; an event fires once the wall clock has reached it.
+exe_sha256 rules are not supported (nothing is hashed).
+"""
+import collections
+import contextlib
+import datetime
+import heapq
+import itertools
+import os
+import threading
+import time
+
+import psutil
+
+from .blocker import monitor_rule_set
+from .scan_cache import ScanCache
+from .terminator import TerminationResult
+
+FIRST_PID = 1000
+# A run that wakes the monitor more often than this is assumed to be stuck in a zero-length sleep.
+MAX_WAKEUPS = 1000000
+
+# `time` is naive local time, as the monitor saw it; `wall_time` is Unix time, which is unambiguous across DST.
+SimulatedTermination = collections.namedtuple("SimulatedTermination", "time wall_time pid exe outcome")
+
+
+@contextlib.contextmanager
+def local_timezone(tz):
+    """Makes naive local time (datetime.now(), fromtimestamp(), timestamp()) use `tz`. Unix only."""
+    if tz is None:
+        yield
+        return
+    if not hasattr(time, "tzset"):
+        raise RuntimeError("Simulating a time zone needs time.tzset(), which this platform lacks")
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = tz
+    time.tzset()
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ["TZ"]
+        else:
+            os.environ["TZ"] = previous
+        time.tzset()
+
+
+class SimulatedClock:
+    """Virtual time. advance() moves wall and monotonic time together; step() moves only the wall clock."""
+
+    def __init__(self, wall_time):
+        self.wall_time = wall_time # Unix time
+        self.monotonic_time = 0.0
+
+    def now(self):
+        return datetime.datetime.fromtimestamp(self.wall_time)
+
+    def time(self):
+        return self.wall_time
+
+    def monotonic(self):
+        return self.monotonic_time
+
+    def advance(self, seconds):
+        self.wall_time += seconds
+        self.monotonic_time += seconds
+
+    def step(self, seconds):
+        self.wall_time += seconds
+
+
+class SimulatedProcess:
+    """A scripted process; stands in for the psutil.Process the monitor hands to its terminator."""
+
+    def __init__(self, pid, exe, name, cmdline, uid, create_time, ignores_sigterm=False, unkillable=False):
+        self.pid = pid
+        self.exe = exe
+        self.name = name
+        self.cmdline = cmdline
+        self.uid = uid
+        self.started_at = create_time # Wall time
+        self.ppid = 1 # Launched by init, so never part of a respawn storm
+        self.ignores_sigterm = ignores_sigterm # Needs the kill after the grace period
+        self.unkillable = unkillable           # Survives even that, like a process stuck in the kernel
+        self.ended_at = None                   # Wall time it exited or was terminated
+        self.ended_by = None                   # "exit", "terminated" or "killed"
+
+    @property
+    def running(self):
+        return self.ended_at is None
+
+    def is_running(self):
+        return self.running
+
+    def create_time(self):
+        return self.started_at
+
+    def __repr__(self):
+        return f"SimulatedProcess(pid={self.pid}, exe={self.exe!r})"
+
+
+class SimulatedProcessTable:
+    """Process table backend (see process_table.py) over the running SimulatedProcesses."""
+    name = "simulated"
+
+    def __init__(self):
+        self.processes = {} # pid -> running SimulatedProcess
+
+    def _get(self, pid):
+        proc = self.processes.get(pid)
+        if proc is None:
+            raise psutil.NoSuchProcess(pid)
+        return proc
+
+    def listing(self):
+        return dict.fromkeys(self.processes) # PIDs are never reused here
+
+    def read(self, pid):
+        proc = self._get(pid)
+        return proc, proc.name, proc.started_at
+
+    def uid(self, info):
+        return self._get(info.pid).uid
+
+    def exe(self, info):
+        return self._get(info.pid).exe
+
+    def cmdline(self, info):
+        return list(self._get(info.pid).cmdline)
+
+    def ppid(self, pid):
+        return self._get(pid).ppid
+
+
+class Simulation:
+    """
+    Scripted processes and clock steps, replayed against monitor_rule_set() on virtual time.
+    The instance is the monitor's process watcher, sleeper and terminator. With `event_driven`
+    (like the netlink watcher) launches wake the monitor at once; without it the monitor polls.
+    """
+
+    def __init__(self, start, tz=None, event_driven=True):
+        self.start = start # Naive local time in `tz`
+        self.tz = tz
+        self.event_driven = event_driven
+        self.clock = None
+        self.process_table = SimulatedProcessTable()
+        self.processes = [] # Every SimulatedProcess launched so far, in launch order
+        self.terminations = [] # SimulatedTermination for each process the monitor terminated, in order
+        self.log = [] # (local time, message) for every status message
+        self.saves = 0 # Times the monitor asked for the rule states to be saved
+        self.wakeups = 0
+        self._script = [] # (local time, sequence, action, args); turned into _queue by run()
+        self._queue = []  # Heap of (wall time, sequence, action, args)
+        self._sequence = itertools.count()
+        self._next_pid = FIRST_PID
+        self._exec_pids = set() # Launched since the watcher last returned
+        self._end_time = None
+        self._stop_event = None
+
+    # --- Script ---
+
+    def launch(self, at, exe, name=None, cmdline=None, uid=1000, lifetime=None, ignores_sigterm=False, unkillable=False):
+        """Starts a process at local time `at`. It exits by itself `lifetime` seconds later, if given."""
+        name = name if name is not None else os.path.basename(exe)[:15] # Like the kernel's comm
+        args = (exe, name, cmdline if cmdline is not None else [exe], uid, lifetime, ignores_sigterm, unkillable)
+        self._script.append((at, next(self._sequence), self._launch, args))
+
+    def step_clock(self, at, **timedelta_args):
+        """Steps the wall clock by datetime.timedelta(**timedelta_args) (negative to go back) at local time `at`."""
+        self._script.append((at, next(self._sequence), self._step, (datetime.timedelta(**timedelta_args).total_seconds(),)))
+
+    # --- Replay ---
+
+    def run(self, rule_set, until, **monitor_kwargs):
+        """
+        Runs monitor_rule_set() on `rule_set` from `start` until the wall clock reaches local time
+        `until`. Extra keyword arguments go to monitor_rule_set(). Returns self.
+        """
+        with local_timezone(self.tz):
+            self.clock = SimulatedClock(self.start.timestamp())
+            self._queue = [(at.timestamp(), sequence, action, args) for at, sequence, action, args in self._script]
+            heapq.heapify(self._queue)
+            self._end_time = until.timestamp()
+            self._stop_event = threading.Event()
+            scan_cache = ScanCache(process_table=self.process_table, clock=self.clock)
+            self._advance(0.0, stop_at_launch=False) # Whatever is scripted for the very start
+            try:
+                monitor_rule_set(
+                    rule_set, self._stop_event, self._on_save, self._on_log, lambda func, *args: func(*args), None,
+                    process_watcher=self, scan_cache=scan_cache, clock=self.clock, sleeper=self,
+                    terminate_func=self.terminate_processes, **monitor_kwargs
+                )
+            finally:
+                scan_cache.close()
+        return self
+
+    def _on_save(self, rule_set):
+        self.saves += 1
+
+    def _on_log(self, message):
+        self.log.append((self.clock.now(), message))
+
+    def _launch(self, exe, name, cmdline, uid, lifetime, ignores_sigterm, unkillable):
+        proc = SimulatedProcess(self._next_pid, exe, name, cmdline, uid, self.clock.time(), ignores_sigterm, unkillable)
+        self._next_pid += 1
+        self.processes.append(proc)
+        self.process_table.processes[proc.pid] = proc
+        self._exec_pids.add(proc.pid)
+        if lifetime is not None:
+            heapq.heappush(self._queue, (self.clock.time() + lifetime, next(self._sequence), self._exit, (proc,)))
+
+    def _exit(self, proc):
+        if proc.running:
+            self._end(proc, "exit")
+
+    def _step(self, seconds):
+        self.clock.step(seconds)
+
+    def _end(self, proc, ended_by):
+        proc.ended_at = self.clock.time()
+        proc.ended_by = ended_by
+        del self.process_table.processes[proc.pid]
+
+    def _advance(self, seconds, stop_at_launch):
+        """
+        Moves virtual time forward by `seconds`, firing scripted events on the way. With
+        `stop_at_launch`, stops right after a launch (and anything else due at that instant).
+        Sets the stop event once the end time is reached.
+        """
+        target = self.clock.monotonic() + seconds
+        while self._queue and not (stop_at_launch and self._exec_pids):
+            wall_time, _sequence, action, args = self._queue[0]
+            # Events are due by wall time; the wall clock reaches this one after `delay` more seconds.
+            delay = max(0.0, wall_time - self.clock.time())
+            if self.clock.monotonic() + delay > target:
+                break
+            heapq.heappop(self._queue)
+            self.clock.advance(delay)
+            action(*args)
+            while self._queue and self._queue[0][0] <= self.clock.time():
+                _wall_time, _sequence, action, args = heapq.heappop(self._queue)
+                action(*args)
+        if not (stop_at_launch and self._exec_pids):
+            self.clock.advance(max(0.0, target - self.clock.monotonic()))
+        if self.clock.time() >= self._end_time:
+            self._stop_event.set()
+
+    # --- The monitor's process watcher, sleeper and terminator ---
+
+    name = "simulated"
+
+    def wait_for_exec(self, timeout, stop_event):
+        self._wake()
+        self._advance(timeout, stop_at_launch=self.event_driven)
+        launched, self._exec_pids = self._exec_pids, set()
+        return launched if self.event_driven else None
+
+    def sleep(self, seconds, stop_event):
+        self._wake()
+        self._advance(seconds, stop_at_launch=False)
+
+    def _wake(self):
+        self.wakeups += 1
+        if self.wakeups > MAX_WAKEUPS:
+            raise RuntimeError(f"Simulation woke the monitor {MAX_WAKEUPS} times; is it stuck in a zero-length sleep?")
+
+    def close(self):
+        pass
+
+    def terminate_processes(self, procs, grace_period=0.0, kill_timeout=0.0):
+        """Like terminator.terminate_processes(), with the grace period passing in virtual time."""
+        result = TerminationResult()
+        decided_at = (self.clock.now(), self.clock.time())
+        stubborn = []
+        for proc in procs:
+            if not proc.running:
+                result.terminated.append(proc) # Exited on its own just before the signal
+                result.exited_at[proc] = self.clock.monotonic()
+            elif proc.ignores_sigterm or proc.unkillable:
+                stubborn.append(proc)
+            else:
+                self._end(proc, "terminated")
+                result.terminated.append(proc)
+                result.exited_at[proc] = self.clock.monotonic()
+        if stubborn:
+            self._advance(grace_period, stop_at_launch=False)
+            for proc in stubborn:
+                if not proc.running:
+                    result.terminated.append(proc)
+                elif proc.unkillable:
+                    result.alive.append(proc)
+                else:
+                    self._end(proc, "killed")
+                    result.killed.append(proc)
+                    result.exited_at[proc] = self.clock.monotonic()
+        for outcome, outcome_procs in (("terminated", result.terminated), ("killed", result.killed), ("alive", result.alive)):
+            self.terminations.extend(SimulatedTermination(*decided_at, proc.pid, proc.exe, outcome) for proc in outcome_procs)
+        return result
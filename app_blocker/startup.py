@@ -0,0 +1,27 @@
+"""
+Startup-time profiling used by `--profile-startup` in main.py and daemon.py.
+Import this module first so its clock starts as close to process start as possible.
+"""
+import json
+import sys
+import time
+
+_STARTED = time.perf_counter()
+_phases = [] # (phase name, seconds since import)
+
+# Regression budget from import to window/enforcement ready, checked by tests/test_startup.py.
+STARTUP_BUDGET_SECONDS = 2.0
+
+def mark(phase):
+    """Records that `phase` has finished."""
+    _phases.append((phase, time.perf_counter() - _STARTED))
+
+def report():
+    """Returns the recorded phases as a dict of milliseconds since import."""
+    return {
+        "phases_ms": {phase: round(elapsed * 1000, 3) for phase, elapsed in _phases},
+        "total_ms": round((_phases[-1][1] if _phases else 0.0) * 1000, 3)
+    }
+
+def print_report(stream=None):
+    print(json.dumps(report(), indent=4), file=stream or sys.stdout)
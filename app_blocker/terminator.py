@@ -0,0 +1,134 @@
+import os
+import select
+import signal
+import time
+
+import psutil
+
+DEFAULT_TERMINATE_GRACE_PERIOD = 1.0 # Seconds to wait after SIGTERM before escalating to kill
+DEFAULT_KILL_TIMEOUT = 1.0           # Seconds to wait for killed processes to disappear
+
+# pidfd_open/pidfd_send_signal (Linux 5.3+, Python 3.9+) refer to one specific process, so a
+# signal can never hit an unrelated process that reused the PID, and the fd can be polled for exit.
+HAS_PIDFD = hasattr(os, "pidfd_open") and hasattr(signal, "pidfd_send_signal")
+
+
+class TerminationResult:
+    """Outcome of terminate_processes(). Each attribute is a list of psutil.Process."""
+
+    def __init__(self):
+        self.terminated = [] # Exited within the grace period
+        self.killed = []     # Needed a kill after the grace period
+        self.alive = []      # Still running after the kill timeout
+        self.denied = []     # We were not allowed to signal them
+        self.exited_at = {}  # proc -> time.monotonic() when it was seen to exit, for latency metrics
+
+
+def _open_pidfd(proc):
+    """Returns a pidfd for `proc`, or None if pidfds are unavailable. Raises NoSuchProcess if it is gone."""
+    if not HAS_PIDFD:
+        return None
+    try:
+        pidfd = os.pidfd_open(proc.pid)
+    except ProcessLookupError:
+        raise psutil.NoSuchProcess(proc.pid)
+    except OSError:
+        return None # Kernel without pidfd support
+    # The PID may have been reused between the scan and pidfd_open. psutil compares create_time,
+    # and once the fd is open it stays bound to this exact process.
+    if not proc.is_running():
+        os.close(pidfd)
+        raise psutil.NoSuchProcess(proc.pid)
+    return pidfd
+
+
+def _send_signal(proc, pidfd, kill=False):
+    """Sends SIGTERM (or SIGKILL if `kill`) through the pidfd when we have one, else via psutil."""
+    if pidfd is not None:
+        try:
+            signal.pidfd_send_signal(pidfd, signal.SIGKILL if kill else signal.SIGTERM)
+        except ProcessLookupError:
+            raise psutil.NoSuchProcess(proc.pid)
+        except PermissionError:
+            raise psutil.AccessDenied(proc.pid)
+    elif kill:
+        proc.kill()
+    else:
+        proc.terminate()
+
+
+def _wait_for_exit(pending, timeout):
+    """
+    Waits until every process in `pending` ({proc: pidfd or None}) has exited or `timeout` passes.
+    Returns {proc: time.monotonic() at exit} for the processes that exited. Processes with a pidfd are waited on with poll()
+    without any polling loop; the rest fall back to psutil.wait_procs().
+    """
+    deadline = time.monotonic() + timeout
+    exited = {}
+
+    with_fd = {pidfd: proc for proc, pidfd in pending.items() if pidfd is not None}
+    if with_fd:
+        poller = select.poll()
+        for pidfd in with_fd:
+            poller.register(pidfd, select.POLLIN)
+        while with_fd:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for pidfd, _event in poller.poll(remaining * 1000):
+                poller.unregister(pidfd)
+                exited[with_fd.pop(pidfd)] = time.monotonic()
+
+    without_fd = [proc for proc, pidfd in pending.items() if pidfd is None]
+    if without_fd:
+        psutil.wait_procs(without_fd, timeout=max(0.0, deadline - time.monotonic()),
+                          callback=lambda proc: exited.__setitem__(proc, time.monotonic()))
+    return exited
+
+
+def terminate_processes(procs, grace_period=DEFAULT_TERMINATE_GRACE_PERIOD, kill_timeout=DEFAULT_KILL_TIMEOUT):
+    """
+    Terminates every process in `procs` at once and waits for all of them together, in the
+    style of psutil.wait_procs(). Anything still running after `grace_period` is killed.
+    Total time is bounded by grace_period + kill_timeout regardless of how many processes match.
+    """
+    result = TerminationResult()
+    pidfds = {}  # proc -> pidfd or None, for every process we hold an fd for
+    pending = {} # proc -> pidfd or None, for processes that were sent SIGTERM
+    try:
+        for proc in procs:
+            try:
+                pidfds[proc] = _open_pidfd(proc)
+                _send_signal(proc, pidfds[proc])
+                pending[proc] = pidfds[proc]
+            except psutil.NoSuchProcess:
+                result.terminated.append(proc)
+                result.exited_at[proc] = time.monotonic()
+            except psutil.AccessDenied:
+                result.denied.append(proc)
+
+        exited = _wait_for_exit(pending, grace_period) if pending else {}
+        result.terminated.extend(proc for proc in pending if proc in exited)
+        result.exited_at.update(exited)
+        to_kill = {}
+        for proc, pidfd in pending.items():
+            if proc in exited:
+                continue
+            try:
+                _send_signal(proc, pidfd, kill=True)
+                to_kill[proc] = pidfd
+            except psutil.NoSuchProcess:
+                result.terminated.append(proc)
+                result.exited_at[proc] = time.monotonic()
+            except psutil.AccessDenied:
+                result.denied.append(proc)
+
+        exited = _wait_for_exit(to_kill, kill_timeout) if to_kill else {}
+        result.exited_at.update(exited)
+        for proc in to_kill:
+            (result.killed if proc in exited else result.alive).append(proc)
+    finally:
+        for pidfd in pidfds.values():
+            if pidfd is not None:
+                os.close(pidfd)
+    return result
@@ -0,0 +1,219 @@
+"""
+Usage accounting: how long each target application actually ran.
+
+UsageAccountant turns the monitor's periodic process samples into run intervals (from the
+process's create_time to the last sample it was seen in) and UsageLog appends them to a compact
+binary file in the app data directory. build_usage_report() rolls a year of intervals up into
+per-day and per-week totals and a weekday x hour-of-day heatmap with vectorized NumPy code.
+
+    python -m app_blocker.usage [--days 7]
+
+Recording only needs the standard library; NumPy is required for reports.
+"""
+import argparse
+import datetime
+import json
+import os
+import struct
+import sys
+import time
+
+from . import config
+
+USAGE_FILE_NAME = "usage.bin"
+USAGE_APPS_FILE_NAME = "usage_apps.json"
+# One record per process lifetime: app id (index into the apps file), start and end as Unix time.
+RECORD = struct.Struct("<Idd")
+# How often running targets are sampled. Run times are accurate to within this.
+USAGE_SAMPLE_INTERVAL = 30.0
+# Added per app id to interval times so every app's intervals can be merged in one sorted pass.
+# Larger than any Unix timestamp we will see, small enough that float64 keeps sub-millisecond precision.
+APP_TIME_OFFSET = float(2 ** 35)
+
+
+def _usage_paths():
+    return (os.path.join(config.APP_DATA_DIR, USAGE_FILE_NAME), os.path.join(config.APP_DATA_DIR, USAGE_APPS_FILE_NAME))
+
+
+class UsageLog(config.AppRecordLog):
+    """Append-only store of (app, start, end) records. App keys are mapped to small integer ids."""
+
+    def __init__(self, path=None, apps_path=None):
+        default_path, default_apps_path = _usage_paths()
+        super().__init__(path or default_path, apps_path or default_apps_path, RECORD)
+
+    def append(self, records):
+        """Appends [(app key, start, end)] records."""
+        self._write(b"".join(RECORD.pack(self._app_id(app_key), start, end) for app_key, start, end in records))
+
+    def load(self):
+        """Returns (app keys, NumPy structured array with fields app/start/end). Requires NumPy."""
+        import numpy as np
+        dtype = np.dtype([("app", "<u4"), ("start", "<f8"), ("end", "<f8")])
+        return list(self.apps), np.frombuffer(self.read(), dtype=dtype)
+
+
+class UsageAccountant:
+    """
+    Tracks target process lifetimes across samples. sample() is cheap and disk-free unless a
+    process went away since the previous sample, in which case its interval is written out.
+    """
+
+    def __init__(self, usage_log=None, sample_interval=USAGE_SAMPLE_INTERVAL):
+        self.usage_log = usage_log or UsageLog()
+        self.sample_interval = sample_interval
+        self._open = {} # (pid, create_time) -> [app key, start, last seen]
+        self._last_sample = None
+
+    def sample_due(self, now_monotonic):
+        return self._last_sample is None or now_monotonic - self._last_sample >= self.sample_interval
+
+    def sample(self, running_targets, now=None, now_monotonic=None):
+        """Records one observation of [(pid, create_time, app key)], e.g. from ScanCache.running_targets()."""
+        now = time.time() if now is None else now
+        self._last_sample = time.monotonic() if now_monotonic is None else now_monotonic
+        seen = set()
+        for pid, create_time, app_key in running_targets:
+            process_key = (pid, create_time)
+            seen.add(process_key)
+            interval = self._open.get(process_key)
+            if interval is None:
+                self._open[process_key] = [app_key, create_time, now]
+            else:
+                interval[2] = now
+        finished = [process_key for process_key in self._open if process_key not in seen]
+        self.usage_log.append([tuple(self._open[process_key]) for process_key in finished])
+        for process_key in finished: # Only once written; after an OSError the next sample retries
+            del self._open[process_key]
+
+    def close(self, now=None):
+        """Ends every open interval at `now` (e.g. when monitoring stops) and writes them out."""
+        now = time.time() if now is None else now
+        self.usage_log.append([(app_key, start, max(start, now)) for app_key, start, _last_seen in self._open.values()])
+        self._open.clear()
+
+
+def merge_intervals(app_ids, starts, ends):
+    """
+    Merges overlapping intervals of the same app (e.g. several instances running at once) so time
+    is not double counted. Returns (app_ids, starts, ends) sorted by app, then start. Vectorized:
+    shifting each app's times by app * APP_TIME_OFFSET lets one sort and one running maximum
+    handle every app at once.
+    """
+    import numpy as np
+    offsets = app_ids.astype(np.float64) * APP_TIME_OFFSET
+    shifted_starts = starts + offsets
+    order = np.argsort(shifted_starts, kind="stable")
+    shifted_starts = shifted_starts[order]
+    shifted_ends = np.maximum(ends + offsets, starts + offsets)[order]
+    if len(shifted_starts) == 0:
+        return app_ids[:0], starts[:0], ends[:0]
+    running_end = np.maximum.accumulate(shifted_ends)
+    # A new merged interval begins wherever a start lies beyond everything seen so far.
+    begins = np.concatenate(([True], shifted_starts[1:] > running_end[:-1]))
+    group_starts = np.flatnonzero(begins)
+    merged_app_ids = app_ids[order][group_starts]
+    merged_offsets = merged_app_ids.astype(np.float64) * APP_TIME_OFFSET
+    merged_starts = shifted_starts[group_starts] - merged_offsets
+    merged_ends = np.maximum.reduceat(shifted_ends, group_starts) - merged_offsets
+    return merged_app_ids, merged_starts, merged_ends
+
+
+def _covered_seconds(merged_app_ids, merged_starts, merged_ends, app_count, boundaries):
+    """
+    For each app, the seconds covered by its merged intervals between consecutive `boundaries`.
+    Returns an (app_count, len(boundaries) - 1) array. Uses the cumulative coverage function
+    C(t) = seconds run before t, evaluated at every boundary of every app in one searchsorted call.
+    """
+    import numpy as np
+    durations = merged_ends - merged_starts
+    offsets = merged_app_ids.astype(np.float64) * APP_TIME_OFFSET
+    shifted_starts = merged_starts + offsets
+    shifted_ends = merged_ends + offsets
+    # Prefix sums restart for each app by subtracting the total of all earlier apps.
+    prefix = np.concatenate(([0.0], np.cumsum(durations)))
+    app_first = np.searchsorted(merged_app_ids, np.arange(app_count), side="left")
+
+    apps = np.arange(app_count, dtype=np.float64)[:, None]
+    shifted_boundaries = boundaries[None, :] + apps * APP_TIME_OFFSET
+    # Intervals entirely before each boundary, and the one that may straddle it.
+    completed = np.searchsorted(shifted_ends, shifted_boundaries, side="right")
+    coverage = prefix[completed] - prefix[app_first][:, None]
+    straddling = np.minimum(completed, len(shifted_starts) - 1)
+    if len(shifted_starts):
+        partial = np.clip(shifted_boundaries - shifted_starts[straddling], 0.0, None)
+        partial = np.minimum(partial, durations[straddling])
+        same_app = (completed < len(shifted_starts)) & (merged_app_ids[straddling] == apps.astype(merged_app_ids.dtype))
+        coverage = coverage + np.where(same_app, partial, 0.0)
+    return np.diff(coverage, axis=1)
+
+
+class UsageReport:
+    """Per-app usage rollups. All durations are in seconds."""
+
+    def __init__(self, apps, days, daily, week_starts, weekly, heatmap):
+        self.apps = apps               # App keys, one per row of the arrays below
+        self.days = days               # datetime.date for each column of `daily`
+        self.daily = daily             # (apps, days)
+        self.week_starts = week_starts # Monday of each column of `weekly`
+        self.weekly = weekly           # (apps, weeks)
+        self.heatmap = heatmap         # (apps, 7 weekdays (Monday first), 24 hours)
+
+    def to_dict(self):
+        return {
+            app: {
+                "daily": {day.isoformat(): round(float(seconds), 1) for day, seconds in zip(self.days, self.daily[i])},
+                "weekly": {week.isoformat(): round(float(seconds), 1) for week, seconds in zip(self.week_starts, self.weekly[i])},
+                "heatmap": [[round(float(seconds), 1) for seconds in hours] for hours in self.heatmap[i]]
+            }
+            for i, app in enumerate(self.apps)
+        }
+
+
+def build_usage_report(apps, records, first_day, last_day):
+    """
+    Rolls `records` (from UsageLog.load()) up into a UsageReport covering first_day..last_day
+    inclusive, in local time. Hour boundaries are local midnight plus whole hours, so on a day
+    with a DST change one hour is attributed to its neighbour.
+    """
+    import numpy as np
+    day_count = (last_day - first_day).days + 1
+    days = [first_day + datetime.timedelta(days=i) for i in range(day_count)]
+    midnights = np.array([time.mktime(day.timetuple()) for day in days + [last_day + datetime.timedelta(days=1)]])
+    hour_boundaries = np.append((midnights[:-1, None] + np.arange(24) * 3600.0).ravel(), midnights[-1])
+
+    merged = merge_intervals(records["app"], records["start"], records["end"])
+    hourly = _covered_seconds(*merged, len(apps), hour_boundaries) # (apps, days * 24)
+    by_day_and_hour = hourly.reshape(len(apps), day_count, 24)
+    daily = by_day_and_hour.sum(axis=2)
+
+    day_ordinals = first_day.toordinal() + np.arange(day_count)
+    weekdays = (day_ordinals - 1) % 7 # Ordinal 1 (0001-01-01) was a Monday
+    heatmap = np.zeros((len(apps), 7, 24))
+    np.add.at(heatmap, (slice(None), weekdays), by_day_and_hour)
+
+    week_ordinals, week_index = np.unique(day_ordinals - weekdays, return_inverse=True)
+    weekly = np.zeros((len(apps), len(week_ordinals)))
+    np.add.at(weekly, (slice(None), week_index), daily)
+    week_starts = [datetime.date.fromordinal(int(ordinal)) for ordinal in week_ordinals]
+    return UsageReport(list(apps), days, daily, week_starts, weekly, heatmap)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print how long each blocked application ran, as JSON.")
+    parser.add_argument("--days", type=int, default=7, help="Number of days to report, ending today")
+    args = parser.parse_args(argv)
+    try:
+        import numpy # noqa: F401
+    except ImportError:
+        print("NumPy is not installed. Install it with `pip install numpy` to build usage reports.")
+        return 1
+    apps, records = UsageLog().load()
+    today = datetime.date.today()
+    report = build_usage_report(apps, records, today - datetime.timedelta(days=args.days - 1), today)
+    print(json.dumps(report.to_dict(), indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Benchmarks for the monitor loop's scan and kill paths.
+
+    python -m benchmarks.bench_monitor                    # both suites, JSON to stdout
+    python -m benchmarks.bench_monitor --suite scan --sizes 100 1000 --output results.json
+    python -m benchmarks.bench_monitor --compare baseline.json   # exit 1 on regression
+    python -m benchmarks.bench_monitor --suite backends --spawn 1000   # procfs vs psutil on this host
+
+The scan suite drives blocker.monitor_loop against a synthetic psutil process table and reports
+per-tick CPU time, wall time and allocations. The kill suite (Linux only) spawns real processes
+whose executable is the blocked target and measures how long it takes until every one is dead.
+The backends suite (Linux only) scans the real process table with each process table backend
+(see app_blocker/process_table.py), optionally padded with `--spawn` sleeping processes.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from unittest import mock
+
+import psutil
+
+from app_blocker import blocker
+from app_blocker.process_table import ProcfsProcessTable, PsutilProcessTable
+from app_blocker.rules import BlockRule, RuleSet
+from app_blocker.scan_cache import ScanCache
+from app_blocker.process_watcher import PollingProcessWatcher
+
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+DEFAULT_TICKS = 20
+DEFAULT_KILL_COUNTS = [1, 10, 50]
+TARGET_PATH = "/opt/blocked/target_app"
+# Metrics compared by --compare, and how much slower a run may be before it counts as a regression.
+COMPARED_METRICS = ("cpu_per_tick_ms", "wall_per_tick_ms", "seconds_until_all_dead", "cold_scan_ms", "warm_scan_ms")
+DEFAULT_TOLERANCE = 0.25
+PARAMETER_KEYS = ("processes", "ticks", "churn", "instances", "ignore_sigterm", "backend", "workload")
+
+
+class SyntheticProcess:
+    """Stand-in for psutil.Process with the attributes the scan path reads."""
+
+    __slots__ = ("pid", "_exe", "_create_time")
+
+    def __init__(self, pid, exe, create_time):
+        self.pid = pid
+        self._exe = exe
+        self._create_time = create_time
+
+    def create_time(self):
+        return self._create_time
+
+    def exe(self):
+        return self._exe
+
+    def name(self):
+        return os.path.basename(self._exe)
+
+
+class SyntheticProcessTable:
+    """A fake process table of `size` processes, none of which is the target."""
+
+    def __init__(self, size, churn=0.0):
+        self._table = {}
+        self._next_pid = 1
+        self._churn = churn
+        for _ in range(size):
+            self._spawn()
+
+    def _spawn(self):
+        pid = self._next_pid
+        self._next_pid += 1
+        self._table[pid] = SyntheticProcess(pid, f"/usr/lib/app{pid % 500}/bin/worker{pid}", float(pid))
+
+    def tick(self):
+        """Replaces a `churn` fraction of the processes with new ones, like a busy host."""
+        replaced = int(len(self._table) * self._churn)
+        for pid in list(self._table)[:replaced]:
+            del self._table[pid]
+            self._spawn()
+
+    def pids(self):
+        return list(self._table)
+
+    def process(self, pid):
+        if pid not in self._table:
+            raise psutil.NoSuchProcess(pid)
+        return self._table[pid]
+
+    def patch(self):
+        stack = contextlib.ExitStack()
+        stack.enter_context(mock.patch.multiple(psutil, pids=self.pids, Process=self.process))
+        # Bypass the procfs backend so the synthetic table is what gets scanned.
+        stack.enter_context(mock.patch.object(ProcfsProcessTable, "available", staticmethod(lambda: False)))
+        return stack
+
+
+class TickRecorder(PollingProcessWatcher):
+    """
+    Polling watcher that records the cost of each tick instead of sleeping, and stops the loop
+    after `ticks` ticks. The time between two wait_for_exec() calls is exactly one tick's work.
+    """
+
+    def __init__(self, ticks, table, trace_allocations=False):
+        self._ticks = ticks
+        self._table = table
+        self._trace_allocations = trace_allocations
+        self.samples = []
+        self._started = None
+
+    def begin(self):
+        if self._trace_allocations:
+            tracemalloc.reset_peak()
+            self._traced_start = tracemalloc.get_traced_memory()[0]
+        self._started = (time.process_time(), time.perf_counter())
+
+    def wait_for_exec(self, timeout, stop_event):
+        cpu_end, wall_end = time.process_time(), time.perf_counter()
+        sample = {"cpu_s": cpu_end - self._started[0], "wall_s": wall_end - self._started[1]}
+        if self._trace_allocations:
+            sample["peak_alloc_bytes"] = tracemalloc.get_traced_memory()[1] - self._traced_start
+        self.samples.append(sample)
+        if len(self.samples) >= self._ticks:
+            stop_event.set()
+        self._table.tick()
+        self.begin()
+        return None
+
+
+def _run_monitor_ticks(table, ticks, trace_allocations):
+    recorder = TickRecorder(ticks, table, trace_allocations)
+    today = datetime.date.today()
+    with table.patch():
+        recorder.begin()
+        blocker.monitor_loop(
+            TARGET_PATH, 0, 0, threading.Event(),
+            lambda: (True, today), lambda *state: None, lambda message: None,
+            lambda func, *args: func(*args), None, recorder
+        )
+    return recorder.samples
+
+
+def bench_scan(sizes, ticks, churn):
+    """Per-tick cost of a full polling scan with the block active and no matching process."""
+    results = []
+    for size in sizes:
+        samples = _run_monitor_ticks(SyntheticProcessTable(size, churn), ticks, trace_allocations=False)
+        tracemalloc.start()
+        try:
+            alloc_samples = _run_monitor_ticks(SyntheticProcessTable(size, churn), ticks, trace_allocations=True)
+        finally:
+            tracemalloc.stop()
+        # The first tick resolves every process; later ticks only see the churned ones.
+        steady = samples[1:] or samples
+        results.append({
+            "processes": size,
+            "ticks": ticks,
+            "churn": churn,
+            "first_tick_cpu_ms": samples[0]["cpu_s"] * 1000,
+            "cpu_per_tick_ms": statistics.median(s["cpu_s"] for s in steady) * 1000,
+            "wall_per_tick_ms": statistics.median(s["wall_s"] for s in steady) * 1000,
+            "first_tick_peak_alloc_kib": alloc_samples[0]["peak_alloc_bytes"] / 1024,
+            "peak_alloc_per_tick_kib": statistics.median(s["peak_alloc_bytes"] for s in (alloc_samples[1:] or alloc_samples)) / 1024,
+        })
+    return results
+
+
+def bench_kill(counts, ignore_sigterm=False, timeout=30.0):
+    """
+    Spawns `count` real processes running a copy of `sleep` that is the blocked target, starts
+    the monitor with the block already active and measures the time until all of them are dead.
+    """
+    if not sys.platform.startswith("linux"):
+        return []
+    sleep_binary = shutil.which("sleep")
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        target = os.path.join(temp_dir, "target_app")
+        shutil.copy(sleep_binary, target)
+        for count in counts:
+            if ignore_sigterm:
+                # An ignored SIGTERM survives exec, so the target itself needs the kill escalation.
+                commands = [["sh", "-c", f'trap "" TERM; exec {target} 600']] * count
+            else:
+                commands = [[target, "600"]] * count
+            children = [subprocess.Popen(command) for command in commands]
+            time.sleep(0.2) # Let the shells exec into the target
+            stop_event = threading.Event()
+            today = datetime.date.today()
+            started = time.perf_counter()
+            monitor = threading.Thread(target=blocker.monitor_loop, args=(
+                target, 0, 0, stop_event,
+                lambda: (True, today), lambda *state: None, lambda message: None,
+                lambda func, *args: func(*args), None
+            ), daemon=True)
+            monitor.start()
+            deadline = started + timeout
+            try:
+                for child in children:
+                    child.wait(timeout=max(0.0, deadline - time.perf_counter()))
+                elapsed = time.perf_counter() - started
+            except subprocess.TimeoutExpired:
+                elapsed = None
+            finally:
+                stop_event.set()
+                monitor.join(timeout=5)
+                for child in children:
+                    if child.poll() is None:
+                        child.kill()
+                        child.wait()
+            results.append({
+                "instances": count,
+                "ignore_sigterm": ignore_sigterm,
+                "seconds_until_all_dead": elapsed,
+            })
+    return results
+
+
+# Rules for the backends suite. "name": a process-name rule, so only names are read. "cmdline": a
+# rule with no name stage, so every process also has its uid, executable and command line read.
+BACKEND_WORKLOADS = {
+    "name": lambda: BlockRule("", 0, 0, True, datetime.date.today(), process_name=os.path.basename(TARGET_PATH)),
+    "cmdline": lambda: BlockRule("", 0, 0, True, datetime.date.today(), uids=[os.getuid()],
+                                 cmdline_pattern="^no such command line$"),
+}
+BACKENDS = {"psutil": PsutilProcessTable, "procfs": ProcfsProcessTable}
+
+
+def _spawn_sleepers(count):
+    sleep_binary = shutil.which("sleep")
+    return [subprocess.Popen([sleep_binary, "600"]) for _ in range(count)]
+
+
+def bench_backends(ticks, spawn=0):
+    """
+    Cost of one full scan of the real process table with each backend: cold (every PID inspected
+    by a fresh ScanCache) and warm (the next ticks, where only the PID listing changes).
+    """
+    if not ProcfsProcessTable.available():
+        return []
+    children = _spawn_sleepers(spawn)
+    try:
+        results = []
+        for workload, make_rule in BACKEND_WORKLOADS.items():
+            pipeline = RuleSet([make_rule()]).blocked_pipeline()
+            for backend, table_class in BACKENDS.items():
+                cold, warm = [], []
+                for _ in range(ticks):
+                    cache = ScanCache(process_table=table_class())
+                    started = time.perf_counter()
+                    cache.find_matches(pipeline)
+                    cold.append(time.perf_counter() - started)
+                    started = time.perf_counter()
+                    cache.find_matches(pipeline)
+                    warm.append(time.perf_counter() - started)
+                    cache.close()
+                results.append({
+                    "backend": backend,
+                    "workload": workload,
+                    "processes": len(cache),
+                    "cold_scan_ms": statistics.median(cold) * 1000,
+                    "warm_scan_ms": statistics.median(warm) * 1000,
+                })
+        return results
+    finally:
+        for child in children:
+            child.kill()
+            child.wait()
+
+
+def _row_key(row):
+    """The parameters that identify a measurement, used to pair it with its baseline."""
+    return tuple((name, row[name]) for name in PARAMETER_KEYS if name in row)
+
+
+def compare(results, baseline, tolerance):
+    """Returns human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    for suite in ("scan", "kill", "backends"):
+        baseline_rows = {_row_key(row): row for row in baseline.get(suite, [])}
+        for row in results.get(suite, []):
+            base_row = baseline_rows.get(_row_key(row))
+            if not base_row:
+                continue
+            label = f"{suite} " + ", ".join(f"{name}={value}" for name, value in _row_key(row))
+            for metric in COMPARED_METRICS:
+                new, old = row.get(metric), base_row.get(metric)
+                if new is None and old is not None:
+                    regressions.append(f"{label}: {metric} timed out (baseline {old:.4f})")
+                elif new is not None and old and new > old * (1 + tolerance):
+                    regressions.append(f"{label}: {metric} {new:.4f} vs baseline {old:.4f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", choices=("scan", "kill", "backends", "all"), default="all")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Synthetic process table sizes")
+    parser.add_argument("--ticks", type=int, default=DEFAULT_TICKS, help="Ticks per scan measurement")
+    parser.add_argument("--churn", type=float, default=0.01, help="Fraction of processes replaced per tick")
+    parser.add_argument("--kill-counts", type=int, nargs="+", default=DEFAULT_KILL_COUNTS, help="Instances per kill measurement")
+    parser.add_argument("--spawn", type=int, default=0, help="Sleeping processes to add for the backends suite")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON file; exit with status 1 if any metric regressed")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "psutil": psutil.__version__,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    if args.suite in ("scan", "all"):
+        results["scan"] = bench_scan(args.sizes, args.ticks, args.churn)
+    if args.suite in ("kill", "all"):
+        results["kill"] = bench_kill(args.kill_counts) + bench_kill(args.kill_counts, ignore_sigterm=True)
+    if args.suite in ("backends", "all"):
+        results["backends"] = bench_backends(args.ticks, args.spawn)
+
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,469 @@
+import unittest
+import contextlib
+from unittest import mock
+import os
+import sys
+import datetime
+import hashlib
+import shutil
+import tempfile
+import threading
+import time
+import types
+
+import psutil
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import blocker, history, scan_cache, terminator
+from app_blocker.metrics import MonitorMetrics
+from app_blocker.process_table import ProcfsProcessTable, PsutilProcessTable
+from app_blocker.rules import BlockRule, RuleSet, normalize_exe_path
+from app_blocker.simulation import SimulatedClock
+
+
+class FakeProcess:
+    """Minimal stand-in for psutil.Process."""
+
+    def __init__(self, pid, exe, create_time=1.0, exe_denied=False, name=None, cmdline=None, uid=1000, ppid=1):
+        self.pid = pid
+        self._exe = exe
+        self._create_time = create_time
+        self.exe_denied = exe_denied
+        self._name = name if name is not None else os.path.basename(exe)
+        self._cmdline = cmdline if cmdline is not None else [exe]
+        self._uid = uid
+        self._ppid = ppid
+        self.exe_calls = 0
+        self.terminated = False
+
+    def create_time(self):
+        return self._create_time
+
+    def exe(self):
+        self.exe_calls += 1
+        if self.exe_denied:
+            raise psutil.AccessDenied(self.pid)
+        return self._exe
+
+    def terminate(self):
+        self.terminated = True
+
+    def wait(self, timeout=None):
+        return 0
+
+    def kill(self):
+        self.terminated = True
+
+    def name(self):
+        return self._name
+
+    def cmdline(self):
+        return self._cmdline
+
+    def uids(self):
+        return types.SimpleNamespace(real=self._uid, effective=self._uid, saved=self._uid)
+
+    def ppid(self):
+        return self._ppid
+
+
+@contextlib.contextmanager
+def patch_process_table(processes):
+    """Patches psutil so the scan sees only `processes` (a list of FakeProcess)."""
+    table = {proc.pid: proc for proc in processes}
+
+    def fake_process(pid):
+        if pid not in table:
+            raise psutil.NoSuchProcess(pid)
+        return table[pid]
+
+    # The scan reads /proc directly on Linux; route it through the patched psutil instead.
+    with mock.patch.multiple(psutil, pids=lambda: list(table), Process=fake_process), \
+            mock.patch.object(ProcfsProcessTable, "available", staticmethod(lambda: False)):
+        yield
+
+
+class ListedProcessTable(PsutilProcessTable):
+    """Lists a generation per PID like the procfs backend: the identity of the FakeProcess behind it."""
+
+    def listing(self):
+        return {pid: id(psutil.Process(pid)) for pid in psutil.pids()}
+
+
+class SingleTickWatcher:
+    """Process watcher that ends monitoring after the first tick."""
+    event_driven = True
+
+    def wait_for_exec(self, timeout, stop_event):
+        stop_event.set()
+        return None
+
+    def close(self):
+        pass
+
+
+class SingleTickEvent(threading.Event):
+    """Stop event for a monitor with nothing blocked: its idle wait ends the run instead of sleeping."""
+
+    def wait(self, timeout=None):
+        self.set()
+        return True
+
+
+class EditedConfigStore:
+    """Config store whose file was edited once, before the monitor's first poll."""
+
+    def __init__(self, edited_values):
+        self.edited_values = edited_values
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def poll(self):
+        if self.edited_values is None:
+            return False
+        for callback in self.subscribers:
+            callback(self.edited_values)
+        self.edited_values = None
+        return True
+
+
+class TestMonitorRuleSet(unittest.TestCase):
+
+    def run_one_tick(self, rule_set, processes, config_store=None, metrics=None, log=None, event_log=None):
+        saved = []
+        with patch_process_table(processes), mock.patch.object(terminator, "HAS_PIDFD", False):
+            blocker.monitor_rule_set(
+                rule_set, SingleTickEvent(), saved.append, log or (lambda message: None),
+                lambda func, *args: func(*args), None, SingleTickWatcher(), config_store=config_store,
+                metrics=metrics, event_log=event_log
+            )
+        return saved
+
+    def test_only_blocked_targets_are_terminated(self):
+        today = datetime.date.today()
+        blocked_rule = BlockRule("/apps/blocked.exe", 0, 0, True, today)
+        allowed_rule = BlockRule("/apps/allowed.exe", 23, 59)
+        processes = [FakeProcess(1, "/apps/blocked.exe"), FakeProcess(2, "/apps/allowed.exe"),
+                     FakeProcess(3, "/usr/bin/other")]
+
+        with mock.patch.object(blocker.datetime, "datetime", wraps=datetime.datetime) as mock_datetime:
+            mock_datetime.now.return_value = datetime.datetime.combine(today, datetime.time(12, 0))
+            self.run_one_tick(RuleSet([blocked_rule, allowed_rule]), processes)
+
+        self.assertEqual([proc.terminated for proc in processes], [True, False, False])
+
+    def test_weekly_schedule_blocks_and_lifts_per_window(self):
+        monday = datetime.date(2024, 3, 4)
+        rule = BlockRule("/apps/blocked.exe", 23, 0, schedule={"mon": ["09:00-12:00", "13:00-17:00"]})
+        rule_set = RuleSet([rule])
+        log = []
+
+        def tick_at(hour, minute=0):
+            with mock.patch.object(blocker.datetime, "datetime", wraps=datetime.datetime) as mock_datetime:
+                mock_datetime.now.return_value = datetime.datetime.combine(monday, datetime.time(hour, minute))
+                self.run_one_tick(rule_set, [], log=log.append)
+
+        tick_at(10)
+        self.assertEqual(rule.blocked_until, datetime.datetime.combine(monday, datetime.time(12, 0)))
+        tick_at(12, 30)
+        self.assertFalse(rule.block_activated_today) # Lunch break
+        self.assertIn("Monitoring blocked.exe. Allowed until 13:00.", log)
+        tick_at(13)
+        self.assertTrue(rule.block_activated_today)
+
+    def test_tick_is_recorded_in_metrics(self):
+        today = datetime.date.today()
+        rule_set = RuleSet([BlockRule("/apps/blocked.exe", 0, 0, True, today)])
+        processes = [FakeProcess(1, "/apps/blocked.exe"), FakeProcess(2, "/usr/bin/other"),
+                     FakeProcess(3, "/usr/bin/secret", exe_denied=True, name="blocked.exe")]
+        metrics = MonitorMetrics()
+
+        with mock.patch.object(blocker.datetime, "datetime", wraps=datetime.datetime) as mock_datetime:
+            mock_datetime.now.return_value = datetime.datetime.combine(today, datetime.time(12, 0))
+            self.run_one_tick(rule_set, processes, metrics=metrics)
+
+        self.assertEqual(metrics.ticks.value, 1)
+        self.assertEqual(metrics.tick_duration.count, 1)
+        self.assertEqual(metrics.processes_scanned.sum, 3)
+        self.assertEqual(metrics.exe_resolutions.value, 2) # Only processes named like the target
+        self.assertEqual(metrics.access_denied.value, 1)
+        self.assertEqual((metrics.matches.value, metrics.terminated.value, metrics.killed.value), (1, 1, 0))
+        self.assertEqual(metrics.kill_latency.count, 1)
+
+    def test_running_targets_are_sampled_for_usage(self):
+        today = datetime.date.today()
+        rule_set = RuleSet([BlockRule("/apps/allowed.exe", 23, 59)])
+        processes = [FakeProcess(1, "/apps/allowed.exe", create_time=50.0), FakeProcess(2, "/usr/bin/other")]
+        stop_event = threading.Event()
+        accountant = mock.Mock()
+        accountant.sample_due.return_value = True
+        accountant.sample_interval = 30.0
+        accountant.sample.side_effect = lambda running_targets, **now: stop_event.set() # Nothing is blocked, so stop here
+
+        with mock.patch.object(blocker.datetime, "datetime", wraps=datetime.datetime) as mock_datetime:
+            mock_datetime.now.return_value = datetime.datetime.combine(today, datetime.time(12, 0))
+            with patch_process_table(processes):
+                blocker.monitor_rule_set(
+                    rule_set, stop_event, lambda rule_set: None, lambda message: None,
+                    lambda func, *args: func(*args), None, SingleTickWatcher(), usage_accountant=accountant
+                )
+
+        accountant.sample.assert_called_once_with([(1, 50.0, normalize_exe_path("/apps/allowed.exe"))],
+                                                  now=mock.ANY, now_monotonic=mock.ANY)
+        accountant.close.assert_called_once_with(now=mock.ANY)
+        self.assertFalse(processes[0].terminated)
+
+    def test_block_activation_and_terminations_are_logged_as_history(self):
+        today = datetime.date.today()
+        noon = datetime.datetime.combine(today, datetime.time(12, 0))
+        rule_set = RuleSet([BlockRule("/apps/blocked.exe", 9, 0)])
+        event_log = mock.Mock()
+
+        with mock.patch.object(blocker.datetime, "datetime", wraps=datetime.datetime) as mock_datetime:
+            mock_datetime.now.return_value = noon
+            self.run_one_tick(rule_set, [FakeProcess(7, "/apps/blocked.exe")], event_log=event_log)
+
+        (events,), _ = event_log.append.call_args # One write per tick
+        key = rule_set.rules[0].key
+        self.assertEqual(events[0], (noon.timestamp(), key, history.BLOCK_ACTIVATED, 0))
+        self.assertEqual(events[1][1:], (key, history.TERMINATED, 7))
+
+    def test_cutoff_activates_rule_and_saves_once(self):
+        today = datetime.date.today()
+        rules = [BlockRule(f"/apps/app{i}.exe", 9, 0) for i in range(3)]
+
+        with mock.patch.object(blocker.datetime, "datetime", wraps=datetime.datetime) as mock_datetime:
+            mock_datetime.now.return_value = datetime.datetime.combine(today, datetime.time(10, 0))
+            saved = self.run_one_tick(RuleSet(rules), [])
+
+        self.assertEqual(len(saved), 1)
+        self.assertTrue(all(rule.block_activated_today for rule in rules))
+        self.assertTrue(all(rule.date_block_activated == today for rule in rules))
+
+    def test_config_edits_are_applied_to_running_monitor(self):
+        today = datetime.date.today()
+        rule_set = RuleSet([BlockRule("/apps/a.exe", 23, 59)])
+        config_store = EditedConfigStore({
+            "terminate_grace_period": 0.5,
+            "rules": [BlockRule("/apps/a.exe", 23, 59).to_config(), BlockRule("/apps/b.exe", 9, 0).to_config()]
+        })
+        processes = [FakeProcess(1, "/apps/a.exe"), FakeProcess(2, "/apps/b.exe")]
+
+        with mock.patch.object(blocker.datetime, "datetime", wraps=datetime.datetime) as mock_datetime:
+            mock_datetime.now.return_value = datetime.datetime.combine(today, datetime.time(12, 0))
+            saved = self.run_one_tick(rule_set, processes, config_store)
+
+        self.assertEqual([rule.app_name for rule in rule_set.rules], ["a.exe", "b.exe"])
+        self.assertEqual([proc.terminated for proc in processes], [False, True])
+        self.assertEqual(len(saved), 2) # Once for the reload, once for b.exe's block activating
+        self.assertEqual(config_store.subscribers, [])
+
+    def test_monitor_loop_wrapper_reports_state_changes(self):
+        states = []
+        with patch_process_table([]):
+            blocker.monitor_loop(
+                "/apps/app.exe", 0, 0, threading.Event(),
+                lambda: (False, None), lambda *state: states.append(state), lambda message: None,
+                lambda func, *args: func(*args), None, SingleTickWatcher()
+            )
+        self.assertEqual(states, [(True, datetime.date.today())])
+
+
+def pipeline_for(*rules):
+    """Returns the MatchPipeline that matches any of `rules`, blocked or not."""
+    return RuleSet(rules).pipeline
+
+
+def blocked_pipeline(app_path="/apps/blocked.exe"):
+    return pipeline_for(BlockRule(app_path, 0, 0, True, datetime.date.today()))
+
+
+class TestScanCache(unittest.TestCase):
+
+    def test_only_new_pids_are_inspected_and_exe_is_read_once(self):
+        processes = [FakeProcess(pid, f"/usr/bin/proc{pid}") for pid in range(1, 51)]
+        cache = scan_cache.ScanCache(process_table=PsutilProcessTable())
+        pipeline = blocked_pipeline()
+
+        with patch_process_table(processes):
+            cache.find_matches(pipeline)
+        self.assertTrue(all(proc.exe_calls == 0 for proc in processes)) # Rejected by name
+
+        newcomer = FakeProcess(100, "/apps/blocked.exe")
+        lookalike = FakeProcess(101, "/home/user/blocked.exe") # Same name, different path
+        with patch_process_table(processes + [newcomer, lookalike]):
+            matches = cache.find_matches(pipeline)
+            cache.find_matches(pipeline)
+        self.assertEqual([proc for proc, rule in matches], [newcomer])
+        self.assertEqual((newcomer.exe_calls, lookalike.exe_calls), (1, 1)) # Cached after the first tick
+        self.assertEqual(cache.exe_resolutions, 2)
+
+    def test_access_denied_is_not_retried(self):
+        denied = FakeProcess(7, "/apps/blocked.exe", exe_denied=True)
+        cache = scan_cache.ScanCache(process_table=PsutilProcessTable())
+        with patch_process_table([denied]):
+            cache.find_matches(blocked_pipeline())
+            cache.find_matches(blocked_pipeline(), recheck_all=True)
+        self.assertEqual(denied.exe_calls, 1)
+        self.assertEqual(cache.access_denied, 1)
+
+    def test_exited_pids_are_evicted_and_reused_pids_reinspected(self):
+        cache = scan_cache.ScanCache(process_table=PsutilProcessTable())
+        empty = pipeline_for()
+        with patch_process_table([FakeProcess(5, "/usr/bin/old")]):
+            cache.find_matches(empty)
+        self.assertEqual(len(cache), 1)
+        with patch_process_table([]):
+            cache.find_matches(empty)
+        self.assertEqual(len(cache), 0)
+
+        reused = FakeProcess(5, "/apps/blocked.exe", create_time=2.0)
+        with patch_process_table([reused]):
+            matches = cache.find_matches(blocked_pipeline())
+        self.assertEqual(len(matches), 1)
+
+    def test_pid_reused_between_two_listings_is_reinspected(self):
+        cache = scan_cache.ScanCache(process_table=ListedProcessTable())
+        pipeline = blocked_pipeline()
+        with patch_process_table([FakeProcess(5, "/usr/bin/old")]):
+            self.assertEqual(cache.find_matches(pipeline), [])
+        # The old process exited and a target got its PID before the next poll
+        reused = FakeProcess(5, "/apps/blocked.exe", create_time=2.0)
+        with patch_process_table([reused]):
+            matches = cache.find_matches(pipeline)
+        self.assertEqual([proc for proc, rule in matches], [reused])
+
+    def test_pid_reuse_without_generations_is_caught_by_revalidation(self):
+        clock = SimulatedClock(0.0)
+        cache = scan_cache.ScanCache(process_table=PsutilProcessTable(), clock=clock)
+        pipeline = blocked_pipeline()
+        with patch_process_table([FakeProcess(5, "/usr/bin/old")]):
+            cache.find_matches(pipeline)
+        reused = FakeProcess(5, "/apps/blocked.exe", create_time=2.0)
+        with patch_process_table([reused]):
+            self.assertEqual(cache.find_matches(pipeline), [])
+            clock.monotonic_time = scan_cache.FULL_REVALIDATE_INTERVAL
+            matches = cache.find_matches(pipeline)
+        self.assertEqual([proc for proc, rule in matches], [reused])
+
+    def test_steady_state_full_refresh_reads_nothing(self):
+        for table in (ListedProcessTable(), PsutilProcessTable()):
+            cache = scan_cache.ScanCache(process_table=table)
+            with patch_process_table([FakeProcess(pid, f"/usr/bin/proc{pid}") for pid in range(1, 51)]), \
+                    mock.patch.object(table, "read", wraps=table.read) as read:
+                cache.find_matches(blocked_pipeline())
+                self.assertEqual(read.call_count, 50)
+                cache.find_matches(blocked_pipeline())
+            self.assertEqual(read.call_count, 50, type(table).__name__) # Nothing new, nothing read
+
+    def test_revalidation_during_watcher_refresh_keeps_running_matches(self):
+        clock = SimulatedClock(0.0)
+        cache = scan_cache.ScanCache(process_table=PsutilProcessTable(), clock=clock)
+        with patch_process_table([FakeProcess(1, "/apps/blocked.exe"), FakeProcess(2, "/usr/bin/other")]):
+            self.assertEqual(len(cache.find_matches(blocked_pipeline())), 1)
+            clock.monotonic_time = scan_cache.FULL_REVALIDATE_INTERVAL
+            matches = cache.find_matches(blocked_pipeline(), candidate_pids={2}) # The watcher only saw PID 2 exec
+        self.assertEqual([proc.pid for proc, rule in matches], [1])
+
+    def test_refresh_from_elsewhere_does_not_hide_a_match(self):
+        cache = scan_cache.ScanCache(process_table=PsutilProcessTable())
+        rule_set = RuleSet([BlockRule("/apps/blocked.exe", 0, 0, True, datetime.date.today())])
+        with patch_process_table([FakeProcess(1, "/apps/blocked.exe")]):
+            self.assertEqual(cache.running_targets(rule_set.pipeline), [(1, 1.0, normalize_exe_path("/apps/blocked.exe"))])
+            matches = cache.find_matches(rule_set.blocked_pipeline())
+        self.assertEqual([proc.pid for proc, rule in matches], [1])
+
+    def test_recheck_all_matches_cached_processes_without_syscalls(self):
+        target = FakeProcess(9, "/apps/blocked.exe")
+        cache = scan_cache.ScanCache(process_table=PsutilProcessTable())
+        with patch_process_table([target]):
+            self.assertEqual(cache.find_matches(pipeline_for()), [])
+            matches = cache.find_matches(blocked_pipeline(), recheck_all=True)
+            cache.find_matches(blocked_pipeline(), recheck_all=True)
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(target.exe_calls, 1)
+
+
+class TestMatchPipeline(unittest.TestCase):
+
+    def run_pipeline(self, rules, processes):
+        cache = scan_cache.ScanCache(process_table=PsutilProcessTable())
+        with patch_process_table(processes):
+            return sorted(proc.pid for proc, rule in cache.find_matches(pipeline_for(*rules)))
+
+    def test_process_name_rule_matches_any_path(self):
+        rule = BlockRule("", 0, 0, process_name="game")
+        processes = [FakeProcess(1, "/opt/game"), FakeProcess(2, "/tmp/copy/game"), FakeProcess(3, "/usr/bin/gamer")]
+        self.assertEqual(self.run_pipeline([rule], processes), [1, 2])
+        self.assertTrue(all(proc.exe_calls == 0 for proc in processes))
+
+    def test_cmdline_pattern_only_runs_after_cheaper_stages(self):
+        rule = BlockRule("/usr/bin/python3", 0, 0, cmdline_pattern=r"\bgame\.py\b")
+        game = FakeProcess(1, "/usr/bin/python3", cmdline=["python3", "/home/u/game.py"])
+        other_script = FakeProcess(2, "/usr/bin/python3", cmdline=["python3", "work.py"])
+        other_python = FakeProcess(3, "/opt/python3", cmdline=["python3", "game.py"])
+        self.assertEqual(self.run_pipeline([rule], [game, other_script, other_python]), [1])
+
+    def test_cmdline_only_rule_checks_every_process(self):
+        rule = BlockRule("", 0, 0, cmdline_pattern="--kiosk")
+        processes = [FakeProcess(1, "/usr/bin/browser", cmdline=["browser", "--kiosk"]), FakeProcess(2, "/usr/bin/browser")]
+        self.assertEqual(self.run_pipeline([rule], processes), [1])
+
+    def test_uid_stage(self):
+        rule = BlockRule("/apps/blocked.exe", 0, 0, uids=[1001])
+        processes = [FakeProcess(1, "/apps/blocked.exe", uid=1000), FakeProcess(2, "/apps/blocked.exe", uid=1001)]
+        self.assertEqual(self.run_pipeline([rule], processes), [2])
+        self.assertEqual(processes[0].exe_calls, 0) # Rejected by uid before exe was read
+
+    def test_exe_sha256_matches_renamed_copies_once_hashed(self):
+        test_dir = tempfile.mkdtemp()
+        try:
+            original = os.path.join(test_dir, "game")
+            with open(original, "wb") as f:
+                f.write(b"game binary")
+            renamed = shutil.copy(original, os.path.join(test_dir, "homework"))
+            rule = BlockRule("", 0, 0, exe_sha256=hashlib.sha256(b"game binary").hexdigest())
+            processes = [FakeProcess(1, renamed), FakeProcess(2, "/usr/bin/other")]
+            cache = scan_cache.ScanCache(process_table=PsutilProcessTable())
+            try:
+                with patch_process_table(processes):
+                    matches = cache.find_matches(pipeline_for(rule))
+                    for _ in range(500): # The first pass only queues the hash
+                        if matches or not cache.waiting_for_digests:
+                            break
+                        time.sleep(0.01)
+                        matches = cache.find_matches(pipeline_for(rule))
+            finally:
+                cache.close()
+        finally:
+            shutil.rmtree(test_dir, ignore_errors=True)
+        self.assertEqual([proc.pid for proc, rule in matches], [1])
+        self.assertFalse(cache.waiting_for_digests)
+
+    def test_path_rule_matches_under_another_name_only_if_asked_to(self):
+        processes = [
+            FakeProcess(1, "/opt/game/game-bin", name="game"), # Started as /usr/bin/game -> game-bin
+            FakeProcess(2, "/opt/game/game-bin", name="homework"), # prctl(PR_SET_NAME)
+            FakeProcess(3, "/usr/bin/game", name="game-bin")
+        ]
+        self.assertEqual(self.run_pipeline([BlockRule("/opt/game/game-bin", 0, 0)], processes), [])
+        self.assertEqual([proc.exe_calls for proc in processes], [0, 0, 1])
+        rule = BlockRule("/opt/game/game-bin", 0, 0, match_renamed=True)
+        self.assertEqual(self.run_pipeline([rule], processes), [1, 2])
+        self.assertEqual(BlockRule.from_config(rule.to_config()).match_renamed, True)
+
+    def test_truncated_comm_name_passes_the_name_stage(self):
+        rule = BlockRule("/opt/app/a-very-long-binary-name", 0, 0)
+        proc = FakeProcess(1, "/opt/app/a-very-long-binary-name", name="a-very-long-bin")
+        self.assertEqual(self.run_pipeline([rule], [proc]), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
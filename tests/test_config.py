@@ -151,46 +151,69 @@ class TestConfigManager(unittest.TestCase):
         self.assertEqual(loaded["date_block_activated"], today) # Should persist
 
 
-    @mock.patch('builtins.print')
-    @mock.patch('json.dump')
-    @mock.patch('builtins.open', new_callable=mock.mock_open)
-    @mock.patch('os.makedirs') # To check if it's called when APP_DATA_DIR might not exist
-    @mock.patch('os.path.exists') # To simulate APP_DATA_DIR not existing initially
-    def test_save_config_creates_dir_and_saves(self, mock_path_exists, mock_makedirs, mock_open_file, mock_json_dump, mock_print):
-        # Simulate APP_DATA_DIR does not exist for the first check in config.py,
-        # but then exists for the CONFIG_FILE_PATH check within save_config_to_file (if we were testing that part).
-        # For this test, we are mainly concerned with os.makedirs for APP_DATA_DIR if it's part of save.
-        # However, APP_DATA_DIR creation is at module load in config.py.
-        # So, we'll test if save_config_to_file correctly calls open and json.dump.
-        
-        # Let's assume APP_DATA_DIR (self.test_dir) is already created by setUp.
-        # We want to ensure save_config_to_file writes to config.CONFIG_FILE_PATH.
-        mock_path_exists.return_value = True # Assume directory exists for simplicity of this save test
-
+    @mock.patch('os.makedirs', wraps=os.makedirs) # To check the directory is created lazily on save
+    def test_save_config_creates_dir_and_saves(self, mock_makedirs):
         app_path = "/test/app.exe"
         end_hour = 10
         end_minute = 5
         block_activated = True
         date_activated = datetime.date(2024, 1, 1)
 
-        config.save_config_to_file(app_path, end_hour, end_minute, block_activated, date_activated)
+        config.save_config_to_file(app_path, end_hour, end_minute, block_activated, date_activated, "en")
+
+        # The app data directory is created lazily on save, not at import
+        mock_makedirs.assert_called_once_with(config.APP_DATA_DIR, exist_ok=True)
 
-        # Check if open was called correctly
-        mock_open_file.assert_called_once_with(config.CONFIG_FILE_PATH, "w")
-        
-        # Check if json.dump was called with the correct data
         expected_data = {
             "app_path": app_path,
             "end_hour": end_hour,
             "end_minute": end_minute,
             "block_activated_today": block_activated,
-            "date_block_activated": date_activated.isoformat()
+            "date_block_activated": date_activated.isoformat(),
+            "language": "en",
+            "terminate_grace_period": config.DEFAULT_TERMINATE_GRACE_PERIOD,
+            "fsync_policy": config.DEFAULT_FSYNC_POLICY,
+            "scanner_backend": config.DEFAULT_SCANNER_BACKEND,
+            "profiling": config.DEFAULT_PROFILING,
+            "rules": [{
+                "app_path": app_path,
+                "end_hour": end_hour,
+                "end_minute": end_minute,
+                "block_activated_today": block_activated,
+                "date_block_activated": date_activated.isoformat()
+            }]
         }
-        mock_json_dump.assert_called_once_with(expected_data, mock_open_file(), indent=4)
-        # The print statement in config.py was commented out, so we don't check for it.
-        # If it were active, the check would be:
-        # mock_print.assert_any_call(f"Configuration saved to {config.CONFIG_FILE_PATH}")
+        with open(config.CONFIG_FILE_PATH, "r") as f:
+            self.assertEqual(json.load(f), expected_data)
+        # The temp file was renamed over the config file, nothing is left behind
+        self.assertEqual(os.listdir(self.test_dir), [os.path.basename(config.CONFIG_FILE_PATH)])
+
+    @mock.patch('builtins.print')
+    def test_save_config_failure_keeps_previous_file(self, mock_print):
+        config.save_config_to_file("/old/app.exe", 9, 0, False, None, "en")
+
+        with mock.patch('json.dump', side_effect=OSError("disk full")):
+            config.save_config_to_file("/new/app.exe", 10, 0, False, None, "en")
+
+        # A failed write must not truncate or replace the existing config
+        self.assertEqual(config.load_config_from_file()["app_path"], "/old/app.exe")
+        self.assertEqual(os.listdir(self.test_dir), [os.path.basename(config.CONFIG_FILE_PATH)])
+        mock_print.assert_any_call(f"Error saving config to {config.CONFIG_FILE_PATH}: disk full")
+
+    @mock.patch('os.fsync')
+    def test_save_config_fsync_policy(self, mock_fsync):
+        config.save_config_to_file("/test/app.exe", 10, 0, False, None, "en", fsync_policy="never")
+        mock_fsync.assert_not_called()
+
+        config.save_config_to_file("/test/app.exe", 10, 0, False, None, "en", fsync_policy="file")
+        self.assertEqual(mock_fsync.call_count, 1)
+        self.assertEqual(config.load_config_from_file()["fsync_policy"], "file")
 
+    def test_scanner_backend_round_trip_and_validation(self):
+        config.save_config_to_file("/test/app.exe", 10, 0, False, None, "en", scanner_backend="psutil")
+        self.assertEqual(config.load_config_from_file()["scanner_backend"], "psutil")
+        self.assertEqual(config.config_values_from_data({"scanner_backend": "kvm"})["scanner_backend"],
+                         config.DEFAULT_SCANNER_BACKEND)
 
     @mock.patch('builtins.print')
     def test_load_config_malformed_date_string(self, mock_print):
@@ -210,6 +233,113 @@ class TestConfigManager(unittest.TestCase):
         self.assertEqual(loaded["block_activated_today"], False) # Should reset due to malformed date
         self.assertIsNone(loaded["date_block_activated"])      # Should reset
 
+    def test_load_config_migrates_legacy_target_to_rule(self):
+        sample_config_data = {
+            "app_path": "/path/to/app.exe",
+            "end_hour": 18,
+            "end_minute": 30
+        }
+        with open(config.CONFIG_FILE_PATH, 'w') as f:
+            json.dump(sample_config_data, f)
+
+        loaded = config.load_config_from_file()
+
+        self.assertEqual(len(loaded["rules"]), 1)
+        self.assertEqual(loaded["rules"][0]["app_path"], "/path/to/app.exe")
+        self.assertEqual(loaded["rules"][0]["end_hour"], 18)
+        self.assertEqual(loaded["rules"][0]["end_minute"], 30)
+
+    def test_rules_round_trip_with_per_rule_block_state(self):
+        today = datetime.date.today()
+        rules = [
+            {"app_path": "/a.exe", "end_hour": 9, "end_minute": 0, "block_activated_today": True, "date_block_activated": today},
+            {"app_path": "/b.exe", "end_hour": 22, "end_minute": 15, "block_activated_today": False, "date_block_activated": None},
+            {"app_path": "/c.exe", "end_hour": 9, "end_minute": 0, "block_activated_today": True, "date_block_activated": datetime.date(2000, 1, 1)}
+        ]
+        config.save_config_to_file("/a.exe", 9, 0, True, today, "en", rules)
+
+        loaded = config.load_config_from_file()
+
+        self.assertEqual([rule["app_path"] for rule in loaded["rules"]], ["/a.exe", "/b.exe", "/c.exe"])
+        self.assertEqual(loaded["rules"][0]["date_block_activated"], today)
+        self.assertEqual(loaded["rules"][1]["end_minute"], 15)
+        self.assertFalse(loaded["rules"][2]["block_activated_today"]) # Past date resets per rule
+
+    @mock.patch('builtins.print')
+    def test_schedule_and_overnight_block_round_trip(self, mock_print):
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        blocked_until = datetime.datetime.now().replace(microsecond=0) + datetime.timedelta(hours=1)
+        rules = [
+            {"app_path": "/a.exe", "end_hour": 17, "end_minute": 0, "schedule": {"fri": ["20:00-08:00"]},
+             "block_activated_today": True, "date_block_activated": yesterday, "blocked_until": blocked_until},
+            {"app_path": "/b.exe", "end_hour": 17, "end_minute": 0, "schedule": {"fri": ["8 pm"]}}
+        ]
+        config.save_config_to_file("", 17, 0, False, None, "en", rules)
+
+        loaded = config.load_config_from_file()
+
+        self.assertEqual(len(loaded["rules"]), 1)
+        rule = loaded["rules"][0]
+        self.assertEqual(rule["schedule"], {"fri": ["20:00-08:00"]})
+        # Activated yesterday, still active: the window runs past midnight
+        self.assertEqual((rule["block_activated_today"], rule["date_block_activated"], rule["blocked_until"]),
+                         (True, yesterday, blocked_until))
+
+    @mock.patch('builtins.print')
+    def test_rules_with_matcher_fields(self, mock_print):
+        rules = [
+            {"process_name": "game", "uids": ["1000"], "end_hour": 9, "end_minute": 0},
+            {"app_path": "/usr/bin/python3", "cmdline_pattern": "game\\.py", "end_hour": 9, "end_minute": 0},
+            {"cmdline_pattern": "([unclosed", "end_hour": 9, "end_minute": 0},
+            {"end_hour": 9, "end_minute": 0}, # Matches nothing
+            {"uids": [0], "end_hour": 9, "end_minute": 0}, # Would match every process of the user
+            {"exe_sha256": "AB" * 32, "end_hour": 9, "end_minute": 0},
+            {"exe_sha256": "not a digest", "end_hour": 9, "end_minute": 0},
+            {"app_path": "/opt/game/game-bin", "match_renamed": True, "end_hour": 9, "end_minute": 0},
+            {"app_path": "/opt/game/other-bin", "match_renamed": "yes", "end_hour": 9, "end_minute": 0}
+        ]
+        with open(config.CONFIG_FILE_PATH, 'w') as f:
+            json.dump({"rules": rules}, f)
+
+        loaded = config.load_config_from_file()
+
+        self.assertEqual(len(loaded["rules"]), 4)
+        self.assertEqual((loaded["rules"][0]["app_path"], loaded["rules"][0]["process_name"], loaded["rules"][0]["uids"]), ("", "game", [1000]))
+        self.assertEqual(loaded["rules"][1]["cmdline_pattern"], "game\\.py")
+        self.assertEqual(loaded["rules"][2]["exe_sha256"], "ab" * 32)
+        self.assertIn("([unclosed", mock_print.call_args_list[0][0][0])
+        self.assertIn("not a digest", mock_print.call_args_list[1][0][0])
+        self.assertTrue(loaded["rules"][3]["match_renamed"])
+        self.assertIn("other-bin", mock_print.call_args_list[2][0][0])
+
+    @mock.patch('builtins.print')
+    def test_malformed_rule_is_dropped_and_the_others_kept(self, mock_print):
+        rules = [
+            {"app_path": "/apps/a.exe", "end_hour": "17:00", "end_minute": 0},
+            {"app_path": "/apps/b.exe", "end_hour": 25, "end_minute": 0},
+            {"app_path": 5, "end_hour": 9, "end_minute": 0},
+            {"app_path": "/apps/c.exe", "end_hour": "9", "end_minute": 30}
+        ]
+        with open(config.CONFIG_FILE_PATH, 'w') as f:
+            json.dump({"rules": rules, "language": "ar"}, f)
+
+        loaded = config.load_config_from_file()
+
+        self.assertEqual(loaded["language"], "ar") # Not the defaults
+        self.assertEqual([(rule["app_path"], rule["end_hour"], rule["end_minute"]) for rule in loaded["rules"]],
+                         [("/apps/c.exe", 9, 30)])
+        self.assertEqual(mock_print.call_count, 3)
+
+    def test_file_lock_gives_up_on_windows(self):
+        msvcrt = mock.Mock(LK_LOCK=2, LK_UNLCK=0)
+        msvcrt.locking.side_effect = OSError(36, "Resource deadlock avoided") # Held by another process
+        lock_path = config.CONFIG_FILE_PATH + ".lock"
+        with mock.patch.object(config.os, "name", "nt"), mock.patch.dict(sys.modules, {"msvcrt": msvcrt}):
+            with self.assertRaises(OSError):
+                with config.file_lock(lock_path):
+                    self.fail("Entered without the lock")
+        self.assertEqual(msvcrt.locking.call_count, config.FILE_LOCK_ATTEMPTS)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from unittest import mock
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import config
+from app_blocker.config_store import ConfigStore, ConfigWriter
+
+
+class TestConfigWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_paths = (config.APP_DATA_DIR, config.CONFIG_FILE_PATH)
+        config.APP_DATA_DIR = self.test_dir
+        config.CONFIG_FILE_PATH = os.path.join(self.test_dir, "test_config.json")
+
+    def tearDown(self):
+        config.APP_DATA_DIR, config.CONFIG_FILE_PATH = self.original_paths
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _read_config(self):
+        with open(config.CONFIG_FILE_PATH, "r") as f:
+            return json.load(f)
+
+    def test_burst_of_saves_is_written_once(self):
+        writer = ConfigWriter(coalesce_delay=0.2)
+        try:
+            for minute in range(10):
+                writer.save("/test/app.exe", 17, minute, False, None, "en")
+            self.assertTrue(writer.flush(timeout=5))
+            self.assertEqual(writer.writes, 1)
+            self.assertEqual(self._read_config()["end_minute"], 9) # The latest snapshot wins
+        finally:
+            writer.close()
+
+    def test_close_writes_pending_save_without_waiting(self):
+        writer = ConfigWriter(coalesce_delay=60)
+        writer.save("/test/app.exe", 8, 30, False, None, "en")
+        writer.close(timeout=5)
+
+        self.assertEqual(writer.writes, 1)
+        self.assertEqual(self._read_config()["end_hour"], 8)
+
+    def test_write_error_is_logged(self):
+        log = mock.Mock()
+        writer = ConfigWriter(coalesce_delay=0, log_error_func=log)
+        try:
+            with mock.patch('app_blocker.config.write_config_atomically', side_effect=OSError("disk full")):
+                writer.save("/test/app.exe", 8, 30, False, None, "en")
+                self.assertTrue(writer.flush(timeout=5))
+        finally:
+            writer.close()
+
+        self.assertEqual(writer.writes, 0)
+        log.assert_called_once_with(f"Error saving config to {config.CONFIG_FILE_PATH}: disk full")
+
+
+class TestConfigStore(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_paths = (config.APP_DATA_DIR, config.CONFIG_FILE_PATH)
+        config.APP_DATA_DIR = self.test_dir
+        config.CONFIG_FILE_PATH = os.path.join(self.test_dir, "test_config.json")
+
+    def tearDown(self):
+        config.APP_DATA_DIR, config.CONFIG_FILE_PATH = self.original_paths
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_unchanged_file_is_parsed_once(self):
+        config.save_config_to_file("/test/app.exe", 17, 0, False, None, "en")
+        store = ConfigStore()
+        for _ in range(5):
+            self.assertEqual(store.get()["app_path"], "/test/app.exe")
+        self.assertEqual(store.loads, 1)
+
+    def test_saved_change_notifies_subscribers(self):
+        config.save_config_to_file("/test/app.exe", 17, 0, False, None, "en")
+        store = ConfigStore()
+        store.get()
+        received = []
+        store.subscribe(received.append)
+
+        self.assertFalse(store.poll())
+        config.save_config_to_file("/test/app.exe", 18, 30, False, None, "en")
+        self.assertTrue(store.poll())
+
+        self.assertEqual([(values["end_hour"], values["end_minute"]) for values in received], [(18, 30)])
+
+    def test_broken_or_missing_file_keeps_previous_values(self):
+        config.save_config_to_file("/test/app.exe", 17, 0, False, None, "en")
+        log = mock.Mock()
+        store = ConfigStore(log_error_func=log)
+        store.get()
+
+        with open(config.CONFIG_FILE_PATH, "w") as f:
+            f.write("{ half written")
+        self.assertFalse(store.poll())
+        self.assertEqual(store.get()["app_path"], "/test/app.exe")
+        log.assert_called_once()
+
+        os.remove(config.CONFIG_FILE_PATH)
+        self.assertFalse(store.poll())
+        self.assertEqual(store.get()["app_path"], "/test/app.exe")
+
+    def test_missing_file_returns_defaults(self):
+        self.assertEqual(ConfigStore().get(), config.default_config_values())
+
+
+if __name__ == '__main__':
+    unittest.main()
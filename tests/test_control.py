@@ -0,0 +1,180 @@
+import unittest
+import datetime
+import json
+import os
+import shutil
+import socket
+import stat
+import sys
+import tempfile
+import threading
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import config, control, daemon
+from app_blocker.control import ControlServer, call, rules_snapshot
+from app_blocker.rules import BlockRule, RuleSet
+
+
+class Client:
+    """A raw line-oriented connection to the control socket."""
+
+    def __init__(self, socket_path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(5)
+        self.sock.connect(socket_path)
+        self.lines = self.sock.makefile("rb")
+
+    def send(self, message):
+        self.sock.sendall(message if isinstance(message, bytes) else control.encode_message(message))
+
+    def receive(self):
+        return json.loads(self.lines.readline())
+
+    def request(self, method, params=None, request_id=1):
+        self.send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}})
+        return self.receive()
+
+    def close(self):
+        self.lines.close()
+        self.sock.close()
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "No Unix domain sockets")
+class TestControlServer(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.test_dir, "control.sock")
+        self.monitoring = False
+        self.server = ControlServer(self.socket_path, self.start_monitoring, self.stop_monitoring)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def start_monitoring(self):
+        started, self.monitoring = not self.monitoring, True
+        return started
+
+    def stop_monitoring(self):
+        stopped, self.monitoring = self.monitoring, False
+        return stopped
+
+    def connect(self):
+        client = Client(self.socket_path)
+        self.addCleanup(client.close)
+        return client
+
+    def test_status_and_rules_come_from_the_snapshot(self):
+        rule_set = RuleSet([BlockRule("/apps/a.exe", 9, 0, True, datetime.date.today()), BlockRule("/apps/b.exe", 10, 0)])
+        self.server.update_status(monitoring=True, rules=rules_snapshot(rule_set))
+        status = call(self.socket_path, "status")
+        self.assertTrue(status["monitoring"])
+        self.assertEqual(status["blocked"], [rule_set.rules[0].key])
+        self.assertEqual([rule["app_path"] for rule in call(self.socket_path, "rules")], ["/apps/a.exe", "/apps/b.exe"])
+        self.assertEqual(stat.S_IMODE(os.stat(self.socket_path).st_mode), 0o600)
+
+    def test_start_and_stop_monitoring(self):
+        self.assertTrue(call(self.socket_path, "start_monitoring"))
+        self.assertFalse(call(self.socket_path, "start_monitoring"))
+        self.assertTrue(call(self.socket_path, "stop_monitoring"))
+        self.assertFalse(self.monitoring)
+
+    def test_errors_follow_json_rpc(self):
+        client = self.connect()
+        self.assertEqual(client.request("no_such_method")["error"]["code"], control.METHOD_NOT_FOUND)
+        self.assertEqual(client.request("subscribe", {"topics": ["weather"]})["error"]["code"], control.INVALID_PARAMS)
+        client.send(b"{not json\n")
+        self.assertEqual(client.receive()["error"]["code"], control.PARSE_ERROR)
+        # A batch gets one reply per request; notifications (no id) get none
+        client.send([{"jsonrpc": "2.0", "id": 1, "method": "status"}, {"jsonrpc": "2.0", "method": "status"},
+                     {"jsonrpc": "2.0", "id": 2, "method": "rules"}])
+        self.assertEqual([reply["id"] for reply in client.receive()], [1, 2])
+
+    def test_subscribers_receive_log_and_status_notifications(self):
+        subscriber = self.connect()
+        self.assertEqual(subscriber.request("subscribe", {"topics": ["log", "status"]})["result"], ["log", "status"])
+        log_only = self.connect()
+        log_only.request("subscribe", {"topics": ["log"]})
+
+        self.server.publish("log", {"message": "Blocking a.exe.", "level": "INFO"})
+        self.server.update_status(monitoring=True)
+        self.assertEqual(subscriber.receive()["params"]["message"], "Blocking a.exe.")
+        self.assertTrue(subscriber.receive()["params"]["monitoring"])
+        self.assertEqual(log_only.receive()["method"], "log")
+        # Requests still work on a subscribed connection
+        self.assertTrue(log_only.request("status", request_id=7)["result"]["monitoring"])
+
+    def test_many_concurrent_clients(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(call(self.socket_path, "status"))) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 50)
+
+    def test_slow_subscriber_drops_oldest_notifications(self):
+        subscriber = control._Subscriber(max_queued=2)
+        for number in range(5):
+            subscriber.offer(number)
+        self.assertEqual((subscriber.queue.get_nowait(), subscriber.queue.get_nowait(), subscriber.dropped), (3, 4, 3))
+
+    def test_stale_socket_is_replaced_but_a_live_one_is_not(self):
+        with self.assertRaises(OSError):
+            ControlServer(self.socket_path).start()
+        self.server.close()
+        open(self.socket_path, "w").close() # Left behind by a crash
+        self.server = ControlServer(self.socket_path)
+        self.server.start()
+        self.assertFalse(call(self.socket_path, "status")["monitoring"])
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "No Unix domain sockets")
+class TestDaemonControl(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_paths = (config.APP_DATA_DIR, config.CONFIG_FILE_PATH)
+        config.APP_DATA_DIR = self.test_dir
+        config.CONFIG_FILE_PATH = os.path.join(self.test_dir, "test_config.json")
+        config.save_config_to_file("/apps/not_running.exe", 23, 59, False, None, "en")
+
+    def tearDown(self):
+        config.APP_DATA_DIR, config.CONFIG_FILE_PATH = self.original_paths
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_daemon_keeps_running_while_monitoring_is_stopped(self):
+        socket_path = os.path.join(self.test_dir, "control.sock")
+        stop_event = threading.Event()
+        exit_status = []
+        thread = threading.Thread(target=lambda: exit_status.append(
+            daemon.run(stop_event, track_usage=False, control_socket=socket_path)))
+        with self.assertLogs("app_blocker.daemon", level="INFO"):
+            thread.start()
+            try:
+                for _ in range(100):
+                    if os.path.exists(socket_path) and call(socket_path, "status")["monitoring"]:
+                        break
+                    stop_event.wait(0.05)
+                self.assertEqual([rule["app_path"] for rule in call(socket_path, "rules")], ["/apps/not_running.exe"])
+                self.assertTrue(call(socket_path, "stop_monitoring"))
+                for _ in range(100):
+                    if not call(socket_path, "status")["monitoring"]:
+                        break
+                    stop_event.wait(0.05)
+                self.assertTrue(thread.is_alive())
+                self.assertTrue(call(socket_path, "start_monitoring"))
+                self.assertTrue(call(socket_path, "status")["monitoring"])
+            finally:
+                stop_event.set()
+                thread.join(timeout=10)
+        self.assertEqual(exit_status, [0])
+        self.assertFalse(os.path.exists(socket_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
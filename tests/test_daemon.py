@@ -0,0 +1,51 @@
+import unittest
+from unittest import mock
+import os
+import sys
+import subprocess
+import threading
+import datetime
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import daemon
+from app_blocker.rules import BlockRule, RuleSet
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestDaemon(unittest.TestCase):
+
+    def test_import_does_not_pull_in_gui(self):
+        code = ("import sys, app_blocker.daemon; "
+                "print(sorted(m for m in sys.modules if m == 'wx' or m.startswith(('wx.', 'app_blocker.gui', 'app_blocker.main'))))")
+        output = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.strip(), "[]")
+
+    @mock.patch('app_blocker.daemon.ConfigStore.get')
+    def test_run_without_rules_fails(self, mock_get):
+        mock_get.return_value = {"rules": []}
+        with self.assertLogs("app_blocker.daemon", level="ERROR"):
+            self.assertEqual(daemon.run(threading.Event()), 1)
+
+    def test_save_rule_states_mirrors_primary_target(self):
+        today = datetime.date.today()
+        config_values = {
+            "app_path": "/apps/a.exe", "end_hour": 9, "end_minute": 0,
+            "block_activated_today": False, "date_block_activated": None,
+            "language": "en", "terminate_grace_period": 1.0, "fsync_policy": "always", "scanner_backend": "auto", "profiling": False,
+            "rules": []
+        }
+        rule_set = RuleSet([BlockRule("/apps/a.exe", 9, 0, True, today), BlockRule("/apps/b.exe", 10, 0)])
+
+        config_writer = mock.Mock()
+        daemon._save_rule_states(config_writer, config_values, rule_set)
+
+        args = config_writer.save.call_args[0]
+        self.assertEqual(args[3:5], (True, today))
+        self.assertEqual(len(args[6]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
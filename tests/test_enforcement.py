@@ -0,0 +1,222 @@
+import unittest
+from unittest import mock
+import datetime
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import psutil
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import config, enforcement
+from app_blocker.enforcement import CpuLimit, EnforcementAction, EnforcementPlan, Enforcer, RuleCgroup
+from app_blocker.rules import BlockRule, RuleSet
+from app_blocker.simulation import Simulation
+
+MONDAY = datetime.datetime(2024, 5, 6)
+GRADUAL = [
+    {"action": "freeze", "after": 0, "method": "signal"},
+    {"action": "deprioritize", "after": -600},
+    {"action": "terminate", "after": 1800}
+]
+
+
+class TestEnforcementPlan(unittest.TestCase):
+
+    def test_steps_are_sorted_and_looked_up_by_offset(self):
+        plan = EnforcementPlan.from_config(GRADUAL)
+        self.assertEqual([step.action.name for step in plan.steps], ["deprioritize", "freeze", "terminate"])
+        self.assertEqual(plan.lead_time, 600)
+        self.assertIsNone(plan.step_index(-601))
+        self.assertEqual([plan.step_index(elapsed) for elapsed in (-600, 0, 1799, 1800, 86400)], [0, 1, 1, 2, 2])
+
+    def test_malformed_plans_are_rejected(self):
+        for plan_values in ([], [{"action": "explode"}], [{"action": "cpu_limit", "cpu_percent": 0}],
+                            [{"action": "terminate", "after": 0}, {"action": "freeze", "after": 60}],
+                            [{"action": "freeze", "method": "ice"}], {"action": "freeze"}):
+            with self.assertRaises(ValueError):
+                EnforcementPlan.from_config(plan_values)
+
+    def test_rule_round_trips_its_plan_and_invalid_plans_are_dropped(self):
+        rule = BlockRule("/apps/game.exe", 21, 0, enforcement=GRADUAL)
+        self.assertEqual(BlockRule.from_config(rule.to_config()).enforcement.offsets, [-600, 0, 1800])
+        self.assertNotIn("enforcement", BlockRule("/apps/game.exe", 21, 0).to_config())
+        rules = config._parse_rules([{"app_path": "/apps/a.exe", "enforcement": GRADUAL},
+                                     {"app_path": "/apps/b.exe", "enforcement": [{"action": "explode"}]}])
+        self.assertEqual([rule["app_path"] for rule in rules], ["/apps/a.exe"])
+
+    def test_due_steps_and_next_step_time(self):
+        rule = BlockRule("/apps/game.exe", 21, 0, enforcement=GRADUAL)
+        rule_set = RuleSet([rule, BlockRule("/apps/other.exe", 22, 0)])
+        enforcer = Enforcer()
+        at = lambda hour, minute=0: MONDAY + datetime.timedelta(hours=hour, minutes=minute)
+        self.assertEqual(enforcer.due_steps(rule_set, at(20, 49)), {})
+        self.assertEqual(enforcer.next_step_time(rule_set, at(20, 49)), at(20, 50))
+        self.assertEqual(enforcer.due_steps(rule_set, at(20, 50)), {rule.key: (rule, 0)})
+        rule.activate_block(at(24), MONDAY.date())
+        self.assertEqual(enforcer.due_steps(rule_set, at(21, 10)), {rule.key: (rule, 1)})
+        self.assertEqual(enforcer.next_step_time(rule_set, at(21, 10)), at(21, 30))
+
+
+class RecordedAction(EnforcementAction):
+    """Records what it is asked to do, on the simulation's clock."""
+    name = "record"
+    description = "recorded"
+    simulation = None
+    calls = []
+
+    def apply(self, proc, rule):
+        self.calls.append(("apply", proc.pid, self.simulation.clock.now()))
+        return "token"
+
+    def undo(self, proc, rule, token):
+        self.calls.append(("undo", proc.pid, self.simulation.clock.now()))
+
+
+class TestGraduatedEnforcementInTheMonitor(unittest.TestCase):
+    GAME = "/apps/game.exe"
+
+    def setUp(self):
+        patcher = mock.patch.dict(enforcement.ENFORCEMENT_ACTIONS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        enforcement.register_action(RecordedAction)
+        self.simulation = RecordedAction.simulation = Simulation(MONDAY, tz="UTC")
+        RecordedAction.calls = []
+
+    def at(self, hour, minute=0):
+        return MONDAY + datetime.timedelta(hours=hour, minutes=minute)
+
+    def test_steps_run_on_time_and_are_undone_when_the_block_ends(self):
+        plan = [{"action": "record", "after": -600}, {"action": "terminate", "after": 1800}]
+        self.simulation.launch(self.at(18), self.GAME)
+        self.simulation.launch(self.at(20, 55), self.GAME) # During the approach
+        self.simulation.launch(self.at(21, 40), self.GAME) # After the grace period
+        self.simulation.run(RuleSet([BlockRule(self.GAME, 21, 0, enforcement=plan)]), until=self.at(23))
+        self.assertEqual(RecordedAction.calls, [
+            ("apply", 1000, self.at(20, 50)), ("apply", 1001, self.at(20, 55)),
+            ("undo", 1000, self.at(21, 30)), ("undo", 1001, self.at(21, 30)) # Undone before terminate
+        ])
+        self.assertEqual([(termination.pid, termination.time) for termination in self.simulation.terminations],
+                         [(1000, self.at(21, 30)), (1001, self.at(21, 30)), (1002, self.at(21, 40))])
+
+    def test_plan_without_terminate_is_undone_at_the_end_of_the_window(self):
+        plan = [{"action": "record", "after": 0}]
+        self.simulation.launch(self.at(19), self.GAME)
+        self.simulation.run(RuleSet([BlockRule(self.GAME, 23, 59, schedule={"mon": ["21:00-22:00"]}, enforcement=plan)]),
+                            until=self.at(23))
+        self.assertEqual(RecordedAction.calls, [("apply", 1000, self.at(21)), ("undo", 1000, self.at(22))])
+        self.assertEqual(self.simulation.terminations, [])
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "Needs Linux")
+class TestActionsOnRealProcesses(unittest.TestCase):
+
+    def setUp(self):
+        self.child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+        self.proc = psutil.Process(self.child.pid)
+        self.rule = BlockRule("/apps/game.exe", 21, 0, enforcement=GRADUAL)
+
+    def tearDown(self):
+        self.child.kill()
+        self.child.wait()
+
+    def stopped(self, expected):
+        """Whether the child is stopped, waiting a moment for it to become `expected`; signals take a moment to land."""
+        deadline = time.monotonic() + 5
+        while (self.proc.status() == psutil.STATUS_STOPPED) != expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.proc.status() == psutil.STATUS_STOPPED
+
+    def test_deprioritize_and_freeze_then_restore(self):
+        enforcer = Enforcer()
+        log = []
+        original_nice = self.proc.nice()
+        self.rule.activate_block(MONDAY + datetime.timedelta(days=1), MONDAY.date())
+        to_terminate, applied = enforcer.enforce([(self.proc, self.rule)], {self.rule.key: (self.rule, 1)}, log.append)
+        self.assertEqual((to_terminate, applied), ([], 2))
+        self.assertEqual(self.proc.nice(), 19)
+        self.assertTrue(self.stopped(True))
+        enforcer.release(log.append)
+        self.assertFalse(self.stopped(False))
+        if os.geteuid() == 0: # Raising the priority back needs privileges
+            self.assertEqual(self.proc.nice(), original_nice)
+        self.assertIn("game.exe (PID: %d): frozen." % self.proc.pid, log)
+
+    def test_terminate_step_thaws_first(self):
+        enforcer = Enforcer()
+        due = {self.rule.key: (self.rule, 1)}
+        enforcer.enforce([(self.proc, self.rule)], due, lambda message: None)
+        to_terminate, _applied = enforcer.enforce([(self.proc, self.rule)], {self.rule.key: (self.rule, 2)}, lambda message: None)
+        self.assertEqual(to_terminate, [(self.proc, self.rule)])
+        self.assertFalse(self.stopped(False))
+        self.assertEqual(len(enforcer), 0)
+
+    def test_cpu_limit_writes_the_cgroup_files(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        for file_name, contents in (("cgroup.controllers", "cpu memory"), ("cgroup.subtree_control", ""), ("cgroup.procs", "")):
+            with open(os.path.join(root, file_name), "w") as f:
+                f.write(contents)
+        with mock.patch.object(enforcement, "CGROUP_ROOT", root):
+            group = RuleCgroup(self.rule)
+            os.makedirs(os.path.dirname(group.path))
+            with open(os.path.join(os.path.dirname(group.path), "cgroup.subtree_control"), "w") as f:
+                f.write("")
+            action = CpuLimit({"cpu_percent": 25})
+            token = action.apply(self.proc, self.rule)
+            with open(os.path.join(group.path, "cpu.max")) as f:
+                self.assertEqual(f.read(), "25000 100000")
+            with open(os.path.join(group.path, "cgroup.procs")) as f:
+                self.assertEqual(f.read(), str(self.proc.pid))
+            with open(os.path.join(root, "cgroup.subtree_control")) as f:
+                self.assertEqual(f.read(), "+cpu")
+            os.makedirs(os.path.join(root, token.lstrip("/")), exist_ok=True) # Where the process came from
+            action.undo(self.proc, self.rule, token)
+            with open(os.path.join(root, token.lstrip("/"), "cgroup.procs")) as f:
+                self.assertEqual(f.read(), str(self.proc.pid))
+
+    def test_cgroup_freeze_of_one_target_outlives_another_exiting(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        other_child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+        other = psutil.Process(other_child.pid)
+        rule = BlockRule("/apps/game.exe", 21, 0, enforcement=[{"action": "freeze", "after": 0, "method": "cgroup"}])
+        due = {rule.key: (rule, 0)}
+        enforcer = Enforcer()
+
+        def freeze_state(pid):
+            with open(os.path.join(RuleCgroup(rule, pid).path, "cgroup.freeze")) as f:
+                return f.read()
+
+        with mock.patch.object(enforcement, "CGROUP_ROOT", root):
+            _to_terminate, applied = enforcer.enforce([(self.proc, rule), (other, rule)], due, lambda message: None)
+            self.assertEqual(applied, 2)
+            for proc in (self.proc, other):
+                with open(f"/proc/{proc.pid}/cgroup") as f:
+                    original = [line[3:].strip() for line in f if line.startswith("0::")][0]
+                os.makedirs(os.path.join(root, original.lstrip("/")), exist_ok=True) # Where the process came from
+            other_child.kill()
+            other_child.wait()
+            enforcer.enforce([(self.proc, rule)], due, lambda message: None)
+            self.assertEqual(freeze_state(other.pid), "0")
+            self.assertEqual(freeze_state(self.proc.pid), "1") # Still frozen
+            self.assertEqual(len(enforcer), 1)
+
+    def test_missing_controller_is_an_os_error(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        with open(os.path.join(root, "cgroup.controllers"), "w") as f:
+            f.write("memory")
+        with mock.patch.object(enforcement, "CGROUP_ROOT", root):
+            with self.assertRaises(OSError):
+                CpuLimit({}).apply(self.proc, self.rule)
+
+
+if __name__ == '__main__':
+    unittest.main()
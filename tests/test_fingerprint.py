@@ -0,0 +1,65 @@
+import unittest
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker.fingerprint import PENDING, FingerprintCache, hash_file
+
+
+def wait_for_digest(cache, path, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        digest = cache.lookup(path)
+        if digest is not PENDING:
+            return digest
+        time.sleep(0.01)
+    raise AssertionError(f"{path} was not hashed within {timeout} s")
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def write(self, name, data):
+        path = os.path.join(self.test_dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_hash_file_matches_hashlib_across_chunks(self):
+        data = os.urandom(3 * 1024 + 17)
+        path = self.write("app", data)
+        self.assertEqual(hash_file(path, chunk_size=1024)[1], hashlib.sha256(data).hexdigest())
+        self.assertEqual(hash_file(self.write("empty", b""))[1], hashlib.sha256(b"").hexdigest())
+
+    def test_each_file_is_hashed_once_until_it_changes(self):
+        path = self.write("app", b"version 1")
+        cache = FingerprintCache()
+        try:
+            self.assertEqual(cache.lookup(path), PENDING)
+            self.assertEqual(wait_for_digest(cache, path), hashlib.sha256(b"version 1").hexdigest())
+            copy = shutil.copy(path, os.path.join(self.test_dir, "renamed"))
+            self.assertEqual(wait_for_digest(cache, copy), hashlib.sha256(b"version 1").hexdigest())
+            cache.lookup(path)
+            self.assertEqual(cache.hashed, 2) # The copy is another inode; the original is cached
+
+            os.utime(path, ns=(0, 0)) # Same content, new mtime: hashed again
+            self.assertEqual(wait_for_digest(cache, path), hashlib.sha256(b"version 1").hexdigest())
+            self.assertEqual(cache.hashed, 3)
+            self.assertIsNone(cache.lookup(os.path.join(self.test_dir, "missing")))
+        finally:
+            cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
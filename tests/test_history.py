@@ -0,0 +1,103 @@
+import unittest
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import config, history
+from app_blocker.history import BLOCK_ACTIVATED, KILLED, TERMINATED, EventLog, HistoryEvent, HistoryIndex
+
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_app_data_dir = config.APP_DATA_DIR
+        config.APP_DATA_DIR = self.test_dir
+        self.event_log = EventLog()
+
+    def tearDown(self):
+        config.APP_DATA_DIR = self.original_app_data_dir
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_round_trip_ignores_torn_record(self):
+        self.event_log.append([(100.0, "/apps/a.exe", BLOCK_ACTIVATED, 0), (101.5, "/apps/b.exe", KILLED, 4242)])
+        with open(self.event_log.path, "ab") as f:
+            f.write(b"\x01\x02\x03") # Crash mid-append
+        index = HistoryIndex(EventLog())
+        self.assertEqual(index.refresh(), 2)
+        self.assertEqual([index.row(row) for row in index.query()], [
+            HistoryEvent(101.5, "/apps/b.exe", "killed", 4242),
+            HistoryEvent(100.0, "/apps/a.exe", "block_activated", 0)
+        ])
+
+    def test_two_writers_agree_on_app_ids(self):
+        daemon = EventLog() # Running next to the window's self.event_log
+        self.event_log.append([(1.0, "/apps/a.exe", TERMINATED, 1)])
+        daemon.append([(2.0, "/apps/b.exe", TERMINATED, 2), (3.0, "/apps/a.exe", TERMINATED, 3)])
+        self.event_log.append([(4.0, "/apps/b.exe", TERMINATED, 4)])
+        index = HistoryIndex(EventLog())
+        index.refresh()
+        self.assertEqual([index.row(row).pid for row in index.query("/apps/a.exe")], [3, 1])
+        self.assertEqual([index.row(row).pid for row in index.query("/apps/b.exe")], [4, 2])
+
+    def test_query_by_app_and_time_range(self):
+        self.event_log.append([(float(t), "/apps/a.exe" if t % 3 else "/apps/b.exe", TERMINATED, t) for t in range(100)])
+        index = HistoryIndex(self.event_log)
+        index.refresh()
+        self.assertEqual(list(index.query(None, 10.0, 13.0)), [12, 11, 10])
+        self.assertEqual([index.row(row).pid for row in index.query("/apps/b.exe", 10.0, 20.0)], [18, 15, 12])
+        self.assertEqual([index.row(row).pid for row in index.query("/apps/a.exe", end=3.0)], [2, 1])
+        self.assertEqual(len(index.query("/apps/unknown.exe")), 0)
+
+    def test_refresh_appends_and_keeps_app_rows_current(self):
+        index = HistoryIndex(self.event_log)
+        self.event_log.append([(1.0, "/apps/a.exe", TERMINATED, 1)])
+        index.refresh()
+        self.assertEqual(len(index.query("/apps/a.exe")), 1) # Builds the per-app rows
+        self.event_log.append([(2.0, "/apps/b.exe", TERMINATED, 2), (3.0, "/apps/a.exe", TERMINATED, 3)])
+        self.assertEqual(index.refresh(), 2)
+        self.assertEqual(index.refresh(), 0)
+        self.assertEqual([index.row(row).pid for row in index.query("/apps/a.exe")], [3, 1])
+        self.assertEqual(index.row(index.query("/apps/b.exe")[0]).app, "/apps/b.exe")
+
+    def test_out_of_order_events_are_sorted(self):
+        # e.g. the clock was set back between two ticks
+        self.event_log.append([(50.0, "/apps/a.exe", TERMINATED, 1), (60.0, "/apps/a.exe", TERMINATED, 2)])
+        index = HistoryIndex(self.event_log)
+        index.refresh()
+        index.query("/apps/a.exe")
+        self.event_log.append([(55.0, "/apps/a.exe", TERMINATED, 3)])
+        index.refresh()
+        self.assertEqual(list(index.times), [50.0, 55.0, 60.0])
+        self.assertEqual([index.row(row).pid for row in index.query("/apps/a.exe", 52.0)], [2, 3])
+
+    def test_large_log_opens_and_filters_quickly(self):
+        count = 200000
+        self.event_log.append([(float(t), f"/apps/app{t % 20}.exe", TERMINATED, t) for t in range(count)])
+        started = time.perf_counter()
+        index = HistoryIndex(self.event_log)
+        index.refresh()
+        rows = index.query("/apps/app7.exe", 1000.0, 150000.0)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(len(rows), 7450)
+        self.assertEqual(index.row(rows[0]).pid, 149987)
+        self.assertLess(elapsed, 2.0) # Well under a second normally; generous for slow machines
+
+    def test_cli_prints_recent_events(self):
+        self.event_log.append([(time.time() - 60, "/apps/a.exe", KILLED, 99)])
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(history.main(["--days", "1"]), 0)
+        self.assertIn("killed", output.getvalue())
+        self.assertIn("/apps/a.exe (PID: 99)", output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from unittest import mock
+import os
+import sys
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import i18n
+
+
+class TestCatalogCache(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.multiple(i18n, _translations={}, _available_languages=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_available_languages_come_from_the_locale_directory(self):
+        self.assertEqual(i18n.available_languages(), ["ar", "en"])
+        with mock.patch.object(i18n.os, "listdir") as listdir:
+            i18n.available_languages()
+        listdir.assert_not_called() # Listed once
+
+    def test_each_catalog_is_loaded_once(self):
+        with mock.patch.object(i18n.gettext, "translation", wraps=i18n.gettext.translation) as translation:
+            i18n.preload_translations()
+            first = i18n.get_translation("ar")
+            self.assertIs(i18n.get_translation("ar"), first)
+        self.assertEqual(sorted(call.kwargs["languages"][0] for call in translation.call_args_list), ["ar", "en"])
+
+    def test_marked_messages_are_not_translated_until_shown(self):
+        self.assertEqual(i18n.N_("App Time Blocker v2"), "App Time Blocker v2")
+        self.assertEqual(i18n.language_name("ar"), "العربية")
+        self.assertEqual(i18n.language_name("xx"), "xx")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import os
+import sys
+import threading
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker.log_sink import LogSink
+
+
+class TestLogSink(unittest.TestCase):
+
+    def test_consumer_is_woken_once_per_batch(self):
+        wakeups = []
+        sink = LogSink(max_lines=10, on_pending=lambda: wakeups.append(1))
+
+        for i in range(5):
+            sink.write(f"line {i}\n")
+        self.assertEqual(len(wakeups), 1)
+
+        lines, dropped = sink.drain()
+        self.assertEqual(lines, [f"line {i}\n" for i in range(5)])
+        self.assertEqual(dropped, 0)
+
+        sink.write("next\n")
+        self.assertEqual(len(wakeups), 2)
+
+    def test_flood_keeps_newest_lines_and_counts_dropped(self):
+        sink = LogSink(max_lines=100)
+        for i in range(10000):
+            sink.write(f"line {i}\n")
+
+        lines, dropped = sink.drain()
+        self.assertEqual(len(lines), 100)
+        self.assertEqual(lines[-1], "line 9999\n")
+        self.assertEqual(dropped, 9900)
+        self.assertEqual(sink.drain(), ([], 0))
+
+    def test_concurrent_producers(self):
+        sink = LogSink(max_lines=100000)
+        threads = [threading.Thread(target=lambda: [sink.write("x\n") for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        lines, dropped = sink.drain()
+        self.assertEqual((len(lines), dropped), (4000, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import json
+import os
+import shutil
+import sys
+import tempfile
+import urllib.request
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker.metrics import Histogram, MetricsExporter, MonitorMetrics, write_prometheus_textfile
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_buckets_are_cumulative_and_inclusive(self):
+        histogram = Histogram("test_seconds", "Test.", (0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value)
+
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{le="0.1"} 2', lines)
+        self.assertIn('test_seconds_bucket{le="1.0"} 3', lines)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn("test_seconds_count 4", lines)
+        self.assertEqual(histogram.to_dict()["buckets"], {"0.1": 2, "1.0": 1, "+Inf": 1})
+
+    def test_prometheus_text_declares_every_metric(self):
+        metrics = MonitorMetrics()
+        metrics.matches.inc(3)
+        text = metrics.render_prometheus()
+
+        self.assertIn("# TYPE app_blocker_matches_total counter\napp_blocker_matches_total 3\n", text)
+        self.assertIn("# TYPE app_blocker_kill_latency_seconds histogram", text)
+        self.assertEqual(text.count("# TYPE"), len(metrics.all_metrics()))
+
+    def test_textfile_and_stats_endpoint(self):
+        metrics = MonitorMetrics()
+        metrics.ticks.inc()
+        test_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(test_dir, "app_blocker.prom")
+            write_prometheus_textfile(metrics, path)
+            with open(path) as f:
+                self.assertIn("app_blocker_ticks_total 1", f.read())
+            self.assertEqual(os.listdir(test_dir), ["app_blocker.prom"])
+
+            exporter = MetricsExporter(metrics, http_port=0) # Any free port
+            exporter.start()
+            try:
+                base_url = f"http://127.0.0.1:{exporter.http_port}"
+                with urllib.request.urlopen(base_url + "/stats", timeout=5) as response:
+                    stats = json.load(response)
+                with urllib.request.urlopen(base_url + "/metrics", timeout=5) as response:
+                    prometheus_text = response.read().decode()
+            finally:
+                exporter.close()
+        finally:
+            shutil.rmtree(test_dir, ignore_errors=True)
+
+        self.assertEqual(stats["ticks_total"], 1)
+        self.assertEqual(stats["tick_duration_seconds"]["count"], 0)
+        self.assertIn("app_blocker_ticks_total 1", prometheus_text)
+
+
+if __name__ == '__main__':
+    unittest.main()
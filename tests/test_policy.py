@@ -0,0 +1,240 @@
+import unittest
+import datetime
+import http.server
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import config, policy
+from app_blocker.config_store import ConfigStore, ConfigWriter
+from app_blocker.policy import PolicyClient, PolicySync, apply_delta
+
+
+class StubPolicyServer:
+    """
+    Local stand-in for the fleet policy endpoint. Serves `versions[-1]` with ETag "v<index>",
+    answering 304 to the current ETag and a rules-delta to an older one if `deltas` is set.
+    """
+
+    def __init__(self, rules):
+        self.versions = [rules]
+        self.deltas = True
+        self.bad_delta = False
+        self.truncate = False # Promise a longer body than is sent, then close the connection
+        self.requests = [] # (If-None-Match, A-IM) of every request
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                etag, im = self.headers.get("If-None-Match"), self.headers.get("A-IM")
+                stub.requests.append((etag, im))
+                current = f'"v{len(stub.versions) - 1}"'
+                if etag == current:
+                    self.send_response(304)
+                    self.send_header("ETag", current)
+                    self.end_headers()
+                    return
+                base = stub.version_for(etag)
+                if base is not None and stub.deltas and im == policy.DELTA_ENCODING:
+                    status, headers, body = 226, {"IM": policy.DELTA_ENCODING}, stub.delta(base)
+                else:
+                    status, headers, body = 200, {}, {"rules": stub.versions[-1]}
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("ETag", current)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if stub.truncate:
+                    data = data[:len(data) // 2]
+                    self.close_connection = True
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/policy"
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def version_for(self, etag):
+        for index in range(len(self.versions)):
+            if etag == f'"v{index}"':
+                return self.versions[index]
+        return None
+
+    def delta(self, base):
+        if self.bad_delta:
+            return {"upsert": "not a list"}
+        keys = lambda rules: {policy._key_of(rule): rule for rule in rules}
+        old, new = keys(base), keys(self.versions[-1])
+        return {
+            "upsert": [rule for key, rule in new.items() if old.get(key) != rule],
+            "remove": [key for key in old if key not in new]
+        }
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+GAME = {"app_path": "/apps/game.exe", "end_hour": 9, "end_minute": 0}
+CHAT = {"app_path": "/apps/chat.exe", "end_hour": 12, "end_minute": 30}
+VIDEO = {"process_name": "video", "end_hour": 18, "end_minute": 0}
+
+
+class PolicyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_paths = (config.APP_DATA_DIR, config.CONFIG_FILE_PATH)
+        config.APP_DATA_DIR = self.test_dir
+        config.CONFIG_FILE_PATH = os.path.join(self.test_dir, "test_config.json")
+        self.server = StubPolicyServer([GAME, CHAT])
+
+    def tearDown(self):
+        self.server.close()
+        config.APP_DATA_DIR, config.CONFIG_FILE_PATH = self.original_paths
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+
+class TestPolicyClient(PolicyTestCase):
+
+    def test_conditional_requests_and_deltas(self):
+        client = PolicyClient(self.server.url)
+        self.assertTrue(client.fetch())
+        self.assertEqual(client.rules, [GAME, CHAT])
+        self.assertFalse(client.fetch())
+        self.assertEqual(self.server.requests[-1], ('"v0"', policy.DELTA_ENCODING))
+        self.assertEqual(client.not_modified, 1)
+
+        self.server.versions.append([dict(GAME, end_hour=8), VIDEO])
+        self.assertTrue(client.fetch())
+        self.assertEqual(client.rules, [dict(GAME, end_hour=8), VIDEO])
+        self.assertEqual((client.full_fetches, client.delta_fetches, client.etag), (1, 1, '"v1"'))
+
+    def test_unusable_delta_falls_back_to_full_fetch(self):
+        client = PolicyClient(self.server.url)
+        client.fetch()
+        self.server.versions.append([VIDEO])
+        self.server.bad_delta = True
+        self.assertTrue(client.fetch())
+        self.assertEqual(client.rules, [VIDEO])
+        self.assertEqual((client.full_fetches, client.delta_fetches), (2, 0))
+
+    def test_cache_survives_the_server_going_away(self):
+        PolicyClient(self.server.url).fetch()
+        self.server.close()
+        client = PolicyClient(self.server.url)
+        self.assertTrue(client.load_cache())
+        self.assertEqual((client.rules, client.etag), ([GAME, CHAT], '"v0"'))
+        with self.assertRaises(OSError):
+            client.fetch()
+        self.assertEqual(client.rules, [GAME, CHAT])
+        self.assertFalse(PolicyClient("http://elsewhere/policy").load_cache()) # Cached for another URL
+
+    def test_apply_delta(self):
+        rules = apply_delta([GAME, CHAT], {"upsert": [dict(CHAT, end_hour=13), VIDEO], "remove": ["/apps/game.exe"]})
+        self.assertEqual(rules, [dict(CHAT, end_hour=13), VIDEO])
+        with self.assertRaises(ValueError):
+            apply_delta([GAME], {"remove": [{"app_path": "/apps/game.exe"}]})
+
+
+class TestPolicySync(PolicyTestCase):
+
+    def make_sync(self, log=None):
+        log = [] if log is None else log
+        self.writer = ConfigWriter(coalesce_delay=0)
+        self.addCleanup(self.writer.close)
+        store = ConfigStore()
+        return PolicySync(PolicyClient(self.server.url), store, self.writer,
+                          log_status_func=log.append, log_error_func=log.append), store
+
+    def test_policy_reaches_running_monitor_through_config_store(self):
+        config.save_config_to_file("/apps/game.exe", 9, 0, True, datetime.date.today(), "en",
+                                   [dict(GAME, block_activated_today=True, date_block_activated=datetime.date.today())])
+        sync, store = self.make_sync()
+        store.get()
+        delivered = []
+        store.subscribe(delivered.append) # What monitor_rule_set does with the config_store
+
+        self.assertTrue(sync.sync_once())
+        self.writer.flush(timeout=5)
+        self.assertTrue(store.poll())
+        rules = {rule["app_path"]: rule for rule in delivered[-1]["rules"]}
+        self.assertEqual(set(rules), {"/apps/game.exe", "/apps/chat.exe"})
+        self.assertTrue(rules["/apps/game.exe"]["block_activated_today"]) # Block state is kept
+        self.assertFalse(rules["/apps/chat.exe"]["block_activated_today"])
+
+        self.assertFalse(sync.apply()) # In sync: nothing to write
+        config.save_config_to_file("", 9, 0, False, None, "en", [VIDEO]) # Local edit or stale save
+        self.assertTrue(sync.apply())
+
+    def test_cached_policy_is_applied_offline(self):
+        self.make_sync()[0].sync_once()
+        self.writer.flush(timeout=5)
+        os.remove(config.CONFIG_FILE_PATH)
+        self.server.close()
+
+        log = []
+        sync, store = self.make_sync(log)
+        self.assertTrue(sync.load_cache())
+        self.assertFalse(sync.sync_once())
+        self.writer.flush(timeout=5)
+        self.assertEqual([rule["app_path"] for rule in config.load_config_from_file()["rules"]],
+                         ["/apps/game.exe", "/apps/chat.exe"])
+        self.assertTrue(any("Could not fetch policy" in line for line in log))
+
+    def test_truncated_response_is_a_failed_poll(self):
+        log = []
+        sync, store = self.make_sync(log)
+        self.server.truncate = True
+        self.assertFalse(sync.sync_once()) # IncompleteRead is logged, not raised out of the sync thread
+        self.assertIsNone(sync.client.rules)
+        self.assertTrue(any("Could not fetch policy" in line for line in log))
+        self.server.truncate = False
+        self.assertTrue(sync.sync_once())
+
+    def test_policy_with_an_invalid_rule_is_a_failed_poll(self):
+        log = []
+        sync, store = self.make_sync(log)
+        self.assertTrue(sync.sync_once())
+        self.writer.flush(timeout=5)
+        for bad_rule in ({"app_path": "/apps/x.exe", "end_hour": "17:00"}, {"app_path": 5}):
+            self.server.versions.append([GAME, bad_rule]) # Offered as a delta, then in full
+            self.assertFalse(sync.sync_once())
+            self.assertEqual((sync.client.rules, sync.client.etag), ([GAME, CHAT], '"v0"'))
+        self.writer.flush(timeout=5)
+        self.assertEqual([rule["app_path"] for rule in config.load_config_from_file()["rules"]],
+                         ["/apps/game.exe", "/apps/chat.exe"])
+        self.assertTrue(any("is invalid end_hour/end_minute" in line for line in log), log)
+
+        with open(sync.client.cache_path) as f:
+            cached = json.load(f)
+        with open(sync.client.cache_path, "w") as f:
+            json.dump(dict(cached, rules=[GAME, {"app_path": 5}]), f) # Written before rules were validated
+        self.assertFalse(self.make_sync()[0].load_cache())
+
+    def test_poll_delays_are_jittered_and_back_off(self):
+        sync, store = self.make_sync()
+        sync.poll_interval, sync.jitter, sync._rng = 100.0, 0.2, random.Random(1)
+        delays = [sync.next_delay(True) for _ in range(200)]
+        self.assertTrue(all(80.0 <= delay <= 120.0 for delay in delays))
+        self.assertGreater(max(delays) - min(delays), 20.0)
+        sync._failures = 1
+        self.assertLessEqual(sync.next_delay(False), policy.RETRY_DELAY)
+        sync._failures = 30
+        self.assertGreaterEqual(sync.next_delay(False), sync.poll_interval / 2) # Capped at the poll interval
+
+
+if __name__ == '__main__':
+    unittest.main()
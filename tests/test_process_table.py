@@ -0,0 +1,88 @@
+import unittest
+from unittest import mock
+import os
+import subprocess
+import sys
+import time
+import types
+
+import psutil
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import process_table
+from app_blocker.process_table import ProcfsProcessTable, PsutilProcessTable, create_process_table
+
+MISSING_PID = 2 ** 22 + 1 # Above the kernel's PID limit
+
+
+def info_for(pid):
+    """The bit of a ProcessInfo a process table reads."""
+    return types.SimpleNamespace(pid=pid, process=lambda: psutil.Process(pid))
+
+
+@unittest.skipUnless(ProcfsProcessTable.available(), "No /proc")
+class TestProcfsProcessTable(unittest.TestCase):
+
+    def setUp(self):
+        self.procfs = ProcfsProcessTable()
+        self.psutil = PsutilProcessTable()
+
+    def test_agrees_with_psutil(self):
+        # A command line longer than the read buffer, so the buffer has to grow
+        long_arg = "x" * (process_table._READ_CHUNK * 2)
+        child = subprocess.Popen([sys.executable, "-c", "import sys; sys.stdin.read()", long_arg], stdin=subprocess.PIPE)
+        try:
+            for pid in (os.getpid(), child.pid):
+                proc, name, create_time = self.procfs.read(pid)
+                real = psutil.Process(pid)
+                self.assertIsNone(proc)
+                self.assertEqual(name, real.name()[:15])
+                self.assertAlmostEqual(create_time, real.create_time(), delta=0.05)
+                self.assertEqual(self.procfs.ppid(pid), self.psutil.ppid(pid))
+                for attribute in ("uid", "exe", "cmdline"):
+                    self.assertEqual(getattr(self.procfs, attribute)(info_for(pid)),
+                                     getattr(self.psutil, attribute)(info_for(pid)), attribute)
+            self.assertEqual(len(self.procfs._buffer), process_table._READ_CHUNK)
+        finally:
+            child.communicate()
+
+    def test_pids_match_psutil(self):
+        listing = self.procfs.listing()
+        self.assertEqual(listing[os.getpid()], os.stat(f"/proc/{os.getpid()}").st_ino)
+        # Processes come and go between the two listings; most must still agree
+        self.assertGreater(len(listing.keys() & set(psutil.pids())), len(psutil.pids()) // 2)
+
+    def test_missing_pid_raises_no_such_process(self):
+        with self.assertRaises(psutil.NoSuchProcess):
+            self.procfs.read(MISSING_PID)
+        with self.assertRaises(psutil.NoSuchProcess):
+            self.procfs.exe(info_for(MISSING_PID))
+
+    def test_zombie_raises_zombie_process(self):
+        child = subprocess.Popen([sys.executable, "-c", "pass"])
+        try:
+            while psutil.Process(child.pid).status() != psutil.STATUS_ZOMBIE: # Exited, not yet reaped
+                time.sleep(0.01)
+            with self.assertRaises(psutil.ZombieProcess):
+                self.procfs.read(child.pid)
+        finally:
+            child.wait()
+
+
+class TestCreateProcessTable(unittest.TestCase):
+
+    def test_psutil_backend_is_always_available(self):
+        self.assertIsInstance(create_process_table("psutil"), PsutilProcessTable)
+
+    def test_procfs_falls_back_to_psutil_without_proc(self):
+        log = []
+        with mock.patch.object(ProcfsProcessTable, "available", staticmethod(lambda: False)):
+            self.assertIsInstance(create_process_table("procfs", log.append), PsutilProcessTable)
+            self.assertIsInstance(create_process_table("auto", log.append), PsutilProcessTable)
+        self.assertEqual(len(log), 1) # Only an explicit procfs choice is worth a message
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from unittest import mock
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import process_watcher
+
+
+def build_proc_event(what, pid, tgid, msg_type=process_watcher.NLMSG_DONE):
+    """Builds one netlink datagram the way the kernel proc connector lays it out."""
+    event = struct.pack(process_watcher.PROC_EVENT_HEADER_FORMAT, what, 0, 0)
+    event += struct.pack(process_watcher.EXEC_EVENT_FORMAT, pid, tgid)
+    cn_msg = struct.pack(process_watcher.CN_MSG_FORMAT, process_watcher.CN_IDX_PROC,
+                         process_watcher.CN_VAL_PROC, 0, 0, len(event), 0)
+    total_len = process_watcher.NLMSGHDR_SIZE + len(cn_msg) + len(event)
+    header = struct.pack(process_watcher.NLMSGHDR_FORMAT, total_len, msg_type, 0, 0, 0)
+    return header + cn_msg + event
+
+
+class TestProcessWatcher(unittest.TestCase):
+
+    def test_parse_exec_event(self):
+        tgids, overrun = process_watcher.parse_exec_events(
+            build_proc_event(process_watcher.PROC_EVENT_EXEC, 1235, 1234))
+        self.assertEqual(tgids, {1234})
+        self.assertFalse(overrun)
+
+    def test_parse_ignores_other_events(self):
+        fork_event = 0x00000001
+        tgids, overrun = process_watcher.parse_exec_events(build_proc_event(fork_event, 10, 10))
+        self.assertEqual(tgids, set())
+        self.assertFalse(overrun)
+
+    def test_parse_multiple_messages_in_one_datagram(self):
+        data = (build_proc_event(process_watcher.PROC_EVENT_EXEC, 1, 1) +
+                build_proc_event(process_watcher.PROC_EVENT_EXEC, 2, 2))
+        tgids, _ = process_watcher.parse_exec_events(data)
+        self.assertEqual(tgids, {1, 2})
+
+    def test_parse_overrun_requests_rescan(self):
+        data = build_proc_event(0, 0, 0, msg_type=process_watcher.NLMSG_OVERRUN)
+        _, overrun = process_watcher.parse_exec_events(data)
+        self.assertTrue(overrun)
+
+    def test_polling_watcher_always_requests_full_scan(self):
+        watcher = process_watcher.PollingProcessWatcher()
+        stop_event = threading.Event()
+        stop_event.set() # Return immediately
+        self.assertIsNone(watcher.wait_for_exec(1.0, stop_event))
+        watcher.close()
+
+    @unittest.skipUnless(any(os.access(path, os.X_OK) for path in process_watcher.PROBE_PATHS), "No true(1)")
+    def test_self_test_probe_is_a_system_binary_and_is_not_waited_on_forever(self):
+        watcher = process_watcher.NetlinkProcessWatcher.__new__(process_watcher.NetlinkProcessWatcher)
+        watcher._sock, peer = socket.socketpair() # Never readable: no exec event arrives
+        self.addCleanup(watcher._sock.close)
+        self.addCleanup(peer.close)
+        probe = mock.Mock(pid=4321)
+        probe.wait.side_effect = [subprocess.TimeoutExpired("true", 0.01), 0] # Hangs until killed
+        with mock.patch.object(process_watcher, "SELF_TEST_TIMEOUT", 0.01), \
+                mock.patch.object(process_watcher.subprocess, "Popen", return_value=probe) as popen:
+            with self.assertRaises(OSError):
+                watcher._verify_delivery()
+        [probe_path] = popen.call_args[0][0]
+        self.assertIn(probe_path, process_watcher.PROBE_PATHS) # Not sys.executable, which may be the app itself
+        probe.kill.assert_called_once_with()
+
+    def test_create_process_watcher_falls_back_to_polling(self):
+        with mock.patch.object(process_watcher, "NetlinkProcessWatcher", side_effect=OSError("denied")):
+            messages = []
+            watcher = process_watcher.create_process_watcher(messages.append)
+        if sys.platform.startswith("linux"):
+            self.assertEqual(len(messages), 1)
+        self.assertIsInstance(watcher, process_watcher.PollingProcessWatcher)
+
+
+if __name__ == '__main__':
+    unittest.main()
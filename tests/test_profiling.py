@@ -0,0 +1,157 @@
+import unittest
+from unittest import mock
+import datetime
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker.profiling import Profiler
+from app_blocker.rules import BlockRule, RuleSet
+from app_blocker.simulation import Simulation
+
+
+def busy_tick(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class FakeConfigStore:
+    def __init__(self, values):
+        self.values = values
+        self.subscribers = []
+
+    def get(self):
+        return self.values
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def edit(self, **changes):
+        self.values = dict(self.values, **changes)
+        for callback in self.subscribers:
+            callback(self.values)
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.test_dir, True)
+        self.log = []
+
+    def profiler(self, **kwargs):
+        profiler = Profiler(directory=self.test_dir, log_status_func=self.log.append, **kwargs)
+        self.addCleanup(profiler.close)
+        return profiler
+
+    def files(self, prefix):
+        return sorted(glob.glob(os.path.join(self.test_dir, prefix + "*")))
+
+    def test_off_does_nothing(self):
+        profiler = self.profiler(handler_threshold=0.0)
+        handler = lambda event: event * 2
+        self.assertEqual(profiler.timed(handler)(21), 42)
+        profiler.tick_started()
+        busy_tick(0.05)
+        profiler.tick_finished()
+        self.assertEqual(profiler.dump(), [])
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(os.listdir(self.test_dir), [])
+
+    def test_ticks_are_sampled_into_collapsed_stacks(self):
+        profiler = self.profiler(enabled=True, sample_interval=0.001)
+        self.assertTrue(tracemalloc.is_tracing())
+        for _tick in range(5):
+            profiler.tick_started()
+            busy_tick(0.02)
+            profiler.tick_finished()
+            time.sleep(0.02) # Idle time between ticks is not sampled
+        profiler.set_enabled(False)
+        self.assertFalse(tracemalloc.is_tracing())
+        [path] = self.files("monitor-")
+        with open(path) as f:
+            lines = f.read().splitlines()
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertTrue(stack.endswith("test_profiling.py:busy_tick"), stack)
+        self.assertIn("test_profiling.py:test_ticks_are_sampled_into_collapsed_stacks;", stack)
+        self.assertGreater(int(count), 5)
+        self.assertFalse(any("time.sleep" in line or ":sleep" in line for line in lines))
+        self.assertEqual(self.log, [f"Profiling on. Writing profiles to {self.test_dir}.", "Profiling off."])
+
+    def test_slow_ui_handlers_are_recorded(self):
+        profiler = self.profiler(enabled=True, handler_threshold=0.01)
+
+        def on_slow_click(event):
+            time.sleep(0.02)
+
+        def on_fast_click(event):
+            pass
+
+        profiler.timed(on_slow_click)(None)
+        profiler.timed(on_fast_click)(None)
+        profiler.set_enabled(False)
+        [path] = self.files("ui-")
+        with open(path) as f:
+            [line] = f.read().splitlines()
+        stack, milliseconds = line.rsplit(" ", 1)
+        self.assertTrue(stack.startswith("ui;") and stack.endswith("on_slow_click"), stack)
+        self.assertGreaterEqual(int(milliseconds), 20)
+        self.assertTrue(any(message.startswith("Slow UI handler") for message in self.log))
+
+    def test_memory_growth_between_dumps(self):
+        profiler = self.profiler(enabled=True)
+        profiler.dump() # Baseline snapshot
+        hoard = [bytearray(1024) for _i in range(1000)]
+        profiler.dump()
+        [path] = self.files("memory-")
+        with open(path) as f:
+            report = f.read()
+        self.assertIn("test_profiling.py", report)
+        del hoard
+
+    def test_oldest_files_are_pruned_to_the_budget(self):
+        for age in range(3):
+            path = os.path.join(self.test_dir, f"monitor-old-{age}.folded")
+            with open(path, "w") as f:
+                f.write("x" * 1000)
+            os.utime(path, (time.time() - 100 + age, time.time() - 100 + age))
+        with open(os.path.join(self.test_dir, "notes.txt"), "w") as f:
+            f.write("y" * 5000) # Not ours, never deleted or counted
+        profiler = self.profiler(enabled=True, max_bytes=2500, handler_threshold=0.0)
+        profiler.record_handler("on_click", 0.001)
+        profiler.dump()
+        self.assertEqual(sorted(os.listdir(self.test_dir))[:3], ["monitor-old-1.folded", "monitor-old-2.folded", "notes.txt"])
+        self.assertEqual(len(self.files("ui-")), 1)
+
+    def test_follows_the_config_setting(self):
+        store = FakeConfigStore({"profiling": False})
+        profiler = self.profiler(enabled=True) # As with --profile
+        profiler.follow(store)
+        store.edit(language="ar")
+        self.assertTrue(profiler.enabled) # Other edits leave it alone
+        store.edit(profiling=True)
+        store.edit(profiling=False)
+        self.assertFalse(profiler.enabled)
+        store.edit(profiling=True)
+        self.assertTrue(profiler.enabled)
+
+    def test_monitor_marks_every_tick(self):
+        simulation = Simulation(datetime.datetime(2024, 5, 6), tz="UTC")
+        simulation.launch(datetime.datetime(2024, 5, 6, 20), "/apps/game.exe")
+        profiler = mock.Mock()
+        simulation.run(RuleSet([BlockRule("/apps/game.exe", 21, 0)]), until=datetime.datetime(2024, 5, 6, 22),
+                       profiler=profiler)
+        self.assertGreater(profiler.tick_started.call_count, 0)
+        self.assertEqual(profiler.tick_started.call_count, profiler.tick_finished.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+import datetime
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import psutil
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker.blocker import monitor_rule_set
+from app_blocker.metrics import MonitorMetrics
+from app_blocker.respawn import LogBackoff, RespawnGuard
+from app_blocker.rules import BlockRule, RuleSet
+
+
+class FakeProcessTable:
+    """pid -> (ppid, name, create_time); just what RespawnGuard reads."""
+
+    def __init__(self, processes):
+        self.processes = processes
+
+    def _get(self, pid):
+        if pid not in self.processes:
+            raise psutil.NoSuchProcess(pid)
+        return self.processes[pid]
+
+    def read(self, pid):
+        _ppid, name, create_time = self._get(pid)
+        return None, name, create_time
+
+    def ppid(self, pid):
+        return self._get(pid)[0]
+
+
+class TestLogBackoff(unittest.TestCase):
+
+    def test_powers_of_two_get_through_until_a_quiet_period(self):
+        backoff = LogBackoff(quiet_period=10.0)
+        self.assertEqual([backoff.allow("game", float(t)) for t in range(9)], [0, 0, None, 1, None, None, None, 3, None])
+        self.assertEqual(backoff.allow("chat", 9.0), 0) # Keys back off separately
+        self.assertEqual(backoff.allow("game", 30.0), 0)
+
+
+class TestRespawnGuard(unittest.TestCase):
+    RULE = BlockRule("/apps/game.exe", 0, 0)
+
+    def setUp(self):
+        # init(1) <- desktop(10) <- launcher(20); each spawn goes through its own short-lived shell
+        self.table = FakeProcessTable({10: (1, "gnome-shell", 5.0), 20: (10, "steam", 6.0)})
+        self.guard = RespawnGuard(window=30.0, threshold=3)
+
+    def spawn(self, pid, parent=20):
+        self.table.processes[pid + 1] = (parent, "sh", float(pid))
+        self.table.processes[pid] = (pid + 1, "game.exe", float(pid))
+        return [(types.SimpleNamespace(pid=pid), self.RULE)]
+
+    def test_nearest_repeating_ancestor_is_the_launcher(self):
+        self.assertEqual(self.guard.record(self.spawn(100), self.table, 0.0), [])
+        self.assertEqual(self.guard.record(self.spawn(200), self.table, 1.0), [])
+        self.assertEqual(self.guard.record(self.spawn(300), self.table, 2.0), [(20, 6.0, "steam", self.RULE)])
+
+    def test_kills_outside_the_window_do_not_count(self):
+        for tick, now in enumerate((0.0, 40.0, 80.0)):
+            self.assertEqual(self.guard.record(self.spawn(100 * (tick + 1)), self.table, now), [])
+
+    def test_many_instances_in_one_tick_count_once(self):
+        # A multi-process app started once is not a respawn storm
+        matches = self.spawn(100) + self.spawn(200) + self.spawn(300)
+        self.assertEqual(self.guard.record(matches, self.table, 0.0), [])
+
+    def test_protected_ancestors_are_left_alone(self):
+        for tick in range(4):
+            self.assertEqual(self.guard.record(self.spawn(100 * (tick + 1), parent=10), self.table, float(tick)), [])
+
+    def test_interactive_shell_is_never_frozen(self):
+        # desktop(10) <- terminal(11) <- bash(12); the user keeps relaunching the game from the prompt
+        self.table.processes.update({11: (10, "gnome-terminal-", 5.5), 12: (11, "bash", 5.6)})
+        for tick in range(6):
+            pid = 100 * (tick + 1)
+            self.table.processes[pid] = (12, "game.exe", float(pid))
+            self.assertEqual(self.guard.record([(types.SimpleNamespace(pid=pid), self.RULE)], self.table, float(tick)), [])
+
+    def test_launcher_gone_since_record_is_not_suppressed(self):
+        log = []
+        storm = (20, 99.0, "steam", self.RULE) # PID 20 has been reused since; it started at 6.0
+        self.assertFalse(self.guard.suppress(storm, set(), self.table, None, 0, log.append))
+        self.assertEqual((self.guard.suppressions, log), (0, []))
+
+    def test_off_records_nothing(self):
+        guard = RespawnGuard(action="off")
+        for tick in range(4):
+            self.assertEqual(guard.record(self.spawn(100 * (tick + 1)), self.table, float(tick)), [])
+
+
+LAUNCHER = "import subprocess, sys\nwhile True:\n    subprocess.call([sys.argv[1], '1000'])"
+
+
+@unittest.skipUnless(sys.platform.startswith("linux") and shutil.which("sleep"), "Needs Linux and sleep(1)")
+class TestRespawnStorm(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.target = os.path.join(self.test_dir, "blocked_game")
+        shutil.copy(shutil.which("sleep"), self.target)
+        self.launcher = subprocess.Popen([sys.executable, "-c", LAUNCHER, self.target])
+
+    def tearDown(self):
+        self.launcher.kill()
+        self.launcher.wait()
+        for proc in psutil.process_iter(["exe"]):
+            if proc.info["exe"] == self.target:
+                proc.kill()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_respawning_launcher_is_frozen_until_monitoring_stops(self):
+        rule_set = RuleSet([BlockRule(self.target, 0, 0, True, datetime.date.today())])
+        stop_event = threading.Event()
+        metrics = MonitorMetrics()
+        log = []
+        monitor = threading.Thread(target=monitor_rule_set, args=(rule_set, stop_event, lambda rule_set: None, log.append,
+                                                                  lambda func, *args: func(*args), None),
+                                   kwargs={"metrics": metrics, "terminate_grace_period": 0.2})
+        monitor.start()
+        try:
+            launcher = psutil.Process(self.launcher.pid)
+            deadline = time.monotonic() + 30
+            while launcher.status() != psutil.STATUS_STOPPED and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(launcher.status(), psutil.STATUS_STOPPED)
+            matches = metrics.matches.value
+            time.sleep(1.5)
+            self.assertEqual(metrics.matches.value, matches) # Nothing respawns any more
+            self.assertEqual(metrics.launchers_suppressed.value, 1)
+        finally:
+            stop_event.set()
+            monitor.join(timeout=10)
+        self.assertNotEqual(launcher.status(), psutil.STATUS_STOPPED)
+        self.assertTrue(any("keeps being restarted by" in message for message in log), log)
+
+
+if __name__ == '__main__':
+    unittest.main()
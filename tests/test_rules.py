@@ -0,0 +1,57 @@
+import unittest
+import os
+import sys
+import datetime
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker.rules import BlockRule, RuleSet, normalize_exe_path, rule_set_from_config
+
+
+class TestRuleSet(unittest.TestCase):
+
+    def test_rules_are_keyed_by_normalized_path(self):
+        rule = BlockRule("/opt/games/../games/Game.exe", 17, 0)
+        self.assertEqual(rule.key, normalize_exe_path("/opt/games/Game.exe"))
+
+    def test_blocked_index_only_contains_active_rules(self):
+        active = BlockRule("/apps/a.exe", 9, 0, True, datetime.date(2024, 1, 1))
+        inactive = BlockRule("/apps/b.exe", 23, 0)
+        blocked = RuleSet([active, inactive]).blocked_index()
+        self.assertEqual(list(blocked.values()), [active])
+
+    def test_rules_without_path_are_dropped(self):
+        self.assertEqual(len(RuleSet([BlockRule("", 1, 0), BlockRule("/apps/a.exe", 1, 0)])), 1)
+
+    def test_round_trip_through_config(self):
+        config_values = {"rules": [
+            {"app_path": "/apps/a.exe", "end_hour": 8, "end_minute": 30,
+             "block_activated_today": True, "date_block_activated": datetime.date(2024, 5, 1)}
+        ]}
+        rule_set = rule_set_from_config(config_values)
+        self.assertEqual(rule_set.to_config(), config_values["rules"])
+
+    def test_matcher_fields_round_trip_and_extend_the_key(self):
+        rule = BlockRule("/usr/bin/python3", 8, 0, process_name=None, uids=[1000], cmdline_pattern="game\\.py")
+        self.assertEqual(rule.key, normalize_exe_path("/usr/bin/python3") + "|uids=1000|cmdline=game\\.py")
+        self.assertEqual(BlockRule.from_config(rule.to_config()).key, rule.key)
+        self.assertNotIn("process_name", rule.to_config()) # Unset fields are not written
+        name_rule = BlockRule("", 8, 0, process_name="game")
+        self.assertEqual((name_rule.key, name_rule.app_name), ("name=game", "game"))
+        self.assertEqual(len(RuleSet([name_rule])), 1)
+
+    def test_merge_config_keeps_active_blocks(self):
+        today = datetime.date(2024, 5, 1)
+        rule_set = RuleSet([BlockRule("/apps/a.exe", 9, 0, True, today), BlockRule("/apps/b.exe", 10, 0)])
+        edited = [BlockRule("/apps/a.exe", 20, 0).to_config(), BlockRule("/apps/c.exe", 11, 0).to_config()]
+
+        self.assertTrue(rule_set.merge_config(edited))
+        self.assertEqual([(rule.app_name, rule.end_hour) for rule in rule_set.rules], [("a.exe", 20), ("c.exe", 11)])
+        self.assertTrue(rule_set.rules[0].block_activated_today) # An edit cannot lift today's block
+        self.assertEqual({rule.key for rule in rule_set.rules}, {normalize_exe_path("/apps/a.exe"), normalize_exe_path("/apps/c.exe")})
+        self.assertFalse(rule_set.merge_config(rule_set.to_config()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from unittest import mock
+import os
+import sys
+import datetime
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import scheduler
+from app_blocker.rules import BlockRule, RuleSet
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_next_transition_is_earliest_pending_cutoff(self):
+        now = datetime.datetime(2024, 3, 1, 8, 0)
+        rule_set = RuleSet([BlockRule("/a.exe", 17, 0), BlockRule("/b.exe", 12, 30)])
+        self.assertEqual(scheduler.next_transition(rule_set, now), datetime.datetime(2024, 3, 1, 12, 30))
+
+    def test_next_transition_is_midnight_once_everything_is_blocked(self):
+        now = datetime.datetime(2024, 3, 1, 18, 0)
+        rule_set = RuleSet([BlockRule("/a.exe", 17, 0, True, now.date())])
+        self.assertEqual(scheduler.next_transition(rule_set, now), datetime.datetime(2024, 3, 2, 0, 0))
+
+    def test_next_transition_is_end_of_active_window(self):
+        now = datetime.datetime(2024, 3, 4, 10, 0) # Monday
+        rule = BlockRule("/a.exe", 17, 0, schedule={"mon": ["09:00-12:00"]})
+        rule.activate_block(datetime.datetime(2024, 3, 4, 12, 0), now.date())
+        self.assertEqual(scheduler.next_transition(RuleSet([rule]), now), datetime.datetime(2024, 3, 4, 12, 0))
+
+    def test_seconds_until_is_clamped(self):
+        now = datetime.datetime(2024, 3, 1, 8, 0)
+        self.assertEqual(scheduler.seconds_until(now + datetime.timedelta(hours=5), now), scheduler.MAX_IDLE_SLEEP)
+        self.assertEqual(scheduler.seconds_until(now - datetime.timedelta(seconds=5), now), 0.0)
+        self.assertEqual(scheduler.seconds_until(now + datetime.timedelta(seconds=42), now), 42.0)
+
+    @mock.patch('app_blocker.scheduler.time.monotonic')
+    def test_clock_jump_detection(self, mock_monotonic):
+        detector = scheduler.ClockJumpDetector(tolerance=5.0)
+        start = datetime.datetime(2024, 3, 1, 8, 0)
+        mock_monotonic.return_value = 1000.0
+        detector.start(start)
+
+        mock_monotonic.return_value = 1060.0
+        self.assertFalse(detector.jumped(start + datetime.timedelta(seconds=61)))
+        self.assertTrue(detector.jumped(start + datetime.timedelta(hours=2)))
+        self.assertTrue(detector.jumped(start - datetime.timedelta(minutes=10)))
+
+
+class TestWeeklySchedule(unittest.TestCase):
+    MONDAY = datetime.datetime(2024, 3, 4)
+
+    def at(self, days, hour, minute=0):
+        return self.MONDAY + datetime.timedelta(days=days, hours=hour, minutes=minute)
+
+    def test_lunch_break_and_weekend(self):
+        schedule = scheduler.WeeklySchedule.from_config({
+            "mon": ["09:00-12:00", "13:00-17:00"], "sat": ["00:00-24:00"]
+        })
+        self.assertEqual(schedule.blocked_until(self.at(0, 10)), self.at(0, 12))
+        self.assertIsNone(schedule.blocked_until(self.at(0, 12, 30)))
+        self.assertEqual(schedule.next_block_start(self.at(0, 12, 30)), self.at(0, 13))
+        self.assertEqual(schedule.next_block_start(self.at(0, 17)), self.at(5, 0))
+        self.assertEqual(schedule.blocked_until(self.at(5, 23)), self.at(6, 0))
+        self.assertEqual(schedule.next_block_start(self.at(6, 12)), self.at(7, 9)) # Next week
+
+    def test_overnight_windows_merge_across_the_week_boundary(self):
+        schedule = scheduler.WeeklySchedule.from_config({"sun": ["22:00-07:00"], "mon": ["06:00-08:00"]})
+        self.assertEqual(schedule.windows(), [(0, 8 * 3600), (6 * 86400 + 22 * 3600, 7 * 86400)])
+        self.assertEqual(schedule.blocked_until(self.at(6, 23)), self.at(7, 8))
+        self.assertEqual(schedule.block_started(self.at(7, 7)), self.at(6, 22)) # Started last Sunday
+        self.assertIsNone(schedule.block_started(self.at(7, 9)))
+
+    def test_block_started_is_the_start_of_the_current_window(self):
+        schedule = scheduler.WeeklySchedule.daily_cutoff(17, 30)
+        self.assertEqual(schedule.block_started(self.at(2, 23)), self.at(2, 17, 30))
+        self.assertIsNone(schedule.block_started(self.at(2, 17, 29)))
+
+    def test_daily_cutoff_matches_the_original_rule(self):
+        schedule = scheduler.WeeklySchedule.daily_cutoff(17, 30)
+        self.assertIsNone(schedule.blocked_until(self.at(2, 17, 29)))
+        self.assertEqual(schedule.blocked_until(self.at(2, 17, 30)), self.at(3, 0))
+        self.assertEqual(len(scheduler.WeeklySchedule.daily_cutoff(0, 0).windows()), 1) # Blocked all week
+
+    def test_malformed_schedules_are_rejected(self):
+        for schedule_values in ({"monday": ["09:00-10:00"]}, {"mon": ["9-10"]}, {"mon": ["09:00-24:30"]}, ["09:00-10:00"]):
+            with self.assertRaises(ValueError):
+                scheduler.WeeklySchedule.from_config(schedule_values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import unittest
+import datetime
+import os
+import random
+import sys
+import time
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker.rules import BlockRule, RuleSet
+from app_blocker.scheduler import WEEKDAYS
+from app_blocker.simulation import Simulation, local_timezone
+from app_blocker.usage import UsageAccountant, UsageLog
+
+# CI can raise this (e.g. SIMULATION_SCENARIOS=5000); each scenario is two weeks of virtual time.
+SCENARIOS = int(os.environ.get("SIMULATION_SCENARIOS", "150"))
+SIMULATION_SEED = int(os.environ.get("SIMULATION_SEED", "20240331"))
+HAS_TZSET = hasattr(time, "tzset") and os.path.isdir("/usr/share/zoneinfo")
+
+# Time zones with their 2024 DST changes; Lord Howe moves by only 30 minutes.
+DST_CHANGES = (
+    ("Europe/Berlin", datetime.date(2024, 3, 31)), ("Europe/Berlin", datetime.date(2024, 10, 27)),
+    ("America/New_York", datetime.date(2024, 3, 10)), ("America/New_York", datetime.date(2024, 11, 3)),
+    ("Australia/Lord_Howe", datetime.date(2024, 4, 7)), ("Australia/Lord_Howe", datetime.date(2024, 10, 6)),
+    ("UTC", datetime.date(2024, 6, 1))
+)
+TARGETS = ("/apps/game.exe", "/apps/chat.exe", "/apps/video.exe")
+SCENARIO_DAYS = 14
+
+
+def random_schedule(rng):
+    """Either a daily cutoff (as (end_hour, end_minute)) or a weekly schedule dict, leaning towards the small hours."""
+    if rng.random() < 0.4:
+        return (rng.choice([1, 2, 3, rng.randrange(24)]), rng.choice([0, 15, 30, 45])), None
+    schedule = {}
+    for day in rng.sample(WEEKDAYS, rng.randint(1, 7)):
+        start = rng.randrange(0, 23 * 60, 15)
+        end = min(24 * 60, start + rng.randrange(15, 8 * 60, 15))
+        schedule[day] = [f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"]
+    return (23, 59), schedule
+
+
+def random_scenario(rng, event_driven=True, days=SCENARIO_DAYS):
+    tz, dst_date = rng.choice(DST_CHANGES)
+    start = datetime.datetime.combine(dst_date - datetime.timedelta(days=rng.randint(1, 6)), datetime.time())
+    rules = {}
+    for exe in rng.sample(TARGETS, rng.randint(1, len(TARGETS))):
+        (end_hour, end_minute), schedule = random_schedule(rng)
+        rules[exe] = BlockRule(exe, end_hour, end_minute, schedule=schedule)
+    if days < 7:
+        start += datetime.timedelta(days=rng.randint(7 - days, 6)) # Still across the DST change
+    simulation = Simulation(start, tz=tz, event_driven=event_driven)
+    for _ in range(rng.randint(5, 3 * days)):
+        at = start + datetime.timedelta(minutes=rng.randrange(days * 24 * 60))
+        simulation.launch(at, rng.choice(TARGETS + ("/apps/editor.exe",)), lifetime=rng.choice([60, 1800, 4 * 3600, 20 * 3600]),
+                          ignores_sigterm=rng.random() < 0.1)
+    return simulation, rules, start + datetime.timedelta(days=days)
+
+
+def check_scenario(test, simulation, rules, tolerance):
+    """
+    Safety: nothing is terminated unless its rule's schedule blocks it at that moment.
+    Liveness: every target running at a moment its schedule blocks is terminated by then (plus `tolerance`).
+    Times are compared in Unix time, since local times repeat when DST ends.
+    """
+    with local_timezone(simulation.tz):
+        terminated = {}
+        for termination in simulation.terminations:
+            rule = rules.get(termination.exe)
+            test.assertIsNotNone(rule, termination)
+            test.assertIsNotNone(rule.schedule.blocked_until(termination.time), termination)
+            terminated.setdefault(termination.pid, termination)
+        run_end = simulation.clock.time()
+        for proc in simulation.processes:
+            rule = rules.get(proc.exe)
+            if rule is None:
+                test.assertNotIn(proc.pid, terminated)
+                continue
+            launched = datetime.datetime.fromtimestamp(proc.started_at)
+            if rule.schedule.blocked_until(launched):
+                deadline = proc.started_at
+            else:
+                deadline = rule.schedule.next_block_start(launched).timestamp()
+            natural_end = proc.ended_at if proc.ended_by == "exit" else run_end
+            if deadline < natural_end:
+                test.assertIn(proc.pid, terminated, f"{proc} should have been blocked by {datetime.datetime.fromtimestamp(deadline)}")
+                test.assertLessEqual(terminated[proc.pid].wall_time, deadline + tolerance, proc)
+
+
+@unittest.skipUnless(HAS_TZSET, "Needs time.tzset() and the system time zone database")
+class TestSimulatedSchedules(unittest.TestCase):
+
+    def test_random_schedules_across_dst_changes(self):
+        rng = random.Random(SIMULATION_SEED)
+        for number in range(SCENARIOS):
+            simulation, rules, until = random_scenario(rng)
+            with self.subTest(scenario=number, tz=simulation.tz, start=simulation.start):
+                simulation.run(RuleSet(rules.values()), until, terminate_grace_period=1.0)
+                check_scenario(self, simulation, rules, tolerance=0.0) # An event-driven watcher catches launches at once
+
+    def test_random_schedules_with_polling_watcher(self):
+        # Polling ticks every second while a block is active, so these scenarios are shorter.
+        rng = random.Random(SIMULATION_SEED + 1)
+        for number in range(max(3, SCENARIOS // 30)):
+            simulation, rules, until = random_scenario(rng, event_driven=False, days=2)
+            with self.subTest(scenario=number, tz=simulation.tz, start=simulation.start):
+                simulation.run(RuleSet(rules.values()), until, terminate_grace_period=1.0)
+                check_scenario(self, simulation, rules, tolerance=1.0) # Up to one poll interval late
+
+    def test_weeks_of_virtual_time_take_milliseconds(self):
+        simulation = Simulation(datetime.datetime(2024, 3, 1), tz="Europe/Berlin")
+        simulation.launch(datetime.datetime(2024, 3, 1, 12, 0), "/apps/game.exe", lifetime=60)
+        started = time.perf_counter()
+        simulation.run(RuleSet([BlockRule("/apps/game.exe", 21, 0)]), until=datetime.datetime(2024, 4, 26))
+        self.assertLess(time.perf_counter() - started, 2.0)
+        self.assertEqual([proc.ended_by for proc in simulation.processes], ["exit"])
+
+
+@unittest.skipUnless(HAS_TZSET, "Needs time.tzset() and the system time zone database")
+class TestSimulatedScenarios(unittest.TestCase):
+    GAME = "/apps/game.exe"
+
+    def test_daily_cutoff_and_midnight_reset(self):
+        simulation = Simulation(datetime.datetime(2024, 5, 6), tz="UTC")
+        for day in range(3):
+            simulation.launch(datetime.datetime(2024, 5, 6 + day, 16, 0), self.GAME) # Runs into the cutoff
+            simulation.launch(datetime.datetime(2024, 5, 6 + day, 23, 30), self.GAME, lifetime=3600) # Blocked at launch
+        simulation.run(RuleSet([BlockRule(self.GAME, 21, 0)]), until=datetime.datetime(2024, 5, 9, 1, 0))
+        self.assertEqual([termination.time.strftime("%d %H:%M") for termination in simulation.terminations],
+                         ["06 21:00", "06 23:30", "07 21:00", "07 23:30", "08 21:00", "08 23:30"])
+        self.assertEqual(simulation.saves, 6) # One activation and one midnight reset per day
+
+    def test_stubborn_process_is_killed_after_the_grace_period(self):
+        simulation = Simulation(datetime.datetime(2024, 5, 6), tz="UTC")
+        simulation.launch(datetime.datetime(2024, 5, 6, 22, 0), self.GAME, ignores_sigterm=True)
+        simulation.run(RuleSet([BlockRule(self.GAME, 21, 0)]), until=datetime.datetime(2024, 5, 7), terminate_grace_period=3.0)
+        proc, = simulation.processes
+        self.assertEqual(proc.ended_by, "killed")
+        self.assertEqual(proc.ended_at - proc.started_at, 3.0)
+
+    def test_window_starting_right_after_spring_forward(self):
+        # 02:00 does not exist in Berlin on 2024-03-31; the game starts before and must go at 03:00.
+        simulation = Simulation(datetime.datetime(2024, 3, 30), tz="Europe/Berlin")
+        simulation.launch(datetime.datetime(2024, 3, 31, 1, 0), self.GAME)
+        simulation.run(RuleSet([BlockRule(self.GAME, 23, 59, schedule={"sun": ["03:00-06:00"]})]),
+                       until=datetime.datetime(2024, 4, 1))
+        self.assertEqual(simulation.terminations[0].time, datetime.datetime(2024, 3, 31, 3, 0))
+
+    def test_window_ending_in_the_repeated_hour_after_fall_back(self):
+        # 02:00-03:00 happens twice in Berlin on 2024-10-27; the window ends at the first 02:30 and
+        # starts again on the second pass, so a game launched in between is blocked again.
+        simulation = Simulation(datetime.datetime(2024, 10, 26), tz="Europe/Berlin")
+        rules = {self.GAME: BlockRule(self.GAME, 23, 59, schedule={"sun": ["02:00-02:30"]})}
+        with local_timezone("Europe/Berlin"):
+            first_pass_end = datetime.datetime(2024, 10, 27, 2, 30).timestamp()
+        simulation.launch(datetime.datetime(2024, 10, 27, 2, 45), self.GAME, lifetime=7200) # First pass
+        simulation.run(RuleSet(rules.values()), until=datetime.datetime(2024, 10, 28))
+        check_scenario(self, simulation, rules, tolerance=0.0)
+        self.assertEqual(simulation.terminations[0].wall_time, first_pass_end + 1800) # 02:00 on the second pass
+
+    def test_clock_steps_are_noticed(self):
+        simulation = Simulation(datetime.datetime(2024, 5, 6), tz="UTC")
+        simulation.launch(datetime.datetime(2024, 5, 6, 12, 0), self.GAME, lifetime=12 * 3600)
+        simulation.step_clock(datetime.datetime(2024, 5, 6, 13, 0), hours=9) # e.g. resume from suspend
+        simulation.run(RuleSet([BlockRule(self.GAME, 21, 0)]), until=datetime.datetime(2024, 5, 7))
+        # Wall time 22:00 after the step; noticed on the next wake-up at the latest
+        self.assertLessEqual(simulation.terminations[0].time, datetime.datetime(2024, 5, 6, 22, 5))
+        self.assertTrue(any("System clock changed" in message for _time, message in simulation.log))
+
+    def test_clock_set_back_keeps_an_active_block(self):
+        simulation = Simulation(datetime.datetime(2024, 5, 6), tz="UTC")
+        # Launched at 22:00 just as the clock is set back to 18:00, before the monitor gets to it.
+        simulation.launch(datetime.datetime(2024, 5, 6, 22, 0), self.GAME)
+        simulation.step_clock(datetime.datetime(2024, 5, 6, 22, 0), hours=-4)
+        simulation.run(RuleSet([BlockRule(self.GAME, 21, 0)]), until=datetime.datetime(2024, 5, 7))
+        self.assertEqual(simulation.terminations[0].time, datetime.datetime(2024, 5, 6, 18, 0))
+        self.assertTrue(any("System clock changed" in message for _time, message in simulation.log))
+
+    def test_usage_is_recorded_on_virtual_time(self):
+        simulation = Simulation(datetime.datetime(2024, 5, 6), tz="UTC")
+        simulation.launch(datetime.datetime(2024, 5, 6, 12, 0), self.GAME, lifetime=3600)
+        written = []
+        usage_log = UsageLog(path=os.devnull, apps_path=os.devnull)
+        usage_log.append = written.extend
+        simulation.run(RuleSet([BlockRule(self.GAME, 21, 0)]), until=datetime.datetime(2024, 5, 7),
+                       usage_accountant=UsageAccountant(usage_log))
+        with local_timezone("UTC"):
+            launched_at = datetime.datetime(2024, 5, 6, 12, 0).timestamp()
+        [(_app_key, start, end)] = written
+        self.assertEqual(start, launched_at)
+        self.assertGreaterEqual(end, launched_at + 3600 - 30) # Last seen by the sample before it exited
+        self.assertLessEqual(end, launched_at + 3600)
+
+if __name__ == '__main__':
+    unittest.main()
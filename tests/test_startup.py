@@ -0,0 +1,48 @@
+import unittest
+import os
+import sys
+import json
+import subprocess
+import tempfile
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import startup
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestStartup(unittest.TestCase):
+
+    def setUp(self):
+        temp_home = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_home.cleanup)
+        self.home = temp_home.name
+        self.env = dict(os.environ, HOME=self.home, USERPROFILE=self.home)
+        self.app_data_dir = os.path.join(self.home, "AppData", "Local", "AppBlockerWxV2")
+
+    def run_python(self, *args):
+        return subprocess.run([sys.executable, *args], cwd=PROJECT_ROOT, env=self.env,
+                              capture_output=True, text=True, timeout=30)
+
+    def test_importing_config_has_no_side_effects(self):
+        result = self.run_python("-c", "import app_blocker.config")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertFalse(os.path.exists(self.app_data_dir))
+
+    def test_daemon_reaches_enforcement_within_budget(self):
+        os.makedirs(self.app_data_dir)
+        with open(os.path.join(self.app_data_dir, "app_blocker_config_wx_v2.json"), "w") as f:
+            json.dump({"app_path": os.path.join(self.home, "blocked_app"), "end_hour": 0, "end_minute": 0}, f)
+
+        result = self.run_python("-m", "app_blocker.daemon", "--profile-startup", "--log-level", "WARNING")
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        report = json.loads(result.stdout)
+        self.assertIn("enforcement_ready", report["phases_ms"])
+        self.assertLess(report["total_ms"], startup.STARTUP_BUDGET_SECONDS * 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
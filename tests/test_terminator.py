@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+import os
+import sys
+import subprocess
+import time
+
+import psutil
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import terminator
+
+
+@unittest.skipUnless(os.name == "posix", "Uses POSIX shell children")
+class TestTerminateProcesses(unittest.TestCase):
+
+    def spawn(self, ignore_sigterm=False):
+        # An ignored SIGTERM survives exec, so the sleep itself needs the kill escalation.
+        script = 'trap "" TERM; exec sleep 30' if ignore_sigterm else "exec sleep 30"
+        child = subprocess.Popen(["sh", "-c", script])
+        self.addCleanup(child.wait)
+        self.addCleanup(lambda: child.poll() is None and child.kill())
+        return child
+
+    def test_batch_is_bounded_by_one_grace_period(self):
+        children = [self.spawn() for _ in range(5)] + [self.spawn(ignore_sigterm=True) for _ in range(2)]
+        time.sleep(0.2) # Let the shells install their traps
+        procs = [psutil.Process(child.pid) for child in children]
+
+        started = time.monotonic()
+        result = terminator.terminate_processes(procs, grace_period=0.5, kill_timeout=1.0)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(len(result.terminated), 5)
+        self.assertEqual(len(result.killed), 2)
+        self.assertEqual(result.alive, [])
+        self.assertLess(elapsed, 1.5) # One grace period plus slack, not seven of them
+
+    def test_psutil_fallback_without_pidfd(self):
+        child = self.spawn()
+        with mock.patch.object(terminator, "HAS_PIDFD", False):
+            result = terminator.terminate_processes([psutil.Process(child.pid)], grace_period=1.0)
+        self.assertEqual(len(result.terminated), 1)
+
+    def test_already_exited_process_counts_as_terminated(self):
+        child = self.spawn()
+        proc = psutil.Process(child.pid)
+        child.kill()
+        child.wait()
+        result = terminator.terminate_processes([proc], grace_period=0.1)
+        self.assertEqual(result.terminated, [proc])
+
+
+if __name__ == '__main__':
+    unittest.main()
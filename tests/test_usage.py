@@ -0,0 +1,156 @@
+import unittest
+from unittest import mock
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import numpy as np
+except ImportError: # Reports need NumPy; recording does not
+    np = None
+
+# Adjust sys.path to ensure 'app_blocker' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app_blocker import config, usage
+from app_blocker.usage import UsageAccountant, UsageLog, build_usage_report, merge_intervals
+
+
+class TestUsageRecording(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_app_data_dir = config.APP_DATA_DIR
+        config.APP_DATA_DIR = self.test_dir
+
+    def tearDown(self):
+        config.APP_DATA_DIR = self.original_app_data_dir
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_interval_runs_from_create_time_to_last_sample(self):
+        written = []
+        usage_log = UsageLog()
+        usage_log.append = written.extend
+        accountant = UsageAccountant(usage_log)
+
+        accountant.sample([(10, 100.0, "/apps/a.exe"), (11, 150.0, "/apps/b.exe")], now=200.0)
+        accountant.sample([(10, 100.0, "/apps/a.exe")], now=230.0)
+        self.assertEqual(written, [("/apps/b.exe", 150.0, 200.0)])
+
+        accountant.sample([(10, 500.0, "/apps/a.exe")], now=520.0) # PID reused by a new instance
+        self.assertEqual(written[-1], ("/apps/a.exe", 100.0, 230.0))
+
+        accountant.close(now=530.0)
+        self.assertEqual(written[-1], ("/apps/a.exe", 500.0, 530.0))
+
+    def test_interval_is_kept_until_it_is_written(self):
+        written = []
+        usage_log = UsageLog()
+        usage_log.append = written.extend
+        accountant = UsageAccountant(usage_log)
+        accountant.sample([(10, 100.0, "/apps/a.exe")], now=200.0)
+        usage_log.append = mock.Mock(side_effect=OSError("Lock held by another recorder"))
+        with self.assertRaises(OSError):
+            accountant.sample([], now=230.0)
+        usage_log.append = written.extend
+        accountant.sample([], now=260.0)
+        self.assertEqual(written, [("/apps/a.exe", 100.0, 200.0)])
+
+    def test_sample_due(self):
+        accountant = UsageAccountant(UsageLog(), sample_interval=30)
+        self.assertTrue(accountant.sample_due(1000.0))
+        accountant.sample([], now=0.0, now_monotonic=1000.0)
+        self.assertFalse(accountant.sample_due(1029.0))
+        self.assertTrue(accountant.sample_due(1030.0))
+
+    def test_two_recorders_agree_on_app_ids(self):
+        window, daemon = UsageLog(), UsageLog() # e.g. the GUI and the headless daemon, both running
+        window.append([("/apps/a.exe", 1.0, 2.0)])
+        daemon.append([("/apps/b.exe", 3.0, 4.0), ("/apps/a.exe", 5.0, 6.0)])
+        window.append([("/apps/b.exe", 7.0, 8.0)])
+        with open(window.path, "rb") as f:
+            records = list(usage.RECORD.iter_unpack(f.read()))
+        apps = UsageLog().apps
+        self.assertEqual(apps, ["/apps/a.exe", "/apps/b.exe"])
+        self.assertEqual([(apps[app_id], start) for app_id, start, _end in records],
+                         [("/apps/a.exe", 1.0), ("/apps/b.exe", 3.0), ("/apps/a.exe", 5.0), ("/apps/b.exe", 7.0)])
+
+    def test_app_ids_follow_an_apps_file_replaced_meanwhile(self):
+        window = UsageLog()
+        window.append([("/apps/a.exe", 1.0, 2.0)])
+        with open(window.apps_path, "w") as f:
+            json.dump(["/apps/x.exe"], f) # Reset by another recorder
+        window.append([("/apps/b.exe", 3.0, 4.0), ("/apps/a.exe", 5.0, 6.0)])
+        self.assertEqual(UsageLog().apps, ["/apps/x.exe", "/apps/b.exe", "/apps/a.exe"])
+        with open(window.path, "rb") as f:
+            self.assertEqual([app_id for app_id, _start, _end in usage.RECORD.iter_unpack(f.read())], [0, 1, 2])
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_log_round_trip_ignores_torn_record(self):
+        usage_log = UsageLog()
+        usage_log.append([("/apps/a.exe", 1.0, 2.0), ("/apps/b.exe", 3.0, 5.0)])
+        with open(usage_log.path, "ab") as f:
+            f.write(b"\x01\x02\x03") # Crash mid-append
+
+        apps, records = UsageLog().load()
+        self.assertEqual(apps, ["/apps/a.exe", "/apps/b.exe"])
+        self.assertEqual(records["app"].tolist(), [0, 1])
+        self.assertEqual(records["end"].tolist(), [2.0, 5.0])
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestUsageReport(unittest.TestCase):
+
+    def make_records(self, rows):
+        dtype = np.dtype([("app", "<u4"), ("start", "<f8"), ("end", "<f8")])
+        return np.array(rows, dtype=dtype)
+
+    def test_overlapping_instances_are_not_double_counted(self):
+        records = self.make_records([(0, 10, 20), (1, 12, 30), (0, 15, 25), (0, 40, 50), (0, 50, 55)])
+        app_ids, starts, ends = merge_intervals(records["app"], records["start"], records["end"])
+        self.assertEqual(list(zip(app_ids.tolist(), starts.tolist(), ends.tolist())),
+                         [(0, 10, 25), (0, 40, 55), (1, 12, 30)])
+
+    def test_daily_weekly_and_heatmap(self):
+        monday = datetime.date(2024, 1, 1)
+        midnight = time.mktime(monday.timetuple())
+        records = self.make_records([
+            (0, midnight + 1 * 3600, midnight + 2 * 3600),          # Monday 01:00-02:00
+            (0, midnight + 1.5 * 3600, midnight + 2.5 * 3600),      # Overlaps the one above
+            (1, midnight + 23 * 3600, midnight + 25 * 3600),        # Monday 23:00 to Tuesday 01:00
+            (0, midnight + 7 * 86400, midnight + 7 * 86400 + 600),  # Next Monday 00:00-00:10
+        ])
+
+        report = build_usage_report(["a", "b"], records, monday, monday + datetime.timedelta(days=7))
+
+        self.assertEqual(report.daily[0, 0], 5400)
+        self.assertEqual(report.daily[1, :2].tolist(), [3600, 3600])
+        self.assertEqual(report.week_starts, [monday, monday + datetime.timedelta(days=7)])
+        self.assertEqual(report.weekly.tolist(), [[5400, 600], [7200, 0]])
+        self.assertEqual(report.heatmap[0, 0, 1:3].tolist(), [3600, 1800])
+        self.assertEqual(report.heatmap[0, 0, 0], 600)
+        self.assertEqual((report.heatmap[1, 0, 23], report.heatmap[1, 1, 0]), (3600, 3600))
+
+    def test_year_of_history_reports_quickly(self):
+        rng = np.random.default_rng(0)
+        first_day = datetime.date(2023, 1, 1)
+        year_start = time.mktime(first_day.timetuple())
+        count = 365 * 100
+        starts = year_start + rng.uniform(0, 365 * 86400, count)
+        records = self.make_records(list(zip(rng.integers(0, 5, count), starts, starts + rng.exponential(1800, count))))
+
+        started = time.perf_counter()
+        report = build_usage_report(list("abcde"), records, first_day, first_day + datetime.timedelta(days=364))
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.5) # Typically ~10 ms; generous for slow CI machines
+        np.testing.assert_allclose(report.daily.sum(axis=1), report.heatmap.sum(axis=(1, 2)))
+        np.testing.assert_allclose(report.daily.sum(axis=1), report.weekly.sum(axis=1))
+
+
+if __name__ == '__main__':
+    unittest.main()